@@ -0,0 +1,117 @@
+"""
+Бенчмарк поиска повторных объявлений (realestate.dedup).
+
+Синтетический набор: уникальные объявления со случайными описаниями и к
+ним перепосты - почти-дубликаты (одно слово описания заменено, другой
+формат телефона, цена +-3%) и точные дубликаты после нормализации
+(регистр, пунктуация, формат телефона). Меряется время find_duplicates,
+полнота по перепостам и точность отмеченных дубликатов.
+
+Запуск из каталога streamlit/:
+    python -m benchmarks.bench_dedup [строк ...]
+
+Завершается с кодом 1, если полнота или точность ниже MIN_QUALITY.
+"""
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from realestate.dedup import find_duplicates
+from realestate.pipeline import prepare
+from realestate.synthetic import generate_raw_listings
+
+NEAR_SHARE = 0.05
+EXACT_SHARE = 0.02
+WORDS_PER_TEXT = 30
+VOCABULARY = 20000
+MIN_QUALITY = 0.95
+COLUMNS = ['Ad_ID', 'Description', 'Address', 'Phone_number',
+           'rooms_clean', 'total_area_clean', 'price_clean']
+
+
+def _vocabulary(rng, size):
+    """Случайные "слова" из русских слогов"""
+    syllables = np.array(['ка', 'ра', 'то', 'ми', 'не', 'ло', 'ст', 'во', 'да', 'ре',
+                          'по', 'ма', 'ни', 'ко', 'ле', 'за', 'ти', 'ро', 'бу', 'ше'])
+    parts = syllables[rng.integers(0, len(syllables), (size, 4))]
+    words = pd.Series(parts[:, 0]).str.cat([parts[:, 1], parts[:, 2], parts[:, 3]])
+    return np.array([f'{word}{i}' for i, word in enumerate(words)], dtype=object)
+
+
+def _texts(vocabulary, word_ids):
+    return [' '.join(words) for words in vocabulary[word_ids]]
+
+
+def make_listings(rows, seed=0):
+    """
+    Возвращает (фрейм, source): для перепостов source - позиция исходного
+    объявления, для уникальных -1; kind - 'near', 'exact' или ''.
+    """
+    rng = np.random.default_rng(seed)
+    n_near, n_exact = int(rows * NEAR_SHARE), int(rows * EXACT_SHARE)
+    n_base = rows - n_near - n_exact
+
+    base = prepare(generate_raw_listings(n_base, seed))[COLUMNS].reset_index(drop=True)
+    vocabulary = _vocabulary(rng, VOCABULARY)
+    words = rng.integers(0, VOCABULARY, (n_base, WORDS_PER_TEXT))
+    base['Description'] = _texts(vocabulary, words)
+    base['Address'] = base['Address'] + ', кв. ' + pd.Series(rng.integers(1, 500, n_base)).astype(str)
+
+    # Почти-дубликаты: другое слово в случайной позиции, другой телефон, цена +-3%
+    near_src = rng.integers(0, n_base, n_near)
+    near = base.iloc[near_src].reset_index(drop=True)
+    near_words = words[near_src].copy()
+    near_words[np.arange(n_near), rng.integers(0, WORDS_PER_TEXT, n_near)] = rng.integers(0, VOCABULARY, n_near)
+    near['Description'] = _texts(vocabulary, near_words)
+    near['Phone_number'] = '+7 9' + pd.Series(rng.integers(10**8, 10**9, n_near)).astype(str)
+    near['price_clean'] = (near['price_clean'] * rng.uniform(0.97, 1.03, n_near)).round(-2)
+
+    # Точные после нормализации: регистр, пунктуация, формат телефона
+    exact_src = rng.integers(0, n_base, n_exact)
+    exact = base.iloc[exact_src].reset_index(drop=True)
+    exact['Description'] = exact['Description'].str.upper() + '!!!'
+    exact['Phone_number'] = '8' + exact['Phone_number'].str.replace(r'\D', '', regex=True).str[1:]
+
+    frame = pd.concat([base, near, exact], ignore_index=True)
+    frame['Ad_ID'] = np.arange(len(frame)) + 300_000_000
+    source = np.concatenate([np.full(n_base, -1), near_src, exact_src])
+    kind = np.concatenate([np.full(n_base, ''), np.full(n_near, 'near'), np.full(n_exact, 'exact')])
+    return frame, source, kind
+
+
+def quality(clusters, source, kind):
+    """Полнота по перепостам каждого вида и точность отмеченных дубликатов"""
+    labels = clusters['cluster'].to_numpy()
+    flagged = clusters['duplicate'].to_numpy()
+    reposted = source >= 0
+    found = np.zeros(len(source), dtype=bool)
+    found[reposted] = labels[reposted] == labels[source[reposted]]
+    recall = {name: found[kind == name].mean() for name in ('near', 'exact')}
+    precision = (found & flagged).sum() / max(flagged.sum(), 1)
+    return recall, precision
+
+
+def main(sizes):
+    print(f'{"строк":>10} {"время, с":>9} {"строк/с":>10} {"кластеров":>10} '
+          f'{"полнота near":>13} {"полнота exact":>14} {"точность":>9}')
+    ok = True
+    for rows in sizes:
+        frame, source, kind = make_listings(rows)
+        start = time.perf_counter()
+        clusters = find_duplicates(frame)
+        seconds = time.perf_counter() - start
+        recall, precision = quality(clusters, source, kind)
+        n_clusters = clusters.loc[clusters['match'] != '', 'cluster'].nunique()
+        print(f'{rows:>10,} {seconds:>9.2f} {rows / seconds:>10,.0f} {n_clusters:>10,} '
+              f'{recall["near"]:>13.3f} {recall["exact"]:>14.3f} {precision:>9.3f}')
+        ok = ok and min(recall['near'], recall['exact'], precision) >= MIN_QUALITY
+    if not ok:
+        print(f'Ошибка: полнота или точность ниже {MIN_QUALITY}')
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main([int(arg) for arg in sys.argv[1:]] or [10_000, 100_000, 1_000_000]))
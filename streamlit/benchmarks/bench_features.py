@@ -0,0 +1,84 @@
+"""
+Бенчмарк хранилища признаков местоположения (realestate.features).
+
+По синтетической выгрузке строится хранилище и меряется: время построения
+и размер на диске, задержка lookup одного объявления по Ad_ID, пакетный
+lookup_many и features_for (строк в секунду), а также MAPE модели оценки
+аренды без признаков местоположения и с ними.
+
+В синтетической выгрузке цена не зависит от станции, поэтому MAPE на ней
+почти не меняется - выигрыш в точности виден только на реальной выгрузке.
+
+Запуск из каталога streamlit/:
+    python -m benchmarks.bench_features [строк]
+
+Завершается с кодом 1, если p99 lookup больше MAX_P99_MS.
+"""
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+from realestate.features import FeatureStore
+from realestate.scoring import RentModel, percentiles
+from realestate.synthetic import generate_raw_listings
+
+CALLS = 20_000
+MAX_P99_MS = 1.0
+
+
+def lookup_latencies(store, ids, calls):
+    """Задержки lookup по ids, по кругу"""
+    ids = [int(i) for i in ids]
+    seconds = np.empty(calls)
+    for i in range(calls):
+        ad_id = ids[i % len(ids)]
+        start = time.perf_counter()
+        store.lookup(ad_id)
+        seconds[i] = time.perf_counter() - start
+    return seconds
+
+
+def throughput(func, rows):
+    start = time.perf_counter()
+    func()
+    return rows / (time.perf_counter() - start)
+
+
+def main(rows=1_000_000):
+    raw = generate_raw_listings(rows)
+    ids = raw['ID  объявления'].to_numpy()
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp) / 'features'
+        start = time.perf_counter()
+        FeatureStore.build(raw, root)
+        build = time.perf_counter() - start
+        size = sum(path.stat().st_size for path in root.iterdir())
+        start = time.perf_counter()
+        store = FeatureStore(root)
+        load = time.perf_counter() - start
+        print(f'Строк: {rows:,}, построение {build:.2f} с, открытие {load:.3f} с, '
+              f'на диске {size / 2 ** 20:.1f} МБ ({size / rows:.1f} байт на строку)')
+
+        shuffled = np.random.default_rng(0).permutation(ids)
+        single = percentiles(lookup_latencies(store, shuffled, CALLS))
+        print(f'lookup: p50 {single["p50_ms"]:.4f} мс, p99 {single["p99_ms"]:.4f} мс')
+        print(f'lookup_many: {throughput(lambda: store.lookup_many(shuffled), rows):,.0f} строк/с')
+        print(f'features_for: {throughput(lambda: store.features_for(raw), rows):,.0f} строк/с')
+
+        train = raw.iloc[:min(rows, 200_000)]
+        plain = RentModel.fit(train)
+        located = RentModel.fit(train, store=store)
+        print(f'MAPE на отложенной выборке: без местоположения {plain.metrics["holdout_mape"]:.2f}%, '
+              f'с местоположением {located.metrics["holdout_mape"]:.2f}%')
+
+    if single['p99_ms'] > MAX_P99_MS:
+        print(f'Ошибка: p99 lookup {single["p99_ms"]:.4f} мс больше {MAX_P99_MS} мс')
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(*[int(arg) for arg in sys.argv[1:]]))
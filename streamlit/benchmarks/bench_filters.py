@@ -0,0 +1,125 @@
+"""
+Бенчмарк интерактивных фильтров (realestate.filters) против масок pandas.
+
+По синтетической выгрузке строится аналитический фрейм и индекс фильтров,
+затем QUERIES случайных сочетаний фильтров (диапазоны цены, площади,
+потолков, наборы комнат и станций - от широких до узких) считаются
+индексом и булевыми масками pandas по всему фрейму. Печатаются время
+построения индекса и p50/p99 запроса со сводкой, проверяется совпадение
+числа строк и медиан.
+
+Запуск из каталога streamlit/:
+    python -m benchmarks.bench_filters [строк]
+
+Завершается с кодом 1, если p99 запроса индексом больше MAX_P99_MS или
+результаты расходятся.
+"""
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from realestate.filters import FilterIndex, room_codes, station_codes
+from realestate.frame import build_analysis_frame
+from realestate.scoring import percentiles
+from realestate.synthetic import generate_raw_listings
+
+QUERIES = 200
+MAX_P99_MS = 100
+SEED = 0
+
+
+def random_filters(index, rng):
+    """Случайное сочетание фильтров: каждый включен с вероятностью 1/2"""
+    filters = {}
+    for column in index.ranges:
+        if rng.random() < 0.5:
+            low, high = index.bounds(column)
+            a, b = np.sort(rng.uniform(low, high, 2))
+            filters[column] = (float(a), float(b))
+    for name in index.categories:
+        if rng.random() < 0.5:
+            options = index.options(name)
+            filters[name] = list(rng.choice(options, rng.integers(1, min(len(options), 4) + 1), replace=False))
+    return filters
+
+
+def pandas_summary(analysis, rooms, stations, filters):
+    """Та же сводка булевыми масками по всему фрейму"""
+    mask = pd.Series(True, index=analysis.index)
+    for name, value in filters.items():
+        if name == 'rooms':
+            mask &= rooms.isin(value)
+        elif name == 'metro':
+            mask &= stations.isin(value)
+        else:
+            mask &= analysis[name].between(np.float32(value[0]), np.float32(value[1]))
+    selected = analysis[mask]
+    return {
+        'count': len(selected),
+        'price_median': selected['price_clean'].astype('float64').median(),
+        'area_median': selected['total_area_clean'].astype('float64').median(),
+        'rooms': selected['price_clean'].astype('float64').groupby(rooms[mask]).median(),
+    }
+
+
+def same(index_summary, expected):
+    if index_summary['count'] != expected['count']:
+        return False
+    for key in ('price_median', 'area_median'):
+        if not np.isclose(index_summary[key], expected[key], rtol=1e-6, equal_nan=True):
+            return False
+    if not expected['count']:
+        return True
+    rooms = index_summary['rooms']['Медианная цена']
+    expected_rooms = expected['rooms'].reindex(rooms.index)
+    return bool(np.allclose(rooms.to_numpy(), expected_rooms.to_numpy(), rtol=1e-6, equal_nan=True))
+
+
+def main(rows=1_000_000):
+    analysis = build_analysis_frame(generate_raw_listings(rows))
+    start = time.perf_counter()
+    index = FilterIndex(analysis)
+    build = time.perf_counter() - start
+    print(f'Строк: {rows:,}, построение индекса {build:.2f} с')
+
+    room_labels = np.array(index.categories['rooms'].labels, dtype=object)
+    rooms = pd.Series(room_labels[room_codes(analysis['rooms_clean'].to_numpy())], index=analysis.index)
+    stations = None
+    if 'Metro' in analysis.columns:
+        codes, names = station_codes(analysis['Metro'])
+        stations = pd.Series(np.array(names, dtype=object)[codes], index=analysis.index)
+
+    rng = np.random.default_rng(SEED)
+    queries = [random_filters(index, rng) for _ in range(QUERIES)]
+    indexed, masked, selected, ok = [], [], [], True
+    for filters in queries:
+        start = time.perf_counter()
+        summary = index.summary(filters)
+        indexed.append(time.perf_counter() - start)
+        start = time.perf_counter()
+        expected = pandas_summary(analysis, rooms, stations, filters)
+        masked.append(time.perf_counter() - start)
+        selected.append(summary['count'])
+        if not same(summary, expected):
+            ok = False
+            print(f'Расхождение: {filters}')
+
+    indexed, masked = percentiles(indexed), percentiles(masked)
+    print(f'Строк в выборке: медиана {np.median(selected):,.0f}, от {min(selected):,} до {max(selected):,}')
+    print(f'{"способ":>8} {"p50, мс":>9} {"p99, мс":>9}')
+    print(f'{"индекс":>8} {indexed["p50_ms"]:>9.1f} {indexed["p99_ms"]:>9.1f}')
+    print(f'{"pandas":>8} {masked["p50_ms"]:>9.1f} {masked["p99_ms"]:>9.1f}')
+
+    if not ok:
+        print('Ошибка: сводка индекса отличается от масок pandas')
+        return 1
+    if indexed['p99_ms'] > MAX_P99_MS:
+        print(f'Ошибка: p99 запроса {indexed["p99_ms"]:.1f} мс больше {MAX_P99_MS} мс')
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(*[int(arg) for arg in sys.argv[1:]]))
@@ -0,0 +1,89 @@
+"""
+Бенчмарк моделей оценки аренды: кросс-валидация (realestate.evaluation).
+
+Для каждой модели печатаются MAPE по фолдам (среднее и разброс) против
+цели TARGET_MAPE, время обучения, скорость оценки и пиковая память.
+Результат записывается в JSON (--output), его можно сравнить со следующим
+запуском (--compare): печатается изменение MAPE и времени обучения.
+
+Признаки, фолды и результаты пар (модель, фолд) кэшируются в каталоге
+кэша датасета (REA_CACHE_DIR), поэтому повторный запуск и запуск с новой
+моделью считают только недостающее; --force пересчитывает все.
+
+Запуск из каталога streamlit/:
+    python -m benchmarks.bench_models ["../release 3/teamA_data.csv"]
+        [--models knn ridge_log] [--workers 4] [--folds 5]
+        [--output models.json] [--compare previous.json] [--force]
+"""
+import argparse
+import json
+import sys
+import time
+from datetime import datetime, timezone
+
+from realestate.evaluation import MODELS, CrossValidation, summarize
+from realestate.features import FOLDS
+
+DEFAULT_DATA = '../release 3/teamA_data.csv'
+TARGET_MAPE = 30
+
+
+def print_summary(summary, previous=None):
+    print(f'{"модель":>16} {"MAPE, %":>8} {"±":>5} {"к цели":>7} {"обучение, с":>12} '
+          f'{"строк/с":>12} {"память, МБ":>11}' + (f' {"Δ MAPE":>7} {"Δ обучение":>11}' if previous else ''))
+    for name, row in sorted(summary.items(), key=lambda item: item[1]['mape']):
+        line = (f'{name:>16} {row["mape"]:>8.2f} {row["mape_std"]:>5.2f} {row["mape"] - TARGET_MAPE:>+7.1f} '
+                f'{row["fit_seconds"]:>12.3f} {row["predict_rows_per_s"]:>12,.0f} {row["peak_memory_mb"]:>11.1f}')
+        if previous:
+            before = previous.get(name)
+            if before:
+                line += (f' {row["mape"] - before["mape"]:>+7.2f}'
+                         f' {row["fit_seconds"] / max(before["fit_seconds"], 1e-9):>10.2f}x')
+            else:
+                line += f' {"новая":>7}'
+        print(line)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Кросс-валидация моделей оценки аренды')
+    parser.add_argument('data', nargs='?', default=DEFAULT_DATA, help='CSV или Parquet с объявлениями')
+    parser.add_argument('--models', nargs='+', choices=list(MODELS), help='модели (по умолчанию все)')
+    parser.add_argument('--workers', type=int, help='процессов (по умолчанию по числу ядер)')
+    parser.add_argument('--folds', type=int, default=FOLDS)
+    parser.add_argument('--output', help='JSON с результатами')
+    parser.add_argument('--compare', help='JSON предыдущего запуска')
+    parser.add_argument('--force', action='store_true', help='пересчитать закэшированные результаты')
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    cv = CrossValidation.for_file(args.data, args.folds)
+    prepared = time.perf_counter() - start
+    start = time.perf_counter()
+    results = cv.run(args.models, args.workers, args.force)
+    print(f'Данные: {args.data}, фолдов: {args.folds}, подготовка {prepared:.2f} с, '
+          f'модели {time.perf_counter() - start:.2f} с (кэш: {cv.root})')
+
+    summary = summarize(results)
+    previous = None
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            previous = json.load(f)['models']
+    print_summary(summary, previous)
+
+    if args.output:
+        report = {
+            'data': args.data,
+            'cache': str(cv.root),
+            'folds': args.folds,
+            'target_mape': TARGET_MAPE,
+            'created': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'models': summary,
+            'results': results,
+        }
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
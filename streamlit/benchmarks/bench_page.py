@@ -0,0 +1,178 @@
+"""
+Бенчмарк страниц дашборда main1.py и pages/page1.py через AppTest.
+
+Для каждого размера синтетическая выгрузка в формате исходного CSV
+(realestate.synthetic: цены "... руб./ За месяц", площади
+"общая/жилая/кухня" и т.д.) пишется на диск блоками, затем каждая
+страница меряется в отдельных процессах:
+
+- cold_s - первый запуск с пустым кэшем: разбор CSV, Parquet, аналитический
+  фрейм, сводки и графики;
+- restart_s - первый запуск нового процесса с заполненным кэшем на диске
+  (перезапуск сервера);
+- warm_s - медиана RERUNS повторных прогонов в том же процессе;
+- peak_mb, restart_peak_mb - пиковый RSS процессов холодного запуска и
+  перезапуска (VmHWM).
+
+Пороги: повторный прогон любой страницы на любом размере не дольше
+WARM_MAX_S; с --baseline каждая метрика сравнивается с прошлым запуском
+(--output) и не должна вырасти больше чем на TOLERANCE (доля) плюс SLACK.
+Процесс, которому не хватило памяти, - тоже провал.
+
+По умолчанию размеры SIZES; --large добавляет LARGE_SIZES - холодный запуск
+на них требует нескольких гигабайт памяти и на обычной машине
+разработчика не проходит.
+
+Запуск из каталога streamlit/:
+    python -m benchmarks.bench_page [строк ...] [--large] [--pages main1 page1]
+        [--output page.json] [--baseline previous.json]
+
+Завершается с кодом 1, если порог превышен или страница упала.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+APP_DIR = Path(__file__).resolve().parent.parent
+PAGES = {
+    'main1': APP_DIR / 'main1.py',
+    'page1': APP_DIR / 'pages' / 'page1.py',
+}
+SIZES = [10_000, 100_000, 1_000_000]
+LARGE_SIZES = [2_000_000]
+RERUNS = 5
+TIMEOUT_S = 3600
+
+WARM_MAX_S = 1.5
+# Допустимый рост метрики относительно --baseline: доля и абсолютный запас
+TOLERANCE = {'cold_s': 0.3, 'restart_s': 0.3, 'warm_s': 0.3, 'peak_mb': 0.15, 'restart_peak_mb': 0.15}
+SLACK = {'cold_s': 0.5, 'restart_s': 0.3, 'warm_s': 0.1, 'peak_mb': 30, 'restart_peak_mb': 30}
+
+
+def _measure(page, reruns):
+    """Выполняется в дочернем процессе: первый запуск и reruns повторных прогонов"""
+    import logging
+
+    from streamlit.testing.v1 import AppTest
+
+    from realestate.instrument import peak_rss_mb
+
+    logging.disable(logging.WARNING)
+    app = AppTest.from_file(str(page), default_timeout=TIMEOUT_S)
+    start = time.perf_counter()
+    app.run()
+    first = time.perf_counter() - start
+    if app.exception:
+        raise RuntimeError(app.exception[0].value)
+
+    warm = []
+    for _ in range(reruns):
+        start = time.perf_counter()
+        app.run()
+        warm.append(time.perf_counter() - start)
+    return {'first_s': first, 'warm_s': statistics.median(warm) if warm else None, 'peak_mb': peak_rss_mb()}
+
+
+def run_page(page, csv_path, cache_dir, reruns=RERUNS):
+    """Замер в отдельном процессе; None, если процессу не хватило памяти"""
+    env = dict(os.environ, REA_DATA_SOURCE=str(csv_path), REA_CACHE_DIR=str(cache_dir),
+               PYTHONPATH=str(APP_DIR))
+    proc = subprocess.run(
+        [sys.executable, '-m', 'benchmarks.bench_page', '--child', str(page), str(reruns)],
+        cwd=APP_DIR, env=env, capture_output=True, text=True,
+    )
+    if proc.returncode == -9:
+        return None
+    if proc.returncode != 0:
+        raise RuntimeError(f'Замер {page} завершился с ошибкой:\n{proc.stderr}')
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def measure(page, csv_path, cache_dir):
+    """Метрики страницы: холодный запуск с повторами, затем перезапуск процесса"""
+    cold = run_page(page, csv_path, cache_dir)
+    if cold is None:
+        return None
+    restart = run_page(page, csv_path, cache_dir, reruns=0)
+    if restart is None:
+        return None
+    return {
+        'cold_s': cold['first_s'],
+        'restart_s': restart['first_s'],
+        'warm_s': cold['warm_s'],
+        'peak_mb': cold['peak_mb'],
+        'restart_peak_mb': restart['peak_mb'],
+    }
+
+
+def regressions(key, result, baseline):
+    """Нарушенные пороги результата key: абсолютный и относительно baseline"""
+    problems = []
+    if result['warm_s'] > WARM_MAX_S:
+        problems.append(f'{key}: повторный прогон {result["warm_s"]:.2f} с больше {WARM_MAX_S} с')
+    before = (baseline or {}).get(key)
+    if before:
+        for metric, share in TOLERANCE.items():
+            limit = before[metric] * (1 + share) + SLACK[metric]
+            if result[metric] > limit:
+                problems.append(f'{key}: {metric} {result[metric]:.2f} больше порога {limit:.2f} '
+                                f'(было {before[metric]:.2f})')
+    return problems
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Бенчмарк страниц дашборда через AppTest')
+    parser.add_argument('sizes', nargs='*', type=int, default=SIZES, help='число строк выгрузки')
+    parser.add_argument('--large', action='store_true', help=f'добавить размеры {LARGE_SIZES}')
+    parser.add_argument('--pages', nargs='+', choices=sorted(PAGES), default=list(PAGES))
+    parser.add_argument('--output', help='JSON с результатами')
+    parser.add_argument('--baseline', help='JSON прошлого запуска для проверки регрессий')
+    args = parser.parse_args(argv)
+    sizes = args.sizes + [rows for rows in LARGE_SIZES if rows not in args.sizes] if args.large else args.sizes
+
+    from realestate.synthetic import write_raw_csv
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)['results']
+
+    results, problems = {}, []
+    print(f'{"страница":>9} {"строк":>10} {"холодный, с":>12} {"перезапуск, с":>14} {"повтор, с":>10} '
+          f'{"пик, МБ":>8} {"пик перезапуска, МБ":>20}')
+    for rows in sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            csv_path = write_raw_csv(Path(tmp) / f'listings-{rows}.csv', rows)
+            for name in args.pages:
+                key = f'{name}/{rows}'
+                result = measure(PAGES[name], csv_path, Path(tmp) / f'cache-{name}')
+                if result is None:
+                    print(f'{name:>9} {rows:>10,} {"нет памяти":>12}')
+                    problems.append(f'{key}: процессу не хватило памяти')
+                    continue
+                results[key] = result
+                print(f'{name:>9} {rows:>10,} {result["cold_s"]:>12.2f} {result["restart_s"]:>14.2f} '
+                      f'{result["warm_s"]:>10.3f} {result["peak_mb"]:>8.0f} {result["restart_peak_mb"]:>20.0f}')
+                problems.extend(regressions(key, result, baseline))
+
+    if args.output:
+        report = {'created': datetime.now(timezone.utc).isoformat(timespec='seconds'), 'results': results}
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    for problem in problems:
+        print(f'Ошибка: {problem}')
+    return 1 if problems else 0
+
+
+if __name__ == '__main__':
+    if sys.argv[1:2] == ['--child']:
+        print(json.dumps(_measure(sys.argv[2], int(sys.argv[3]))))
+        sys.exit(0)
+    sys.exit(main())
@@ -0,0 +1,77 @@
+"""
+Бенчмарк параллельной очистки (realestate.parallel) по числу процессов.
+
+Синтетическая выгрузка очищается clean_listings последовательно и
+с разбором полей на 2, 4, ... процессах - до числа доступных ядер или по
+заданному списку. Для каждого числа процессов печатается время, ускорение
+относительно последовательного запуска и совпадение результата.
+
+Процессы ускоряют только разбор полей, поэтому печатается и его доля в
+последовательном времени, и предел ускорения по закону Амдала - на машине
+с одним ядром фактическое ускорение не больше 1.
+
+Запуск из каталога streamlit/:
+    python -m benchmarks.bench_parallel [строк] [процессов ...]
+
+Завершается с кодом 1, если результат хоть одного запуска отличается от
+последовательного.
+"""
+import sys
+import time
+
+from realestate.parallel import default_workers
+from realestate.parsing import parse_listing_fields
+from realestate.pipeline import clean_listings
+from realestate.synthetic import generate_raw_listings
+
+REPEATS = 3
+
+
+def best_time(func):
+    """Лучшее время и результат из REPEATS запусков"""
+    timings = []
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        result = func()
+        timings.append(time.perf_counter() - start)
+    return min(timings), result
+
+
+def worker_counts(limit):
+    counts, workers = [], 2
+    while workers < limit:
+        counts.append(workers)
+        workers *= 2
+    return counts + [limit] if limit > 1 else counts
+
+
+def main(rows=500_000, workers=None):
+    raw = generate_raw_listings(rows)
+    workers = workers or worker_counts(default_workers())
+
+    serial_time, (expected, expected_stats) = best_time(lambda: clean_listings(raw))
+    parallel_part, _ = best_time(lambda: parse_listing_fields(raw))
+    share = min(parallel_part / serial_time, 1.0)
+    print(f'Строк: {rows:,}, доступно ядер: {default_workers()}')
+    print(f'Доля разбора полей в последовательном времени: {share:.0%}')
+    print(f'{"процессов":>10} {"время, с":>9} {"ускорение":>10} {"предел":>7} {"совпадает":>10}')
+    print(f'{1:>10} {serial_time:>9.2f} {1.0:>10.2f} {1.0:>7.2f} {"да":>10}')
+
+    ok = True
+    for count in workers:
+        # Первый запуск поднимает forkserver, best_time его не учитывает
+        seconds, (actual, stats) = best_time(lambda: clean_listings(raw, workers=count))
+        same = stats == expected_stats and actual.equals(expected) and (actual.dtypes == expected.dtypes).all()
+        ok = ok and same
+        limit = 1 / (1 - share + share / count)
+        print(f'{count:>10} {seconds:>9.2f} {serial_time / seconds:>10.2f} {limit:>7.2f} '
+              f'{"да" if same else "НЕТ":>10}')
+    if not ok:
+        print('Ошибка: результат параллельной очистки отличается от последовательной')
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    args = [int(arg) for arg in sys.argv[1:]]
+    sys.exit(main(*args[:1], workers=args[1:] or None))
@@ -0,0 +1,70 @@
+"""
+Бенчмарк разбора цен: построчный clean_price через apply против parse_price.
+
+Запуск из каталога streamlit/:
+    python -m benchmarks.bench_parsing [строк]
+
+Печатается ускорение одного вызова parse_price против своего эталона
+apply(clean_price) на той же колонке (около x10) и отрисовки старой
+страницы, где clean_price вызывался трижды, а теперь разбор выполняется
+один раз на версию датасета (около x30). Порог MIN_SPEEDUP - для одного
+вызова, с запасом в два раза от обычного значения, чтобы шум машины не
+давал ложных провалов. Завершается с кодом 1, если ускорение меньше
+MIN_SPEEDUP или результаты расходятся.
+"""
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from realestate.parsing import ARROW_STRING, clean_price, parse_listing_fields, parse_price
+from realestate.synthetic import generate_raw_listings
+
+MIN_SPEEDUP = 5
+REPEATS = 15
+
+
+def best_time(func):
+    """Лучшее время из REPEATS запусков после прогрева"""
+    func()
+    timings = []
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main(rows=23368):
+    # Старый путь: object-колонка после pd.read_csv и apply(clean_price).
+    # Новый: Arrow-строки, как они читаются из Parquet-кэша
+    raw = generate_raw_listings(rows)
+    loaded = raw.astype({col: ARROW_STRING for col in raw.select_dtypes(object).columns})
+    prices = raw['Цена']
+
+    expected = pd.to_numeric(prices.apply(clean_price), errors='coerce')
+    actual = parse_price(loaded['Цена'])
+    if not np.allclose(expected, actual, equal_nan=True):
+        print('Ошибка: результаты parse_price и clean_price расходятся')
+        return 1
+
+    apply_time = best_time(lambda: prices.apply(clean_price))
+    vector_time = best_time(lambda: parse_price(loaded['Цена']))
+    fields_time = best_time(lambda: parse_listing_fields(loaded))
+    speedup = apply_time / vector_time
+
+    print(f'Строк: {rows:,}')
+    print(f'apply(clean_price):       {apply_time * 1000:8.2f} мс')
+    print(f'parse_price:              {vector_time * 1000:8.2f} мс  (x{speedup:.1f})')
+    print(f'Страница, 3 x apply:      {3 * apply_time * 1000:8.2f} мс  (x{3 * speedup:.1f})')
+    print(f'parse_listing_fields:     {fields_time * 1000:8.2f} мс  (цена, площадь, комнаты, потолки)')
+
+    if speedup < MIN_SPEEDUP:
+        print(f'Ошибка: ускорение parse_price x{speedup:.1f} меньше x{MIN_SPEEDUP}')
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(*(int(arg) for arg in sys.argv[1:])))
@@ -0,0 +1,130 @@
+"""
+Бенчмарк потокового профиля (realestate.profile) против пересчета pandas.
+
+Синтетическая выгрузка добавляется в профиль блоками по BATCH_ROWS строк:
+печатается время обновления первым и последним блоком (оно не должно
+расти с числом уже учтенных строк) и время пересчета тех же сводок pandas
+по всему фрейму - столько стоило бы обновление без профиля. Затем
+выгрузка делится на PARTS частей, их профили складываются, и оба профиля
+(блоками и сложенный) сравниваются с pandas: профиль пропусков, count, min
+и max - точно, средние и корреляция - до RTOL, медианы групп - с ранговой
+ошибкой не больше profile.rank_error(0.5).
+
+Запуск из каталога streamlit/:
+    python -m benchmarks.bench_profile [строк]
+
+Завершается с кодом 1, если профиль расходится с pandas больше
+заявленного.
+"""
+import json
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from realestate.frame import build_analysis_frame
+from realestate.profile import BATCH_ROWS, GROUPS, PAIRS, VALUE, ListingProfile, rank_error
+from realestate.queries import PandasQueries
+from realestate.synthetic import generate_raw_listings
+
+METRICS = ('median', 'mean', 'count', 'min', 'max')
+PARTS = 4
+RTOL = 1e-6
+
+
+def pandas_summaries(raw, analysis):
+    """Сводки профиля, посчитанные pandas по всему фрейму"""
+    queries = PandasQueries()
+    tables = {'missing': queries.missing_profile(raw)}
+    for group in GROUPS:
+        if group in analysis.columns:
+            tables[group] = queries.group_stats(analysis, group, VALUE, METRICS)
+    for x, y in PAIRS:
+        tables[(x, y)] = queries.pair_summary(analysis, x, y)
+    return tables
+
+
+def median_rank_error(analysis, group, medians):
+    """Наибольшая ранговая ошибка медиан групп по точным значениям"""
+    worst = 0.0
+    data = analysis[[group, VALUE]].dropna()
+    for key, part in data.groupby(group, observed=True)[VALUE]:
+        values = np.sort(part.to_numpy('float64'))
+        median = float(medians.loc[key])
+        lower = np.searchsorted(values, median, 'left') / len(values)
+        upper = np.searchsorted(values, median, 'right') / len(values)
+        worst = max(worst, lower - 0.5, 0.5 - upper)
+    return worst
+
+
+def check(profile, expected, analysis):
+    """Список расхождений профиля с pandas"""
+    problems = []
+    try:
+        pd.testing.assert_frame_equal(profile.missing_profile(), expected['missing'])
+    except AssertionError:
+        problems.append('профиль пропусков')
+    bound = rank_error(0.5, profile.compression)
+    for group in GROUPS:
+        if group not in expected:
+            continue
+        table, exact = profile.group_stats(group, METRICS), expected[group]
+        try:
+            pd.testing.assert_frame_equal(table[['count', 'min', 'max']], exact[['count', 'min', 'max']])
+            pd.testing.assert_frame_equal(table[['mean']], exact[['mean']], rtol=RTOL)
+        except AssertionError:
+            problems.append(f'{group}: count/min/max/mean')
+        error = median_rank_error(analysis, group, table['median'])
+        if error > bound:
+            problems.append(f'{group}: ранговая ошибка медианы {error:.4f} больше {bound:.4f}')
+    for x, y in PAIRS:
+        try:
+            pd.testing.assert_frame_equal(profile.pair_summary(x, y), expected[(x, y)], rtol=RTOL)
+        except AssertionError:
+            problems.append(f'{x}/{y}: парная сводка')
+    return problems
+
+
+def main(rows=1_000_000):
+    raw = generate_raw_listings(rows)
+    analysis = build_analysis_frame(raw)
+
+    profile, updates = ListingProfile(), []
+    for start in range(0, rows, BATCH_ROWS):
+        batch = slice(start, start + BATCH_ROWS)
+        begin = time.perf_counter()
+        profile.update(raw.iloc[batch], analysis.iloc[batch])
+        updates.append(time.perf_counter() - begin)
+
+    begin = time.perf_counter()
+    expected = pandas_summaries(raw, analysis)
+    rescan = time.perf_counter() - begin
+
+    parts = [ListingProfile().update(raw.iloc[i::PARTS], analysis.iloc[i::PARTS]) for i in range(PARTS)]
+    begin = time.perf_counter()
+    merged = parts[0]
+    for part in parts[1:]:
+        merged.merge(part)
+    merge = time.perf_counter() - begin
+
+    size = len(json.dumps(profile.to_dict())) / 2**10
+    print(f'Строк: {rows:,}, блок {BATCH_ROWS:,} строк, профиль {size:,.0f} КБ')
+    print(f'Обновление блоком: первый {updates[0]:.3f} с, последний {updates[-1]:.3f} с')
+    print(f'Пересчет pandas по всему фрейму: {rescan:.3f} с')
+    print(f'Сложение {PARTS} частей: {merge * 1000:.1f} мс')
+
+    ok = True
+    for name, candidate in (('блоками', profile), ('по частям', merged)):
+        problems = check(candidate, expected, analysis)
+        for problem in problems:
+            print(f'Расхождение ({name}): {problem}')
+        ok = ok and not problems
+    if not ok:
+        print('Ошибка: профиль отличается от pandas больше заявленного')
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(*[int(arg) for arg in sys.argv[1:]]))
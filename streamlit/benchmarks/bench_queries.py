@@ -0,0 +1,156 @@
+"""
+Бенчмарк исполнителей сводок дашборда (realestate.queries): pandas и DuckDB.
+
+Для каждого размера синтетическая выгрузка записывается в кэш как
+listings-<версия>.parquet вместе с analysis-<версия>.parquet, затем сводки
+страницы pages/page1.py (профиль пропусков, статистики цены по разрешению
+на детей/животных, по ремонту и по высоте потолков, парная сводка) считаются
+каждым исполнителем в отдельном процессе, чтобы пиковый RSS не смешивался.
+Для pandas в время входит чтение фреймов из Parquet - без них ему нечего
+считать, DuckDB читает файлы сам. Пиковая память - VmHWM процесса
+(ru_maxrss наследуется от родителя через exec). Если процессу не хватило
+памяти, вместо замера печатается "нет памяти".
+
+Выгрузка пишется блоками по BLOCK_ROWS строк, чтобы сам бенчмарк не
+держал ее в памяти. Для размеров до COMPARE_MAX_ROWS результаты
+исполнителей сравниваются: counts, min, max, медианы и профиль пропусков
+должны совпасть точно, средние и корреляция - до RTOL.
+
+Запуск из каталога streamlit/ (нужен пакет duckdb):
+    python -m benchmarks.bench_queries [строк ...]
+
+Завершается с кодом 1, если результаты исполнителей расходятся.
+"""
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from realestate.data import Dataset, dataset_path, read_cached
+from realestate.frame import analysis_path, build_analysis_frame
+from realestate.instrument import peak_rss_mb
+from realestate.queries import DuckDBQueries, PandasQueries
+from realestate.synthetic import generate_raw_listings
+
+APP_DIR = Path(__file__).resolve().parent.parent
+METRICS = ('median', 'mean', 'count', 'min', 'max')
+GROUPS = ('Children_pets', 'Renovation', 'Ceiling_height')
+RTOL = 1e-6
+BLOCK_ROWS = 250_000
+COMPARE_MAX_ROWS = 1_000_000
+
+
+def write_dataset(root, version, rows):
+    """Синтетическая выгрузка и ее аналитический фрейм в кэше root, блоками"""
+    dataset = Dataset(None, version, dataset_path(root, version))
+    writers = {}
+    try:
+        for i, start in enumerate(range(0, rows, BLOCK_ROWS)):
+            raw = generate_raw_listings(min(BLOCK_ROWS, rows - start), seed=i, start=start)
+            tables = {
+                dataset.path: pa.Table.from_pandas(raw, preserve_index=False),
+                analysis_path(dataset): pa.Table.from_pandas(build_analysis_frame(raw)),
+            }
+            for path, table in tables.items():
+                if path not in writers:
+                    writers[path] = pq.ParquetWriter(path, table.schema)
+                writers[path].write_table(table.cast(writers[path].schema))
+    finally:
+        for writer in writers.values():
+            writer.close()
+
+
+def page_summaries(queries, df, analysis):
+    """Сводки страницы в том же составе, что и в pages/page1.py"""
+    tables = {'missing': queries.missing_profile(df)}
+    for group in GROUPS:
+        tables[group] = queries.group_stats(analysis, group, 'price_clean', METRICS)
+    tables['pair'] = queries.pair_summary(analysis, 'Ceiling_height', 'price_clean')
+    return tables
+
+
+def _measure(backend, root, version):
+    """Выполняется в дочернем процессе: время и пиковая память одного исполнителя"""
+    dataset = Dataset(None, version, dataset_path(Path(root), version))
+    baseline = peak_rss_mb()
+    start = time.perf_counter()
+    if backend == 'pandas':
+        df = read_cached(dataset.path)
+        analysis = pd.read_parquet(analysis_path(dataset))
+        page_summaries(PandasQueries(), df, analysis)
+    else:
+        columns = pd.DataFrame(columns=[])
+        page_summaries(DuckDBQueries(dataset.path, analysis_path(dataset)), columns, columns)
+    seconds = time.perf_counter() - start
+    peak = peak_rss_mb()
+    return {'seconds': seconds, 'peak_rss_mb': peak, 'added_rss_mb': peak - baseline}
+
+
+def run_backend(backend, root, version):
+    env = dict(os.environ, PYTHONPATH=str(APP_DIR))
+    proc = subprocess.run(
+        [sys.executable, '-m', 'benchmarks.bench_queries', '--child', backend, str(root), version],
+        cwd=APP_DIR, env=env, capture_output=True, text=True,
+    )
+    if proc.returncode == -9:
+        return None
+    if proc.returncode != 0:
+        raise RuntimeError(f'Замер завершился с ошибкой:\n{proc.stderr}')
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def compare(dataset, analysis):
+    """Имена сводок, в которых исполнители расходятся"""
+    expected = page_summaries(PandasQueries(), dataset.frame, analysis)
+    actual = page_summaries(DuckDBQueries(dataset.path, analysis_path(dataset)), dataset.frame, analysis)
+    different = []
+    for name, table in expected.items():
+        exact = table.drop(columns=['mean', 'corr', 'mean_x', 'mean_y'], errors='ignore')
+        try:
+            pd.testing.assert_frame_equal(exact, actual[name][exact.columns], check_exact=True)
+            pd.testing.assert_frame_equal(table, actual[name], check_exact=False, rtol=RTOL)
+        except AssertionError:
+            different.append(name)
+    return different
+
+
+def main(sizes):
+    ok = True
+    print(f'{"строк":>10} {"исполнитель":>12} {"время, с":>9} {"пик RSS, МБ":>12} {"прирост, МБ":>12}')
+    for rows in sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            root, version = Path(tmp), f'bench{rows}'
+            write_dataset(root, version, rows)
+            if rows <= COMPARE_MAX_ROWS:
+                path = dataset_path(root, version)
+                dataset = Dataset(read_cached(path), version, path)
+                different = compare(dataset, pd.read_parquet(analysis_path(dataset)))
+                del dataset
+                if different:
+                    ok = False
+                    print(f'Расхождение на {rows:,} строках: {", ".join(different)}')
+            for backend in ('pandas', 'duckdb'):
+                result = run_backend(backend, root, version)
+                if result is None:
+                    print(f'{rows:>10,} {backend:>12} {"нет памяти":>9}')
+                    continue
+                print(f'{rows:>10,} {backend:>12} {result["seconds"]:>9.2f} '
+                      f'{result["peak_rss_mb"]:>12.0f} {result["added_rss_mb"]:>12.0f}')
+    if not ok:
+        print('Ошибка: сводки DuckDB отличаются от pandas')
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    if sys.argv[1:2] == ['--child']:
+        print(json.dumps(_measure(*sys.argv[2:5])))
+    else:
+        sys.exit(main([int(arg) for arg in sys.argv[1:]] or [100_000, 1_000_000, 2_000_000]))
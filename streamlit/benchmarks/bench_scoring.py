@@ -0,0 +1,95 @@
+"""
+Бенчмарк оценки стоимости аренды (realestate.scoring).
+
+Модель обучается на синтетической выгрузке и меряется тремя путями:
+predict_one в процессе (задержка одного объявления), HTTP-сервис на
+локальном порту (GET /predict, задержка с сетевым стеком) и пакетная
+оценка predict (строк в секунду).
+
+Запуск из каталога streamlit/:
+    python -m benchmarks.bench_scoring [строк для пакета ...]
+
+Завершается с кодом 1, если p99 predict_one больше MAX_P99_MS.
+"""
+import sys
+import threading
+import time
+from http.client import HTTPConnection
+from http.server import ThreadingHTTPServer
+
+import numpy as np
+import pandas as pd
+
+from realestate.pipeline import prepare
+from realestate.scoring import FEATURES, RentModel, make_handler, percentiles
+from realestate.synthetic import generate_raw_listings
+
+CALLS = 20_000
+HTTP_CALLS = 2_000
+MAX_P99_MS = 0.1
+
+
+def single_latencies(model, features, calls):
+    """Задержки predict_one по строкам features, по кругу"""
+    rows = features[FEATURES].to_numpy().tolist()
+    seconds = np.empty(calls)
+    for i in range(calls):
+        rooms, area, ceiling = rows[i % len(rows)]
+        start = time.perf_counter()
+        model.predict_one(rooms, area, ceiling)
+        seconds[i] = time.perf_counter() - start
+    return seconds
+
+
+def http_latencies(model, features, calls):
+    """Задержки GET /predict к сервису в отдельном потоке (новое соединение на запрос)"""
+    server = ThreadingHTTPServer(('127.0.0.1', 0), make_handler(model))
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    rows = features[FEATURES].to_numpy().tolist()
+    seconds = np.empty(calls)
+    try:
+        for i in range(calls):
+            rooms, area, ceiling = rows[i % len(rows)]
+            start = time.perf_counter()
+            connection = HTTPConnection('127.0.0.1', server.server_port)
+            connection.request('GET', f'/predict?rooms={rooms}&total_area={area}&ceiling_height={ceiling}')
+            connection.getresponse().read()
+            connection.close()
+            seconds[i] = time.perf_counter() - start
+    finally:
+        server.shutdown()
+        server.server_close()
+    return seconds
+
+
+def main(sizes):
+    features = prepare(generate_raw_listings(50_000))
+    start = time.perf_counter()
+    model = RentModel.fit(features)
+    print(f'Обучение: {len(features):,} строк за {time.perf_counter() - start:.2f} с, '
+          f'MAPE на отложенной выборке {model.metrics["holdout_mape"]:.1f}%')
+
+    single = percentiles(single_latencies(model, features, CALLS))
+    http = percentiles(http_latencies(model, features, HTTP_CALLS))
+    print(f'{"путь":>12} {"p50, мс":>9} {"p99, мс":>9}')
+    print(f'{"predict_one":>12} {single["p50_ms"]:>9.4f} {single["p99_ms"]:>9.4f}')
+    print(f'{"HTTP GET":>12} {http["p50_ms"]:>9.3f} {http["p99_ms"]:>9.3f}')
+
+    print(f'{"строк":>12} {"время, с":>9} {"строк/с":>12}')
+    base = features[FEATURES]
+    for rows in sizes:
+        batch = pd.concat([base] * (rows // len(base) + 1), ignore_index=True).iloc[:rows]
+        start = time.perf_counter()
+        model.predict(batch)
+        seconds = time.perf_counter() - start
+        print(f'{rows:>12,} {seconds:>9.3f} {rows / seconds:>12,.0f}')
+
+    if single['p99_ms'] > MAX_P99_MS:
+        print(f'Ошибка: p99 predict_one {single["p99_ms"]:.4f} мс больше {MAX_P99_MS} мс')
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main([int(arg) for arg in sys.argv[1:]] or [10_000, 100_000, 1_000_000]))
@@ -0,0 +1,202 @@
+"""
+Бенчмарк времени до первой отрисовки страниц на новом процессе сервера.
+
+Для каждой страницы запускается настоящий сервер (streamlit run) на
+свободном порту. Бенчмарк ждет ответа /_stcore/health, подключается к
+/_stcore/stream, как браузер, запрашивает прогон страницы и записывает
+(все от запуска процесса):
+
+- ready_s - сервер отвечает на health;
+- first_paint_s - пришел первый элемент страницы (заголовок, текст или
+  спиннер загрузки);
+- done_s - скрипт страницы выполнен до конца (script_finished).
+
+Данные - синтетическая выгрузка (realestate.synthetic) на --rows строк.
+Кэш данных и графиков заполняется прогревочным запуском, который в замер не
+входит: меряется перезапуск сервера с готовым кэшем на диске. Каждая
+метрика - медиана --runs новых процессов.
+
+Пороги: первая отрисовка любой страницы не позже PAINT_MAX_S после
+готовности сервера; с --baseline каждая метрика сравнивается с прошлым
+запуском (--output) и не должна вырасти больше чем на TOLERANCE (доля)
+плюс SLACK секунд.
+
+Запуск из каталога streamlit/:
+    python -m benchmarks.bench_startup [--rows 100000] [--runs 3]
+        [--pages main1 page1] [--output startup.json] [--baseline previous.json]
+
+Завершается с кодом 1, если порог превышен или страница упала.
+"""
+import argparse
+import asyncio
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from datetime import datetime, timezone
+from pathlib import Path
+
+APP_DIR = Path(__file__).resolve().parent.parent
+MAIN_SCRIPT = APP_DIR / 'main1.py'
+# Страница -> page_name в запросе прогона ('' - главная)
+PAGES = {'main1': '', 'page1': 'page1'}
+ROWS = 100_000
+RUNS = 3
+TIMEOUT_S = 600
+POLL_S = 0.02
+
+PAINT_MAX_S = 1.0
+METRICS = ('ready_s', 'first_paint_s', 'done_s')
+TOLERANCE = 0.3
+SLACK = 0.3
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def _wait_ready(port, proc, log, deadline):
+    url = f'http://127.0.0.1:{port}/_stcore/health'
+    while time.perf_counter() < deadline:
+        if proc.poll() is not None:
+            log.seek(0)
+            raise RuntimeError(f'Сервер завершился с кодом {proc.returncode}:\n{log.read()}')
+        try:
+            with urllib.request.urlopen(url, timeout=1) as response:
+                response.read()
+            return
+        except OSError:
+            time.sleep(POLL_S)
+    raise TimeoutError('Сервер не ответил на health')
+
+
+async def _session(port, page_name, timeout):
+    """Прогон страницы через websocket: (время первого элемента, время конца прогона)"""
+    from streamlit.proto.BackMsg_pb2 import BackMsg
+    from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+    from tornado.websocket import websocket_connect
+
+    stream = await websocket_connect(f'ws://127.0.0.1:{port}/_stcore/stream')
+    request = BackMsg()
+    request.rerun_script.query_string = ''
+    request.rerun_script.page_name = page_name
+    await stream.write_message(request.SerializeToString(), binary=True)
+    first = None
+    try:
+        while True:
+            data = await asyncio.wait_for(stream.read_message(), timeout)
+            if data is None:
+                raise RuntimeError('Сервер закрыл соединение')
+            message = ForwardMsg()
+            message.ParseFromString(data)
+            kind = message.WhichOneof('type')
+            if kind == 'delta' and message.delta.WhichOneof('type') == 'new_element':
+                element = message.delta.new_element
+                if element.WhichOneof('type') == 'exception':
+                    raise RuntimeError(f'Исключение на странице: {element.exception.message}')
+                if first is None:
+                    first = time.perf_counter()
+            elif kind == 'script_finished':
+                return first, time.perf_counter()
+    finally:
+        stream.close()
+
+
+def run_server(page, env, timeout=TIMEOUT_S):
+    """Один новый процесс сервера: метрики METRICS в секундах от его запуска"""
+    port = _free_port()
+    log = tempfile.TemporaryFile('w+', encoding='utf-8')
+    start = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, '-m', 'streamlit', 'run', str(MAIN_SCRIPT),
+         '--server.headless', 'true', '--server.port', str(port),
+         '--server.fileWatcherType', 'none', '--browser.gatherUsageStats', 'false'],
+        cwd=APP_DIR, env=env, stdout=subprocess.DEVNULL, stderr=log,
+    )
+    try:
+        _wait_ready(port, proc, log, start + timeout)
+        ready = time.perf_counter()
+        first, done = asyncio.run(_session(port, PAGES[page], timeout))
+    finally:
+        proc.terminate()
+        try:
+            proc.wait(10)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+            proc.wait()
+        log.close()
+    return {'ready_s': ready - start, 'first_paint_s': (first or done) - start, 'done_s': done - start}
+
+
+def measure(page, env, runs):
+    """Прогревочный запуск, затем медианы метрик по runs новым процессам"""
+    run_server(page, env)
+    samples = [run_server(page, env) for _ in range(runs)]
+    return {metric: statistics.median(sample[metric] for sample in samples) for metric in METRICS}
+
+
+def regressions(page, result, baseline):
+    """Нарушенные пороги страницы: абсолютный и относительно baseline"""
+    problems = []
+    paint = result['first_paint_s'] - result['ready_s']
+    if paint > PAINT_MAX_S:
+        problems.append(f'{page}: первая отрисовка через {paint:.2f} с после готовности сервера, '
+                        f'больше {PAINT_MAX_S} с')
+    before = (baseline or {}).get(page)
+    if before:
+        for metric in METRICS:
+            limit = before[metric] * (1 + TOLERANCE) + SLACK
+            if result[metric] > limit:
+                problems.append(f'{page}: {metric} {result[metric]:.2f} больше порога {limit:.2f} '
+                                f'(было {before[metric]:.2f})')
+    return problems
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Время до первой отрисовки на новом процессе сервера')
+    parser.add_argument('--rows', type=int, default=ROWS, help='строк синтетической выгрузки')
+    parser.add_argument('--runs', type=int, default=RUNS, help='новых процессов на страницу')
+    parser.add_argument('--pages', nargs='+', choices=sorted(PAGES), default=list(PAGES))
+    parser.add_argument('--output', help='JSON с результатами')
+    parser.add_argument('--baseline', help='JSON прошлого запуска для проверки регрессий')
+    args = parser.parse_args(argv)
+
+    from realestate.synthetic import write_raw_csv
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)['results']
+
+    results, problems = {}, []
+    print(f'{"страница":>9} {"сервер готов, с":>16} {"первая отрисовка, с":>20} {"прогон готов, с":>16}')
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_path = write_raw_csv(Path(tmp) / f'listings-{args.rows}.csv', args.rows)
+        env = dict(os.environ, REA_DATA_SOURCE=str(csv_path), REA_CACHE_DIR=str(Path(tmp) / 'cache'),
+                   PYTHONPATH=str(APP_DIR))
+        for page in args.pages:
+            result = measure(page, env, args.runs)
+            results[page] = result
+            print(f'{page:>9} {result["ready_s"]:>16.2f} {result["first_paint_s"]:>20.2f} '
+                  f'{result["done_s"]:>16.2f}')
+            problems.extend(regressions(page, result, baseline))
+
+    if args.output:
+        report = {'created': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+                  'rows': args.rows, 'results': results}
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    for problem in problems:
+        print(f'Ошибка: {problem}')
+    return 1 if problems else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
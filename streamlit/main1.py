@@ -1,13 +1,10 @@
 import streamlit as st
-import pandas as pd
-import matplotlib.pyplot as plt
-import seaborn as sns
-import warnings
-warnings.filterwarnings('ignore')
+# Страница - текстовый отчет: pandas и matplotlib здесь не нужны, графики
+# EDA отдаются готовыми PNG (python -m realestate.report)
+from realestate.report import EDA_HTML, eda_images
 #nazvanie
 #opisanie
 st.title('REAL ESTATE AGENCY')
-import streamlit as st
 
 
 
@@ -41,6 +38,18 @@ st.write("""
 - Изучены особенности и структура данных по аренде недвижимости в Москве
 """)
 
+# Графики показываются по переключателю: пока он выключен, прогон страницы
+# не читает изображения и не отправляет их в браузер
+if st.toggle("Показать графики EDA", key='eda_charts'):
+    images, manifest = eda_images()
+    if manifest is not None:
+        st.caption(f"Собраны по версии данных {manifest['version']} ({manifest['rows']:,} объявлений)")
+    for path, title in images:
+        st.image(str(path), caption=title, width='stretch')
+if EDA_HTML.exists():
+    st.download_button("Скачать HTML-отчет EDA", EDA_HTML.read_bytes(), file_name='EDA.html',
+                       mime='text/html')
+
 st.subheader("Релиз 2.0 - Очистка данных")
 st.write("""
 - Обработаны пропущенные значения (NaN, None)
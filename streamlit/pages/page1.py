@@ -1,53 +1,82 @@
 import streamlit as st
 import pandas as pd
-import matplotlib.pyplot as plt
-import seaborn as sns
 import warnings
 import numpy as np
 warnings.filterwarnings('ignore')
-from PIL import Image
-import os
-
-# Загрузка данных
-df = pd.read_csv('https://drive.google.com/uc?export=download&id=130KYOX8O4wrP_T8vdz2GfvJRQ03ONmE7')
-
-# Функция для очистки и преобразования цены
-def clean_price(price_str):
-    """
-    Преобразует строку цены в числовое значение
-    Пример: "500000.0 руб./ За месяц" -> 500000.0
-    """
-    if isinstance(price_str, str):
-        # Удаляем всё после "руб." и нечисловые символы
-        price_clean = price_str.split('руб.')[0].strip()
-        # Удаляем все пробелы и оставляем только цифры и точку
-        price_clean = ''.join(ch for ch in price_clean if ch.isdigit() or ch == '.')
-        try:
-            return float(price_clean) if price_clean else None
-        except ValueError:
-            return None
-    return price_str
+import time
+# matplotlib импортируется в функциях отрисовки: когда PNG графиков уже в кэше,
+# перезапуск сервера его не загружает
+from realestate.data import load_dataset, resolve_source
+from realestate.frame import load_analysis_frame
+from realestate.aggregates import AggregateStore
+from realestate.filters import RANGE_COLUMNS, FilterIndex
+from realestate.instrument import Rerun, timed
+from realestate.render import ChartCache, draw_scatter, lazy_tabs, scatter_settings
+
+# Загрузка данных: один раз на процесс, общая для всех сессий
+@st.cache_resource(show_spinner="Загрузка данных...")
+def get_dataset(source):
+    return load_dataset(source)
+
+# Типизированный фрейм для анализов: один раз на версию датасета
+# (и в Parquet рядом с кэшем). Общий для всех сессий, анализы его не изменяют
+@st.cache_resource(show_spinner=False)
+def get_analysis_frame(version, _dataset):
+    return load_analysis_frame(_dataset)
+
+# Сводные таблицы: считаются один раз на версию и хранятся рядом с кэшем.
+# Берутся из потокового профиля выгрузки (по умолчанию; медианы - точно по
+# фрейму) или считаются pandas / DuckDB по Parquet (REA_QUERY_BACKEND=pandas|duckdb)
+@st.cache_resource(show_spinner=False)
+def get_aggregate_store(version, _dataset):
+    return AggregateStore.for_dataset(_dataset)
+
+# Готовые PNG графиков: рисуются один раз на версию, исполнитель сводок и параметры
+@st.cache_resource(show_spinner=False)
+def get_chart_cache(version, source, _dataset):
+    return ChartCache.for_dataset(_dataset, source)
+
+# Индексы фильтров: строятся один раз на версию, запросы их не изменяют
+@st.cache_resource(show_spinner=False)
+def get_filter_index(version, _analysis):
+    return FilterIndex(_analysis)
+
+# Замеры этапов перезапуска: REA_DEBUG=1 или ?debug=1 - таблица в боковой
+# панели, REA_TIMING_LOG - журнал CSV/JSON, ?profile=1 - дамп cProfile
+rerun = Rerun.begin('page1')
+
+# finish() обязателен на любом пути выхода (исключение, st.stop(), перезапуск
+# по виджету), иначе tracemalloc и cProfile остаются включенными в процессе
+try:
+    with rerun.stage("Загрузка данных") as record:
+        dataset = get_dataset(resolve_source())
+        df = dataset.frame
+        record['rows'] = len(df)
+    with rerun.stage("Аналитический фрейм", len(df)):
+        analysis = get_analysis_frame(dataset.version, dataset)
+    with rerun.stage("Хранилища сводок и графиков"):
+        store = get_aggregate_store(dataset.version, dataset)
+        charts = get_chart_cache(dataset.version, store.queries.name, dataset)
+    with rerun.stage("Индекс фильтров", len(analysis)):
+        filter_index = get_filter_index(dataset.version, analysis)
+except BaseException:
+    rerun.finish()
+    raise
+
+# Высоты потолков хранятся во float32; для подписей округляем до сантиметров
+def ceiling_heights(index):
+    return pd.Index(index.astype('float64').round(2), name='Высота потолков, м')
 
 # Функция для анализа пропущенных значений
-def create_missing_data_analysis(df):
+@timed("Раздел: пропуски")
+def create_missing_data_analysis(missing_df):
     st.subheader("🔍 Анализ пропущенных значений")
-    
-    # Вычисляем пропущенные значения
-    missing_data = df.isnull().sum()
-    missing_percent = (missing_data / len(df)) * 100
-
-    # Создаем DataFrame с результатами
-    missing_df = pd.DataFrame({
-        'Колонка': missing_data.index,
-        'Пропущено': missing_data.values,
-        'Процент': missing_percent.values
-    }).sort_values('Пропущено', ascending=False)
 
     # Показываем общую статистику
     col1, col2, col3 = st.columns(3)
     
     with col1:
-        total_missing = missing_data.sum()
+        total_missing = missing_df['Пропущено'].sum()
         st.metric("Всего пропусков", f"{total_missing:,}")
     
     with col2:
@@ -58,44 +87,49 @@ def create_missing_data_analysis(df):
         complete_columns = len(missing_df[missing_df['Пропущено'] == 0])
         st.metric("Полностью заполненных", complete_columns)
 
-    # Создаем вкладки для разных представлений
-    tab1, tab2, tab3 = st.tabs(["📊 График", "📋 Таблица", "💡 Рекомендации"])
+    # Создаем вкладки для разных представлений (выполняется только открытая)
+    selected = lazy_tabs(["📊 График", "📋 Таблица", "💡 Рекомендации"], key="missing_tabs")
+
+    if selected == "📊 График":
+        def draw_missing_chart():
+            import matplotlib.pyplot as plt
 
-    with tab1:
-        # График пропущенных значений
-        fig, ax = plt.subplots(figsize=(12, 8))
+            # График пропущенных значений
+            fig, ax = plt.subplots(figsize=(12, 8))
         
-        # Фильтруем только колонки с пропусками
-        missing_plot = missing_df[missing_df['Пропущено'] > 0]
+            # Фильтруем только колонки с пропусками
+            missing_plot = missing_df[missing_df['Пропущено'] > 0]
         
-        if len(missing_plot) > 0:
-            # Создаем горизонтальный барплот
-            bars = ax.barh(missing_plot['Колонка'], missing_plot['Процент'], 
-                          color='lightcoral', edgecolor='darkred', alpha=0.7)
+            if len(missing_plot) > 0:
+                # Создаем горизонтальный барплот
+                bars = ax.barh(missing_plot['Колонка'], missing_plot['Процент'], 
+                              color='lightcoral', edgecolor='darkred', alpha=0.7)
             
-            ax.set_xlabel('Процент пропусков (%)', fontsize=12)
-            ax.set_title('Распределение пропущенных значений по колонкам', 
-                        fontsize=14, fontweight='bold', pad=20)
+                ax.set_xlabel('Процент пропусков (%)', fontsize=12)
+                ax.set_title('Распределение пропущенных значений по колонкам', 
+                            fontsize=14, fontweight='bold', pad=20)
             
-            # Добавляем значения на столбцы
-            for i, (idx, row) in enumerate(missing_plot.iterrows()):
-                ax.text(row['Процент'] + 1, i, 
-                       f'{row["Процент"]:.1f}% ({row["Пропущено"]} проп.)', 
-                       va='center', fontsize=10, fontweight='bold')
+                # Добавляем значения на столбцы
+                for i, (idx, row) in enumerate(missing_plot.iterrows()):
+                    ax.text(row['Процент'] + 1, i, 
+                           f'{row["Процент"]:.1f}% ({row["Пропущено"]} проп.)', 
+                           va='center', fontsize=10, fontweight='bold')
             
-            # Настройка внешнего вида
-            ax.grid(axis='x', alpha=0.3)
-            ax.set_axisbelow(True)
+                # Настройка внешнего вида
+                ax.grid(axis='x', alpha=0.3)
+                ax.set_axisbelow(True)
             
-        else:
-            ax.text(0.5, 0.5, 'Нет пропущенных значений! 🎉', 
-                   ha='center', va='center', transform=ax.transAxes, 
-                   fontsize=16, fontweight='bold', color='green')
+            else:
+                ax.text(0.5, 0.5, 'Нет пропущенных значений! 🎉', 
+                       ha='center', va='center', transform=ax.transAxes, 
+                       fontsize=16, fontweight='bold', color='green')
         
-        plt.tight_layout()
-        st.pyplot(fig)
+            plt.tight_layout()
+            return fig
 
-    with tab2:
+        st.image(charts.get('missing_barh', draw_missing_chart), width='stretch')
+
+    if selected == "📋 Таблица":
         # Таблица с детальной информацией
         st.write("**Детальная информация о пропущенных значениях:**")
         
@@ -106,7 +140,7 @@ def create_missing_data_analysis(df):
             display_df['Пропущено'] = display_df['Пропущено'].apply(lambda x: f"{x:,}")
             display_df['Процент'] = display_df['Процент'].apply(lambda x: f"{x}%")
             
-            st.dataframe(display_df, use_container_width=True)
+            st.dataframe(display_df, width='stretch')
             
             # Скачивание данных о пропусках
             csv = missing_df.to_csv(index=False).encode('utf-8')
@@ -119,7 +153,7 @@ def create_missing_data_analysis(df):
         else:
             st.success("🎉 В данных нет пропущенных значений!")
 
-    with tab3:
+    if selected == "💡 Рекомендации":
         st.write("**Рекомендации по обработке пропусков:**")
         
         if len(missing_df[missing_df['Пропущено'] > 0]) > 0:
@@ -150,49 +184,45 @@ def create_missing_data_analysis(df):
             st.success("**Отличные новости!** Все данные заполнены. Можно приступать к анализу.")
 
 # Функция для анализа животных/детей
-def create_animal_child_analysis(df):
+@timed("Раздел: дети и животные", rows=lambda category_stats: category_stats['count'].sum())
+def create_animal_child_analysis(category_stats):
     st.subheader("🐕‍🦺 Анализ цен по разрешению на детей и животных")
     
-    # Создаем копию DataFrame
-    df_clean = df.copy()
-    
-    # Преобразуем цену в числовой формат
-    df_clean['Цена_число'] = df_clean['Цена'].apply(clean_price)
-    
-    # Удаляем строки с отсутствующими значениями
-    df_clean = df_clean.dropna(subset=['Можно с детьми/животными', 'Цена_число'])
-    
-    # Группируем и считаем медианную цену
+    # Медианная цена по категориям из предрассчитанной сводки
     try:
-        animal_positive = df_clean.groupby("Можно с детьми/животными")["Цена_число"].median()
-        animal_positive = animal_positive.sort_values(ascending=False)
+        animal_positive = category_stats['median'].sort_values(ascending=False)
         
-        # Создаем график
-        fig, ax = plt.subplots(figsize=(10, 6))
+        # График (из кэша изображений)
+        def draw_animal_chart():
+            import matplotlib.pyplot as plt
+
+            fig, ax = plt.subplots(figsize=(10, 6))
         
-        colors = ['#FF6B6B', '#4ECDC4', '#45B7D1', '#96CEB4', '#FFEAA7']
-        bars = animal_positive.plot(kind="bar", color=colors, ax=ax)
+            colors = ['#FF6B6B', '#4ECDC4', '#45B7D1', '#96CEB4', '#FFEAA7']
+            bars = animal_positive.plot(kind="bar", color=colors, ax=ax)
         
-        ax.set_title("Медианная цена по разрешению на детей/животных", fontsize=14, fontweight='bold')
-        ax.set_ylabel("Цена (руб)", fontsize=12)
-        ax.set_xlabel("")
-        ax.grid(axis='y', alpha=0.3)
-        ax.tick_params(axis='x', rotation=45)
+            ax.set_title("Медианная цена по разрешению на детей/животных", fontsize=14, fontweight='bold')
+            ax.set_ylabel("Цена (руб)", fontsize=12)
+            ax.set_xlabel("")
+            ax.grid(axis='y', alpha=0.3)
+            ax.tick_params(axis='x', rotation=45)
         
-        # Добавляем значения на столбцы
-        for i, v in enumerate(animal_positive.values):
-            ax.text(i, v + max(animal_positive.values) * 0.01, 
-                   f'{v:,.0f} руб', 
-                   ha='center', va='bottom', fontweight='bold', fontsize=10)
+            # Добавляем значения на столбцы
+            for i, v in enumerate(animal_positive.values):
+                ax.text(i, v + max(animal_positive.values) * 0.01, 
+                       f'{v:,.0f} руб', 
+                       ha='center', va='bottom', fontweight='bold', fontsize=10)
         
-        plt.tight_layout()
-        st.pyplot(fig)
+            plt.tight_layout()
+            return fig
+
+        st.image(charts.get('children_pets_bar', draw_animal_chart), width='stretch')
         
         # Статистика
         col1, col2, col3 = st.columns(3)
         
         with col1:
-            total_ads = len(df_clean)
+            total_ads = int(category_stats['count'].sum())
             st.metric("Всего объявлений", total_ads)
         
         with col2:
@@ -206,9 +236,7 @@ def create_animal_child_analysis(df):
         # Детальная таблица
         st.subheader("Детальная статистика по категориям")
         
-        detailed_stats = df_clean.groupby("Можно с детьми/животными").agg({
-            'Цена_число': ['median', 'mean', 'count', 'min', 'max']
-        }).round(0)
+        detailed_stats = category_stats[['median', 'mean', 'count', 'min', 'max']].round(0)
         
         # Упрощаем названия колонок
         detailed_stats.columns = ['Медиана', 'Среднее', 'Количество', 'Мин', 'Макс']
@@ -219,7 +247,7 @@ def create_animal_child_analysis(df):
         for col in ['Медиана', 'Среднее', 'Мин', 'Макс']:
             display_stats[col] = display_stats[col].apply(lambda x: f"{x:,.0f} руб")
         
-        st.dataframe(display_stats, use_container_width=True)
+        st.dataframe(display_stats, width='stretch')
         
         # Дополнительная информация
         with st.expander("💡 Интересные наблюдения"):
@@ -241,69 +269,65 @@ def create_animal_child_analysis(df):
     except Exception as e:
         st.error(f"Ошибка при построении графиков: {e}")
         st.write("Данные для отладки:")
-        st.write(f"Уникальные значения в колонке 'Можно с детьми/животными': {df_clean['Можно с детьми/животными'].unique()}")
+        st.write(f"Уникальные значения в колонке 'Можно с детьми/животными': {category_stats.index.tolist()}")
 
 # Основной код для анализа высоты потолков
-def create_ceiling_height_analysis(df):
+@timed("Раздел: высота потолков", rows=lambda analysis, *summaries: len(analysis))
+def create_ceiling_height_analysis(analysis, ceiling_stats, summary):
     st.subheader("📏 Анализ зависимости цены от высоты потолков")
     
-    # Создаем копию DataFrame чтобы не изменять оригинал
-    df_clean = df.copy()
-    
-    # Преобразуем цену в числовой формат
-    df_clean['Цена_число'] = df_clean['Цена'].apply(clean_price)
-    
-    # Удаляем строки с отсутствующими значениями
-    df_clean = df_clean.dropna(subset=['Высота потолков, м', 'Цена_число'])
-    
-    # Преобразуем высоту потолков в числовой формат
-    df_clean['Высота потолков, м'] = pd.to_numeric(df_clean['Высота потолков, м'], errors='coerce')
-    df_clean = df_clean.dropna(subset=['Высота потолков, м'])
+    # Порог точек и режим (hexbin/выборка) входят в ключ кэша изображения
+    max_points, scatter_mode = scatter_settings()
     
-    # Группируем по высоте потолков и считаем медиану цены
+    # Медиана цены по высоте потолков из предрассчитанной сводки
     try:
-        ceiling_price = df_clean.groupby("Высота потолков, м")["Цена_число"].median().sort_values(ascending=False).head(10)
+        ceiling_price = ceiling_stats['median'].sort_values(ascending=False).head(10)
+        ceiling_price.index = ceiling_heights(ceiling_price.index)
         
-        # Создаем график
-        fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(15, 6))
-        
-        # График 1: Медианная цена по высоте потолков
-        ceiling_price.plot(kind='bar', ax=ax1, color='skyblue')
-        ax1.set_title('Медианная цена аренды по высоте потолков')
-        ax1.set_xlabel('Высота потолков (м)')
-        ax1.set_ylabel('Медианная цена (руб)')
-        ax1.tick_params(axis='x', rotation=45)
-        
-        # Добавляем значения на столбцы
-        for i, v in enumerate(ceiling_price.values):
-            ax1.text(i, v, f'{v:,.0f}', ha='center', va='bottom', fontweight='bold')
-        
-        # График 2: Scatter plot
-        ax2.scatter(df_clean['Высота потолков, м'], df_clean['Цена_число'], alpha=0.6)
-        ax2.set_title('Зависимость цены от высоты потолков')
-        ax2.set_xlabel('Высота потолков (м)')
-        ax2.set_ylabel('Цена аренды (руб)')
+        # График (из кэша изображений)
+        def draw_ceiling_chart():
+            import matplotlib.pyplot as plt
+
+            # Точки для диаграммы рассеяния: только нужные колонки без пропусков
+            df_clean = analysis[['Ceiling_height', 'price_clean']].dropna()
+            fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(15, 6))
         
-        # Линия тренда
-        z = np.polyfit(df_clean['Высота потолков, м'], df_clean['Цена_число'], 1)
-        p = np.poly1d(z)
-        ax2.plot(df_clean['Высота потолков, м'], p(df_clean['Высота потолков, м']), "r--", alpha=0.8)
+            # График 1: Медианная цена по высоте потолков
+            ceiling_price.plot(kind='bar', ax=ax1, color='skyblue')
+            ax1.set_title('Медианная цена аренды по высоте потолков')
+            ax1.set_xlabel('Высота потолков (м)')
+            ax1.set_ylabel('Медианная цена (руб)')
+            ax1.tick_params(axis='x', rotation=45)
         
-        plt.tight_layout()
-        st.pyplot(fig)
+            # Добавляем значения на столбцы
+            for i, v in enumerate(ceiling_price.values):
+                ax1.text(i, v, f'{v:,.0f}', ha='center', va='bottom', fontweight='bold')
+        
+            # График 2: Scatter plot (плотность/выборка на больших данных) и тренд по бинам
+            draw_scatter(ax2, df_clean['Ceiling_height'], df_clean['price_clean'],
+                         max_points=max_points, mode=scatter_mode)
+            ax2.set_title('Зависимость цены от высоты потолков')
+            ax2.set_xlabel('Высота потолков (м)')
+            ax2.set_ylabel('Цена аренды (руб)')
+        
+            plt.tight_layout()
+            return fig
+
+        params = {'top': 10, 'max_points': max_points, 'mode': scatter_mode}
+        st.image(charts.get('ceiling_bar_scatter', draw_ceiling_chart, params), width='stretch')
         
         # Статистика
         col1, col2, col3 = st.columns(3)
         
         with col1:
-            st.metric("Количество записей в анализе", len(df_clean))
+            st.metric("Количество записей в анализе", int(summary['count']))
         
         with col2:
-            correlation = df_clean['Высота потолков, м'].corr(df_clean['Цена_число'])
+            correlation = summary['corr']
             st.metric("Корреляция", f"{correlation:.3f}")
         
         with col3:
-            avg_price_per_meter = df_clean['Цена_число'].mean() / df_clean['Высота потолков, м'].mean()
+            avg_price_per_meter = summary['mean_y'] / summary['mean_x']
             st.metric("Средняя цена за 1м высоты", f"{avg_price_per_meter:,.0f} руб")
         
         # Таблица с топом
@@ -312,58 +336,113 @@ def create_ceiling_height_analysis(df):
             'Высота потолков (м)': ceiling_price.index,
             'Медианная цена (руб)': ceiling_price.values
         })
-        st.dataframe(top_table, use_container_width=True)
+        st.dataframe(top_table, width='stretch')
         
     except Exception as e:
         st.error(f"Ошибка при построении графиков: {e}")
         st.write("Данные для отладки:")
-        st.write(f"Тип цены: {df_clean['Цена_число'].dtype}")
-        st.write(f"Тип высоты потолков: {df_clean['Высота потолков, м'].dtype}")
-        st.write(f"Пример цен: {df_clean['Цена_число'].head().tolist()}")
+        st.write(f"Тип цены: {analysis['price_clean'].dtype}")
+        st.write(f"Тип высоты потолков: {analysis['Ceiling_height'].dtype}")
+        st.write(f"Пример цен: {analysis['price_clean'].dropna().head().tolist()}")
 
 # Альтернативный упрощенный вариант
-def simple_ceiling_analysis(df):
+@timed("Раздел: потолки, упрощенный", rows=lambda ceiling_stats: ceiling_stats['count'].sum())
+def simple_ceiling_analysis(ceiling_stats):
     st.subheader("📏 Анализ высоты потолков")
     
-    # Очистка данных
-    df_clean = df.copy()
-    
-    # Преобразуем цену
-    df_clean['Цена_число'] = df_clean['Цена'].apply(clean_price)
-    df_clean['Высота потолков, м'] = pd.to_numeric(df_clean['Высота потолков, м'], errors='coerce')
-    
-    # Удаляем пропуски
-    df_clean = df_clean.dropna(subset=['Высота потолков, м', 'Цена_число'])
-    
-    if len(df_clean) == 0:
+    if len(ceiling_stats) == 0:
         st.warning("Нет данных для анализа после очистки")
         return
     
-    # Группируем и считаем
-    ceiling_stats = df_clean.groupby("Высота потолков, м").agg({
-        'Цена_число': ['median', 'count']
-    }).round(0)
+    # Предрассчитанная сводка по высоте потолков
+    ceiling_stats = ceiling_stats[['median', 'count']].round(0)
     
     # Упрощаем мультииндекс
     ceiling_stats.columns = ['Медианная_цена', 'Количество']
     ceiling_stats = ceiling_stats.sort_values('Медианная_цена', ascending=False).head(10)
+    ceiling_stats.index = ceiling_heights(ceiling_stats.index)
     
-    # График
-    fig, ax = plt.subplots(figsize=(10, 6))
-    ceiling_stats['Медианная_цена'].plot(kind='bar', ax=ax, color='lightcoral')
-    ax.set_title('Медианная цена аренды по высоте потолков')
-    ax.set_xlabel('Высота потолков (м)')
-    ax.set_ylabel('Медианная цена (руб)')
-    ax.tick_params(axis='x', rotation=45)
+    # График (из кэша изображений)
+    def draw_simple_chart():
+        import matplotlib.pyplot as plt
+
+        fig, ax = plt.subplots(figsize=(10, 6))
+        ceiling_stats['Медианная_цена'].plot(kind='bar', ax=ax, color='lightcoral')
+        ax.set_title('Медианная цена аренды по высоте потолков')
+        ax.set_xlabel('Высота потолков (м)')
+        ax.set_ylabel('Медианная цена (руб)')
+        ax.tick_params(axis='x', rotation=45)
     
-    # Добавляем значения
-    for i, v in enumerate(ceiling_stats['Медианная_цена']):
-        ax.text(i, v, f'{v:,.0f}', ha='center', va='bottom', fontweight='bold')
+        # Добавляем значения
+        for i, v in enumerate(ceiling_stats['Медианная_цена']):
+            ax.text(i, v, f'{v:,.0f}', ha='center', va='bottom', fontweight='bold')
     
-    st.pyplot(fig)
+        return fig
+
+    st.image(charts.get('ceiling_simple_bar', draw_simple_chart, {'top': 10}), width='stretch')
     
     # Таблица
-    st.dataframe(ceiling_stats, use_container_width=True)
+    st.dataframe(ceiling_stats, width='stretch')
+
+# Подбор по параметрам: при движении ползунков перезапускается только этот фрагмент
+@st.fragment
+@timed("Раздел: подбор по параметрам", rows=lambda index: index.rows)
+def create_filter_analysis(index):
+    st.subheader("🔎 Подбор по параметрам")
+
+    filters = {}
+    columns = st.columns(len(index.ranges))
+    for col, column in zip(columns, index.ranges):
+        low, high = index.bounds(column)
+        if not low < high:
+            continue
+        with col:
+            if column == 'price_clean':
+                filters[column] = st.slider(RANGE_COLUMNS[column], int(low), int(np.ceil(high)),
+                                            (int(low), int(np.ceil(high))), step=1000)
+            else:
+                filters[column] = st.slider(RANGE_COLUMNS[column], float(np.floor(low)), float(np.ceil(high)),
+                                            (float(np.floor(low)), float(np.ceil(high))), step=0.1)
+
+    col1, col2 = st.columns(2)
+    with col1:
+        filters['rooms'] = st.multiselect("Комнат", index.options('rooms'),
+                                          placeholder="Все") or None
+    if 'metro' in index.categories:
+        with col2:
+            filters['metro'] = st.multiselect("Станция метро", index.options('metro'),
+                                              placeholder="Все") or None
+
+    start = time.perf_counter()
+    summary = index.summary(filters)
+    elapsed = (time.perf_counter() - start) * 1000
+
+    if summary['count'] == 0:
+        st.info("Под фильтры не подходит ни одно объявление")
+        st.caption(f"Выборка и сводка за {elapsed:.1f} мс")
+        return
+
+    col1, col2, col3, col4 = st.columns(4)
+    with col1:
+        st.metric("Объявлений", f"{summary['count']:,}")
+    with col2:
+        st.metric("Медианная цена", f"{summary['price_median']:,.0f} руб")
+    with col3:
+        st.metric("Медианная площадь", f"{summary['area_median']:,.1f} м²")
+    with col4:
+        st.metric("Медиана за 1 м²", f"{summary['price_per_meter_median']:,.0f} руб")
+    st.caption(f"Выборка и сводка за {elapsed:.1f} мс")
+
+    col1, col2 = st.columns(2)
+    with col1:
+        st.write("**Распределение цены**")
+        st.bar_chart(summary['price_histogram'])
+    with col2:
+        st.write("**Медианная цена по числу комнат**")
+        st.bar_chart(summary['rooms']['Медианная цена'])
+    if 'stations' in summary:
+        st.write("**Станции с наибольшим числом объявлений**")
+        st.dataframe(summary['stations'], width='stretch')
 
 # Основное приложение Streamlit
 def main():
@@ -373,50 +452,70 @@ def main():
     st.markdown("---")
     
     # Показываем основную информацию о данных
-    st.subheader("Обзор данных")
-    col1, col2, col3 = st.columns(3)
+    with rerun.stage("Раздел: обзор данных", len(df)):
+        st.subheader("Обзор данных")
+        col1, col2, col3 = st.columns(3)
     
-    with col1:
-        st.metric("Всего объявлений", len(df))
+        with col1:
+            st.metric("Всего объявлений", len(df))
     
-    with col2:
-        st.metric("Колонок в данных", len(df.columns))
+        with col2:
+            st.metric("Колонок в данных", len(df.columns))
     
-    with col3:
-        # Проверяем наличие ключевых колонок
-        key_columns = ['Цена', 'Высота потолков, м', 'Можно с детьми/животными']
-        missing_cols = [col for col in key_columns if col not in df.columns]
-        if missing_cols:
-            st.metric("Отсутствующие колонки", len(missing_cols))
-        else:
-            st.metric("Данные готовы", "✅")
+        with col3:
+            # Проверяем наличие ключевых колонок
+            key_columns = ['Цена', 'Высота потолков, м', 'Можно с детьми/животными']
+            missing_cols = [col for col in key_columns if col not in df.columns]
+            if missing_cols:
+                st.metric("Отсутствующие колонки", len(missing_cols))
+            else:
+                st.metric("Данные готовы", "✅")
+    
+        # Показываем первые несколько строк данных
+        with st.expander("📊 Посмотреть данные"):
+            st.dataframe(df.head(10))
     
-    # Показываем первые несколько строк данных
-    with st.expander("📊 Посмотреть данные"):
-        st.dataframe(df.head(10))
+    st.markdown("---")
+    
+    create_filter_analysis(filter_index)
     
     st.markdown("---")
     
     # Анализ пропущенных значений (добавлено в начало)
-    create_missing_data_analysis(df)
+    with rerun.stage("Сводка пропусков", len(df)):
+        missing_df = store.missing_profile(df)
+    create_missing_data_analysis(missing_df)
     
     st.markdown("---")
     
     # Анализ животных и детей
-    create_animal_child_analysis(df)
+    if 'Children_pets' in analysis.columns:
+        with rerun.stage("Сводка: дети и животные", len(analysis)):
+            category_stats = store.group_stats(analysis, 'Children_pets', 'price_clean')
+        create_animal_child_analysis(category_stats)
+    else:
+        st.info("В датасете нет колонки 'Можно с детьми/животными', анализ пропущен")
     
     st.markdown("---")
     
     # Анализ высоты потолков
     # Создаем вкладки для разных вариантов анализа
-    tab1, tab2 = st.tabs(["📏 Детальный анализ потолков", "📏 Упрощенный анализ потолков"])
+    selected = lazy_tabs(["📏 Детальный анализ потолков", "📏 Упрощенный анализ потолков"], key="ceiling_tabs")
     
-    with tab1:
-        create_ceiling_height_analysis(df)
+    with rerun.stage("Сводка: высота потолков", len(analysis)):
+        ceiling_stats = store.group_stats(analysis, 'Ceiling_height', 'price_clean')
     
-    with tab2:
-        simple_ceiling_analysis(df)
+    if selected == "📏 Детальный анализ потолков":
+        with rerun.stage("Сводка: цена и высота потолков", len(analysis)):
+            summary = store.pair_summary(analysis, 'Ceiling_height', 'price_clean')
+        create_ceiling_height_analysis(analysis, ceiling_stats, summary)
+    
+    if selected == "📏 Упрощенный анализ потолков":
+        simple_ceiling_analysis(ceiling_stats)
 
 # Запускаем приложение
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    try:
+        main()
+    finally:
+        rerun.finish()
@@ -0,0 +1,81 @@
+import streamlit as st
+import pandas as pd
+from realestate.data import load_dataset, resolve_source
+from realestate.features import FeatureStore
+from realestate.scoring import MAX_ROOMS, model_for_dataset
+
+TARGET_MAPE = 30
+
+# Загрузка данных: один раз на процесс, общая для всех сессий
+@st.cache_resource(show_spinner="Загрузка данных...")
+def get_dataset(source):
+    return load_dataset(source)
+
+# Признаки местоположения: строятся один раз на версию датасета
+@st.cache_resource(show_spinner="Подготовка признаков...")
+def get_feature_store(version, _dataset):
+    return FeatureStore.for_dataset(_dataset)
+
+# Модель: обучается один раз на версию датасета (или читается из кэша)
+# и остается в памяти процесса, перезапуски страницы ее не перезагружают
+@st.cache_resource(show_spinner="Подготовка модели...")
+def get_model(version, _dataset, _store):
+    return model_for_dataset(_dataset, _store)
+
+dataset = get_dataset(resolve_source())
+store = get_feature_store(dataset.version, dataset)
+model = get_model(dataset.version, dataset, store)
+
+st.title("💰 Оценка стоимости аренды")
+
+col1, col2, col3 = st.columns(3)
+with col1:
+    st.metric("MAPE (отложенная выборка)", f"{model.metrics['holdout_mape']:.1f}%",
+              delta=f"{model.metrics['holdout_mape'] - TARGET_MAPE:+.1f} п.п. к цели {TARGET_MAPE}%",
+              delta_color="inverse")
+with col2:
+    st.metric("MAPE (обучающая)", f"{model.metrics['train_mape']:.1f}%")
+with col3:
+    st.metric("Объявлений в обучении", f"{model.metrics['rows']:,}")
+
+st.subheader("🏠 Одна квартира")
+col1, col2, col3 = st.columns(3)
+with col1:
+    rooms = st.number_input("Комнат", min_value=1, max_value=MAX_ROOMS, value=2)
+with col2:
+    area = st.number_input("Площадь, м²", min_value=10.0, max_value=500.0, value=54.0, step=1.0)
+with col3:
+    ceiling = st.number_input("Высота потолков, м", min_value=2.0, max_value=6.0, value=2.7, step=0.05)
+
+mode = st.radio("Местоположение", ["Станция метро", "Объявление из датасета"], horizontal=True)
+if mode == "Станция метро":
+    stations = store.stations.sort_values("count", ascending=False).index.tolist()
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        station = st.selectbox("Станция", stations)
+    with col2:
+        minutes = st.number_input("Минут до метро", min_value=1, max_value=60, value=10)
+    with col3:
+        walk = st.checkbox("Пешком", value=True)
+    location = store.station_features(station, minutes, float(walk))
+else:
+    ad_id = st.number_input("ID объявления", min_value=0, value=int(store.ids[0]) if len(store) else 0)
+    location = store.lookup(ad_id)
+    if location is None:
+        st.warning("Объявления с таким ID нет в датасете")
+    else:
+        st.caption(f"{location['metro_station']} · {location['address'] or 'адрес не указан'}")
+
+price = model.predict_one(rooms, area, ceiling, location)
+st.metric("Оценка аренды", f"{price:,.0f} руб./мес")
+
+st.subheader("📄 Файл объявлений")
+st.caption("CSV с колонками rooms_clean, total_area_clean, Ceiling_height "
+           "или с исходными полями выгрузки; местоположение - по Ad_ID или колонке Метро")
+uploaded = st.file_uploader("Файл для оценки", type="csv")
+if uploaded is not None:
+    listings = pd.read_csv(uploaded)
+    scored = listings.assign(predicted_price=model.predict(listings, store))
+    st.dataframe(scored.head(100), width='stretch')
+    st.download_button("Скачать оценки", scored.to_csv(index=False).encode("utf-8"),
+                       file_name="scored.csv", mime="text/csv")
@@ -0,0 +1 @@
+"""Общий код для дашборда и подготовки данных AI REA Ltd."""
@@ -0,0 +1,99 @@
+"""
+Хранилище сводных таблиц дашборда.
+
+Группировки (медиана, среднее, количество, мин/макс по категории), профиль
+пропусков и парные сводки считаются один раз на версию датасета и
+сохраняются в Parquet рядом с кэшем датасета. Повторные отрисовки и новые
+процессы читают готовые таблицы, их стоимость не зависит от числа объявлений.
+
+Сами таблицы считает исполнитель из queries.py (REA_QUERY_BACKEND):
+потоковый профиль выгрузки (profile.py), pandas по фреймам в памяти или
+DuckDB по Parquet-файлам. Результаты всех трех одинаковые (медианы профиль
+считает точно), поэтому их таблицы общие (aggregates-<версия>/);
+исполнитель с приближенными сводками (exact = False) хранил бы свои
+отдельно (aggregates-<версия>-<имя>/).
+"""
+import os
+from pathlib import Path
+
+import pandas as pd
+
+from realestate.frame import analysis_path
+from realestate.profile import ProfileQueries
+from realestate.queries import DuckDBQueries, PandasQueries, resolve_backend
+
+METRICS = ('median', 'mean', 'count', 'min', 'max')
+
+
+class AggregateStore:
+    """Сводные таблицы одной версии датасета: в памяти процесса и на диске"""
+
+    def __init__(self, root, version, queries=None):
+        self.version = version
+        self.queries = queries or PandasQueries()
+        suffix = '' if self.queries.exact else f'-{self.queries.name}'
+        self.root = Path(root) / f'aggregates-{version}{suffix}'
+        self._tables = {}
+
+    @classmethod
+    def for_dataset(cls, dataset, backend=None):
+        """
+        Хранилище в каталоге кэша рядом с Parquet-файлом датасета.
+        Для backend 'profile' и 'duckdb' файл аналитического фрейма должен
+        уже быть (frame.load_analysis_frame).
+        """
+        queries = None
+        backend = resolve_backend(backend)
+        if backend == 'profile':
+            queries = ProfileQueries(dataset)
+        elif backend == 'duckdb':
+            queries = DuckDBQueries(dataset.path, analysis_path(dataset))
+        return cls(dataset.path.parent, dataset.version, queries)
+
+    def _path(self, key):
+        return self.root / f'{key}.parquet'
+
+    def get(self, key, compute):
+        """Таблица по ключу: из памяти, с диска или вычисленная через compute()"""
+        if key in self._tables:
+            return self._tables[key]
+        path = self._path(key)
+        if path.exists():
+            table = pd.read_parquet(path)
+        else:
+            table = compute()
+            self.root.mkdir(parents=True, exist_ok=True)
+            tmp = path.with_suffix('.parquet.tmp')
+            table.to_parquet(tmp)
+            os.replace(tmp, path)
+        self._tables[key] = table
+        return table
+
+    def group_stats(self, frame, group, value, metrics=METRICS):
+        """
+        Статистики value по значениям group для строк без пропусков.
+
+        Индекс - значения group, колонки - названия метрик (как в .agg()).
+        """
+        metrics = tuple(metrics)
+
+        def compute():
+            return self.queries.group_stats(frame, group, value, metrics)
+
+        return self.get(f'{group}--{value}--{"-".join(metrics)}', compute)
+
+    def missing_profile(self, df):
+        """Колонка / Пропущено / Процент по всем колонкам df, по убыванию пропусков"""
+
+        def compute():
+            return self.queries.missing_profile(df)
+
+        return self.get('missing--isnull', compute)
+
+    def pair_summary(self, frame, x, y):
+        """Одна строка: count, corr, mean_x, mean_y для пар (x, y) без пропусков"""
+
+        def compute():
+            return self.queries.pair_summary(frame, x, y)
+
+        return self.get(f'pair--{x}--{y}', compute).iloc[0]
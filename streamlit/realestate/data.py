@@ -0,0 +1,201 @@
+"""
+Загрузка датасета объявлений с локальным кэшем.
+
+Исходный CSV (Google Drive или локальный файл) разбирается один раз и
+сохраняется в Parquet, ключом служит контрольная сумма источника. Повторные
+запуски читают Parquet через memory map и не ходят в сеть.
+"""
+import hashlib
+import json
+import os
+import tempfile
+from dataclasses import dataclass
+from pathlib import Path
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from realestate.parsing import ARROW_STRING
+
+DATA_URL = 'https://drive.google.com/uc?export=download&id=130KYOX8O4wrP_T8vdz2GfvJRQ03ONmE7'
+
+# Источник и каталог кэша можно переопределить через переменные окружения
+SOURCE_ENV = 'REA_DATA_SOURCE'
+CACHE_DIR_ENV = 'REA_CACHE_DIR'
+DEFAULT_CACHE_DIR = Path(__file__).resolve().parent.parent / '.cache'
+
+# Обработанный файл релиза 3 хранит признаки под новыми именами.
+# Возвращаем им исходные названия, чтобы дашборд работал и с ним.
+CLEAN_TO_RAW_COLUMNS = {
+    'Ad_ID': 'ID  объявления',
+    'rooms_clean': 'Количество комнат',
+    'total_area_clean': 'Площадь, м2',
+    'price_clean': 'Цена',
+    'Ceiling_height': 'Высота потолков, м',
+}
+
+CHUNK_SIZE = 1 << 20
+
+
+@dataclass(frozen=True)
+class Dataset:
+    """Загруженный датасет и его версия (префикс контрольной суммы источника)"""
+    frame: pd.DataFrame
+    version: str
+    path: Path
+
+
+def resolve_source(source=None):
+    """Возвращает источник данных: аргумент, переменная окружения или Google Drive"""
+    return source or os.environ.get(SOURCE_ENV) or DATA_URL
+
+
+def resolve_cache_dir(cache_dir=None):
+    path = Path(cache_dir or os.environ.get(CACHE_DIR_ENV) or DEFAULT_CACHE_DIR)
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+def is_url(source):
+    return str(source).startswith(('http://', 'https://'))
+
+
+def file_checksum(path):
+    """SHA-256 файла, читаем блоками чтобы не держать файл в памяти"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(CHUNK_SIZE), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def normalize_columns(df):
+    """Приводит названия колонок обработанного датасета к исходным"""
+    renames = {clean: raw for clean, raw in CLEAN_TO_RAW_COLUMNS.items()
+               if clean in df.columns and raw not in df.columns}
+    return df.rename(columns=renames) if renames else df
+
+
+def _meta_path(cache_dir, source):
+    key = hashlib.sha1(str(source).encode('utf-8')).hexdigest()[:12]
+    return cache_dir / f'source-{key}.json'
+
+
+def _read_meta(path):
+    try:
+        return json.loads(path.read_text(encoding='utf-8'))
+    except (OSError, ValueError):
+        return {}
+
+
+def _write_meta(path, meta):
+    path.write_text(json.dumps(meta, ensure_ascii=False, indent=2), encoding='utf-8')
+
+
+def dataset_path(cache_dir, version):
+    return cache_dir / f'listings-{version}.parquet'
+
+
+def _build_parquet(csv_path, target):
+    """Разбирает CSV и атомарно записывает Parquet"""
+    df = normalize_columns(pd.read_csv(csv_path))
+    tmp = target.with_suffix('.parquet.tmp')
+    df.to_parquet(tmp, index=False)
+    os.replace(tmp, target)
+
+
+def read_cached(path):
+    """Читает Parquet из кэша через memory map; строки остаются в Arrow"""
+    table = pq.read_table(path, memory_map=True)
+    return table.to_pandas(types_mapper={
+        pa.string(): ARROW_STRING,
+        pa.large_string(): ARROW_STRING,
+    }.get)
+
+
+def _local_version(path, meta):
+    """Версия локального файла; хэш пересчитывается только при смене размера/mtime"""
+    stat = path.stat()
+    fingerprint = [stat.st_size, stat.st_mtime_ns]
+    if meta.get('fingerprint') == fingerprint and meta.get('checksum'):
+        return meta['checksum'], meta
+    checksum = file_checksum(path)
+    return checksum, {'source': str(path), 'fingerprint': fingerprint, 'checksum': checksum}
+
+
+def _remote_etag(url, timeout=5):
+    """ETag удаленного файла или None, если сервер недоступен или его не отдает"""
+    import requests
+
+    try:
+        response = requests.head(url, allow_redirects=True, timeout=timeout)
+        response.raise_for_status()
+    except requests.RequestException:
+        return None
+    return response.headers.get('ETag')
+
+
+def _download(url, cache_dir, timeout=60):
+    """
+    Скачивает файл во временный файл и считает его контрольную сумму.
+    Если загрузка не удалась, временный файл закрывается и удаляется.
+    """
+    import requests
+
+    digest = hashlib.sha256()
+    fd, tmp_name = tempfile.mkstemp(dir=cache_dir, suffix='.csv')
+    done = False
+    try:
+        with os.fdopen(fd, 'wb') as f, requests.get(url, stream=True, timeout=timeout) as response:
+            response.raise_for_status()
+            for block in response.iter_content(CHUNK_SIZE):
+                digest.update(block)
+                f.write(block)
+            etag = response.headers.get('ETag')
+        done = True
+    finally:
+        if not done:
+            Path(tmp_name).unlink(missing_ok=True)
+    return Path(tmp_name), digest.hexdigest(), etag
+
+
+def load_dataset(source=None, cache_dir=None, refresh=False):
+    """
+    Загружает датасет объявлений, используя локальный кэш в Parquet.
+
+    source - URL или путь к CSV (по умолчанию REA_DATA_SOURCE или Google Drive).
+    Для URL повторная загрузка выполняется только при смене ETag или refresh=True;
+    если сеть недоступна, используется последняя сохраненная версия.
+    """
+    source = resolve_source(source)
+    cache_dir = resolve_cache_dir(cache_dir)
+    meta_path = _meta_path(cache_dir, source)
+    meta = _read_meta(meta_path)
+
+    if not is_url(source):
+        csv_path = Path(source)
+        checksum, meta = _local_version(csv_path, meta)
+        version = checksum[:16]
+        target = dataset_path(cache_dir, version)
+        if refresh or not target.exists():
+            _build_parquet(csv_path, target)
+        _write_meta(meta_path, meta)
+        return Dataset(read_cached(target), version, target)
+
+    cached = meta.get('checksum') and dataset_path(cache_dir, meta['checksum'][:16])
+    if cached and cached.exists() and not refresh:
+        etag = _remote_etag(source)
+        if etag is None or etag == meta.get('etag'):
+            return Dataset(read_cached(cached), meta['checksum'][:16], cached)
+
+    tmp_csv, checksum, etag = _download(source, cache_dir)
+    try:
+        version = checksum[:16]
+        target = dataset_path(cache_dir, version)
+        if refresh or not target.exists():
+            _build_parquet(tmp_csv, target)
+    finally:
+        tmp_csv.unlink(missing_ok=True)
+    _write_meta(meta_path, {'source': source, 'etag': etag, 'checksum': checksum})
+    return Dataset(read_cached(target), version, target)
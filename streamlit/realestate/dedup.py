@@ -0,0 +1,264 @@
+"""
+Поиск повторных объявлений: точные дубликаты и почти-дубликаты.
+
+Точные дубликаты - строки, у которых совпадают нормализованные описание,
+адрес, телефон (только цифры), комнаты, площадь и цена; они находятся
+одним хэшированием всех строк.
+
+Почти-дубликаты (перепост с другим телефоном, немного другой ценой или
+парой измененных слов) ищутся через MinHash по словам описания и адреса и
+LSH: подпись объявления делится на полосы, и кандидатами считаются только
+объявления с совпадающей полосой. Каждый кандидат проверяется по доле
+совпавших значений подписи и по числу комнат. Время работы почти линейно по
+числу объявлений, попарного сравнения нет.
+
+Функции работают с очищенным фреймом pipeline.py (колонки Description,
+Address, Phone_number, rooms_clean, total_area_clean, price_clean, Ad_ID).
+"""
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from realestate.parsing import as_arrow_strings
+
+TEXT_COLUMNS = ['Description', 'Address']
+EXACT_COLUMNS = ['Description', 'Address', 'Phone_number',
+                 'rooms_clean', 'total_area_clean', 'price_clean']
+# Все колонки, которые читает поиск повторов
+DEDUP_COLUMNS = ['Ad_ID'] + EXACT_COLUMNS
+
+NUM_PERM = 32
+BANDS = 8
+THRESHOLD = 0.7
+CHUNK_ROWS = 100_000
+
+_rng = np.random.default_rng(20240601)
+# Параметры хэш-функций MinHash (multiply-shift) и перемешивания полос
+_MULTIPLIERS = _rng.integers(1, 2**63, NUM_PERM, dtype=np.uint64) | np.uint64(1)
+_OFFSETS = _rng.integers(0, 2**63, NUM_PERM, dtype=np.uint64)
+_BAND_MIX = _rng.integers(1, 2**63, NUM_PERM, dtype=np.uint64) | np.uint64(1)
+_END = np.uint64(2**32 - 1)
+
+
+def normalize_text(series):
+    """Нижний регистр, только буквы и цифры, слова через один пробел"""
+    array = pc.utf8_lower(pa.array(as_arrow_strings(series).array))
+    array = pc.replace_substring_regex(array, r'[^\p{L}\p{N}]+', ' ')
+    return pd.Series(pd.arrays.ArrowStringArray(pc.utf8_trim_whitespace(array)), index=series.index)
+
+
+def normalize_phone(series):
+    """Последние 10 цифр первого телефона: "+7 999 123-45-67" и "8 (999) 1234567" совпадают"""
+    array = pa.array(as_arrow_strings(series).array)
+    first = pc.list_element(pc.split_pattern(pc.fill_null(array, ''), ','), 0)
+    digits = pc.replace_substring_regex(first, r'\D+', '')
+    return pd.Series(pd.arrays.ArrowStringArray(pc.utf8_slice_codeunits(digits, -10)),
+                     index=series.index)
+
+
+def _column(frame, name):
+    if name in frame.columns:
+        return frame[name]
+    return pd.Series(pd.NA, index=frame.index, dtype='string[pyarrow]')
+
+
+def _codes(series):
+    """Номера различных значений строковой колонки (пропуск -> -1)"""
+    encoded = pc.dictionary_encode(pa.array(series.array)).indices
+    return pc.fill_null(encoded, -1).to_numpy()
+
+
+def normalized_texts(frame, columns=TEXT_COLUMNS):
+    """Нормализованные колонки текста; считаются один раз для обоих этапов поиска"""
+    return {name: normalize_text(_column(frame, name)) for name in columns}
+
+
+def exact_keys(frame, texts=None):
+    """
+    64-битный ключ нормализованных полей EXACT_COLUMNS для каждой строки.
+
+    Строки перед хэшированием заменяются номерами значений (dictionary
+    encode), это заметно быстрее хэширования самих строк.
+    """
+    texts = texts or normalized_texts(frame)
+    normalized = pd.DataFrame({
+        'Description': _codes(texts['Description']),
+        'Address': _codes(texts['Address']),
+        'Phone_number': _codes(normalize_phone(_column(frame, 'Phone_number'))),
+    }, index=frame.index)
+    for name in EXACT_COLUMNS[3:]:
+        normalized[name] = frame[name].round(1) if name in frame.columns else np.nan
+    return pd.util.hash_pandas_object(normalized, index=False).to_numpy()
+
+
+class _Vocabulary:
+    """Номера слов, общие для всех частей фрейма"""
+
+    def __init__(self):
+        self.words = pa.array([], pa.large_string())
+
+    def ids(self, tokens):
+        unique = pc.unique(tokens.cast(pa.large_string()))
+        new = pc.filter(unique, pc.invert(pc.is_in(unique, value_set=self.words)))
+        if len(new):
+            self.words = pa.concat_arrays([self.words, new])
+        return pc.index_in(tokens.cast(pa.large_string()), value_set=self.words).to_numpy().astype(np.uint64)
+
+
+def _shingles(text, vocabulary):
+    """
+    Пары соседних слов каждого документа как uint64 и номер документа.
+
+    Последнее слово документа образует пару с маркером конца, поэтому
+    документ из одного слова тоже получает подпись. Результат упорядочен
+    по номеру документа.
+    """
+    words = pc.split_pattern(text, ' ')
+    parents = pc.list_parent_indices(words).to_numpy()
+    tokens = pc.list_flatten(words)
+    keep = pc.not_equal(tokens, '').to_numpy(zero_copy_only=False)
+    parents, ids = parents[keep], vocabulary.ids(pc.filter(tokens, keep))
+
+    following = np.full(len(ids), _END, dtype=np.uint64)
+    same_doc = parents[1:] == parents[:-1]
+    following[:-1][same_doc] = ids[1:][same_doc]
+    return ids * np.uint64(1 << 32) + following, parents
+
+
+def minhash_signatures(frame, texts=None, chunk_rows=CHUNK_ROWS):
+    """
+    MinHash-подписи (n, NUM_PERM) uint32 по словам описания и адреса.
+
+    Возвращает (подписи, маска непустых документов). Фрейм обрабатывается
+    частями по chunk_rows строк, память не растет с размером фрейма.
+    """
+    n = len(frame)
+    signatures = np.zeros((n, NUM_PERM), dtype=np.uint32)
+    has_text = np.zeros(n, dtype=bool)
+    vocabulary = _Vocabulary()
+    texts = list((texts or normalized_texts(frame)).values())
+    for start in range(0, n, chunk_rows):
+        stop = min(start + chunk_rows, n)
+        parts = [pa.array(text.iloc[start:stop].array) for text in texts]
+        separator = pa.scalar(' ', parts[0].type)
+        joined = pc.binary_join_element_wise(*[pc.fill_null(part, '') for part in parts], separator)
+        values, docs = _shingles(pc.utf8_trim_whitespace(joined), vocabulary)
+        if not len(values):
+            continue
+        present = np.unique(docs)
+        starts = np.searchsorted(docs, present)
+        with np.errstate(over='ignore'):
+            for k in range(NUM_PERM):
+                hashed = (values * _MULTIPLIERS[k] + _OFFSETS[k]) >> np.uint64(32)
+                signatures[start + present, k] = np.minimum.reduceat(hashed, starts)
+        has_text[start + present] = True
+    return signatures, has_text
+
+
+def _band_keys(signatures, band, rows):
+    """Хэш значений подписи в полосе band"""
+    block = signatures[:, band * rows:(band + 1) * rows].astype(np.uint64)
+    with np.errstate(over='ignore'):
+        key = np.full(len(signatures), np.uint64(band), dtype=np.uint64)
+        for j in range(rows):
+            key = key * _BAND_MIX[band * rows + j] + block[:, j]
+    return key
+
+
+def _star_edges(keys, candidates):
+    """
+    Для строк с одинаковым ключом - ребро к первой строке группы.
+
+    Возвращает (строки, первые строки групп) среди candidates, без петель.
+    """
+    rows = candidates[np.argsort(keys[candidates], kind='stable')]
+    sorted_keys = keys[rows]
+    new_group = np.ones(len(rows), dtype=bool)
+    new_group[1:] = sorted_keys[1:] != sorted_keys[:-1]
+    first = rows[np.flatnonzero(new_group)[np.cumsum(new_group) - 1]]
+    linked = rows != first
+    return rows[linked], first[linked]
+
+
+def _components(n, sources, targets):
+    """Связные компоненты: метка строки - наименьший номер строки в компоненте"""
+    labels = np.arange(n)
+    if not len(sources):
+        return labels
+    while True:
+        previous = labels.copy()
+        low = np.minimum(labels[sources], labels[targets])
+        np.minimum.at(labels, sources, low)
+        np.minimum.at(labels, targets, low)
+        labels = labels[labels]
+        if np.array_equal(labels, previous):
+            return labels
+
+
+def find_duplicates(frame, threshold=THRESHOLD, bands=BANDS):
+    """
+    Кластеры повторных объявлений.
+
+    Возвращает DataFrame с индексом frame и колонками:
+    cluster - номер (позиция в frame) первой строки кластера,
+    duplicate - строка повторяет более раннюю строку кластера,
+    match - 'exact', 'near' или '' для строк без повторов.
+    """
+    n = len(frame)
+    rows = NUM_PERM // bands
+    everything = np.arange(n)
+
+    texts = normalized_texts(frame)
+
+    # Точные дубликаты после нормализации
+    exact_src, exact_dst = _star_edges(exact_keys(frame, texts), everything)
+
+    # Почти-дубликаты: кандидаты из LSH, проверка по подписи и комнатам
+    signatures, has_text = minhash_signatures(frame, texts)
+    rooms = frame['rooms_clean'].to_numpy(dtype='float64') if 'rooms_clean' in frame else np.full(n, np.nan)
+    candidates = np.flatnonzero(has_text)
+    near_src, near_dst = [], []
+    for band in range(bands):
+        src, dst = _star_edges(_band_keys(signatures, band, rows), candidates)
+        similar = (signatures[src] == signatures[dst]).mean(axis=1) >= threshold
+        same_rooms = (rooms[src] == rooms[dst]) | np.isnan(rooms[src]) | np.isnan(rooms[dst])
+        keep = similar & same_rooms
+        near_src.append(src[keep])
+        near_dst.append(dst[keep])
+    near_src = np.concatenate(near_src) if near_src else np.array([], dtype=np.intp)
+    near_dst = np.concatenate(near_dst) if near_dst else np.array([], dtype=np.intp)
+
+    labels = _components(n, np.concatenate([exact_src, near_src]),
+                         np.concatenate([exact_dst, near_dst]))
+    duplicate = labels != everything
+    sizes = np.bincount(labels, minlength=n)
+    near_cluster = np.zeros(n, dtype=bool)
+    near_cluster[labels[near_src]] = True
+    match = np.where(sizes[labels] > 1, np.where(near_cluster[labels], 'near', 'exact'), '')
+    return pd.DataFrame({'cluster': labels, 'duplicate': duplicate, 'match': match},
+                        index=frame.index)
+
+
+def cluster_report(frame, clusters):
+    """
+    Кластеры из двух и более объявлений: cluster, size, match, Ad_ID
+    первой строки и список Ad_ID всех строк кластера; по убыванию размера.
+    """
+    grouped = clusters[clusters['match'] != ''].copy()
+    if grouped.empty:
+        return pd.DataFrame(columns=['cluster', 'size', 'match', 'Ad_ID', 'Ad_IDs'])
+    ids = frame['Ad_ID'] if 'Ad_ID' in frame.columns else pd.Series(frame.index, index=frame.index)
+    grouped['Ad_ID'] = ids.loc[grouped.index].to_numpy()
+    report = grouped.groupby('cluster').agg(
+        size=('Ad_ID', 'size'), match=('match', 'first'),
+        Ad_ID=('Ad_ID', 'first'), Ad_IDs=('Ad_ID', list),
+    ).reset_index()
+    return report.sort_values(['size', 'cluster'], ascending=[False, True]).reset_index(drop=True)
+
+
+def drop_duplicate_listings(frame, clusters=None):
+    """Оставляет по одной (первой) строке из каждого кластера"""
+    if clusters is None:
+        clusters = find_duplicates(frame)
+    return frame[~clusters['duplicate'].to_numpy()]
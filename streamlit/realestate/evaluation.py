@@ -0,0 +1,330 @@
+"""
+Сравнение моделей оценки аренды кросс-валидацией.
+
+Каждая модель из MODELS обучается на k-1 фолдах и оценивается на
+оставшемся; для каждой пары (модель, фолд) записываются MAPE, время
+обучения, скорость оценки (строк в секунду) и пиковая память обучения и
+оценки (tracemalloc, отдельным прогоном, чтобы трассировка не искажала
+время).
+
+Дорогое считается один раз на версию данных и лежит в каталоге
+cv-<контрольная сумма>-k<фолдов>-v<формат> в кэше датасета:
+- features.parquet - признаки feature_frame (разбор полей) и не зависящие
+  от цены признаки местоположения: станция, минуты до метро, пешком ли,
+  Ad_ID;
+- folds.npy - номер фолда каждой строки;
+- results/<модель>-v<версия>-fold<n>.json - результат пары (модель, фолд).
+Добавленная модель считается только сама, уже посчитанные берутся из
+results/. После изменения модели надо поднять ее version.
+
+Фолд строки - Ad_ID % k, без Ad_ID фолды случайные (SEED). Признаки,
+которые зависят от цены (metro_target) или от состава выборки
+(metro_frequency), считаются заново в каждом фолде только по его
+обучающим строкам (encode_location) - так же, как хранилище признаков
+считает их при обучении модели: обучающим строкам - out-of-fold по
+внутренним фолдам Ad_ID % features.FOLDS, проверочным - по таблице
+станций, как новым объявлениям. Цены проверочного фолда не попадают ни в
+один признак при любом k. Без Ad_ID признаков местоположения нет (NaN),
+как у модели без хранилища.
+
+Пары (модель, фолд) считаются на пуле процессов (parallel.process_pool),
+процесс читает признаки и фолды из кэша сам - через pickle передаются
+только имена и номера.
+"""
+import io
+import json
+import os
+import time
+import tracemalloc
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from realestate.data import file_checksum, resolve_cache_dir
+from realestate.features import FOLDS, listing_ids, out_of_fold_target, station_table, text_features
+from realestate.parsing import NO_METRO
+from realestate.parallel import default_workers, process_pool
+from realestate.scoring import MAX_ROOMS, RIDGE, TARGET, RentModel, _read, feature_frame, mape
+
+SEED = 0
+# Номер формата кэша: после изменения признаков все пересчитывается
+CV_FORMAT = 2
+CV_DIR = 'cv-{checksum}-k{folds}-v{format}'
+# Оценка повторяется, пока не наберется столько секунд (и не меньше 3 раз)
+PREDICT_SECONDS = 0.2
+
+
+def _rooms(features):
+    return np.clip(np.nan_to_num(features['rooms_clean'].to_numpy(), nan=1.0), 1, MAX_ROOMS).astype(np.int64)
+
+
+def _area(features, median):
+    area = features['total_area_clean'].to_numpy()
+    return np.where(area > 0, area, median)
+
+
+class GlobalMedian:
+    """Медиана цены - нижняя планка"""
+    version = 1
+
+    def fit(self, features):
+        self.price = float(features[TARGET].median())
+        return self
+
+    def predict(self, features):
+        return np.full(len(features), self.price)
+
+
+class RoomsMedian:
+    """Медиана цены по числу комнат"""
+    version = 1
+
+    def fit(self, features):
+        price = features[TARGET].to_numpy()
+        rooms = _rooms(features)
+        self.price = np.full(MAX_ROOMS + 1, np.median(price))
+        for room in np.unique(rooms):
+            self.price[room] = np.median(price[rooms == room])
+        return self
+
+    def predict(self, features):
+        return self.price[_rooms(features)]
+
+
+class PricePerMeter:
+    """Площадь, умноженная на медиану цены квадратного метра по числу комнат"""
+    version = 1
+
+    def fit(self, features):
+        self.area_median = float(features['total_area_clean'].median())
+        per_meter = features[TARGET].to_numpy() / features['total_area_clean'].to_numpy()
+        rooms = _rooms(features)
+        self.per_meter = np.full(MAX_ROOMS + 1, np.median(per_meter))
+        for room in np.unique(rooms):
+            self.per_meter[room] = np.median(per_meter[rooms == room])
+        return self
+
+    def predict(self, features):
+        return _area(features, self.area_median) * self.per_meter[_rooms(features)]
+
+
+class NearestNeighbors:
+    """
+    Медиана цены k ближайших объявлений по log площади, комнатам и высоте
+    потолков (признаки нормированы). Расстояния считаются блоками.
+    """
+    version = 2
+    k = 25
+    # Блок больше кэша процессора заметно медленнее: 128 строк на 20 тыс. обучающих
+    block_rows = 128
+
+    def _raw_points(self, features):
+        ceiling = features['Ceiling_height'].to_numpy()
+        ceiling = np.where((ceiling >= 2.0) & (ceiling <= 6.0), ceiling, self.ceiling_median)
+        return np.column_stack([np.log(_area(features, self.area_median)), _rooms(features), ceiling])
+
+    def fit(self, features):
+        ceiling = features['Ceiling_height']
+        self.ceiling_median = float(ceiling[(ceiling >= 2.0) & (ceiling <= 6.0)].median())
+        self.area_median = float(features['total_area_clean'].median())
+        points = self._raw_points(features)
+        self.center, self.spread = points.mean(axis=0), points.std(axis=0) + 1e-9
+        self.points = ((points - self.center) / self.spread).astype('float32')
+        self.price = features[TARGET].to_numpy()
+        return self
+
+    def predict(self, features):
+        points = ((self._raw_points(features) - self.center) / self.spread).astype('float32')
+        k = min(self.k, len(self.points))
+        train_norms = (self.points ** 2).sum(axis=1)
+        predicted = np.empty(len(points))
+        for start in range(0, len(points), self.block_rows):
+            block = points[start:start + self.block_rows]
+            distances = train_norms - 2 * block @ self.points.T
+            nearest = np.argpartition(distances, k - 1, axis=1)[:, :k]
+            predicted[start:start + len(block)] = np.median(self.price[nearest], axis=1)
+        return predicted
+
+
+class RidgeLog:
+    """
+    Модель дашборда и сервиса (scoring.RentModel). Обучается одним
+    RentModel._fit: признаки уже посчитаны и отфильтрованы, а отложенная
+    выборка и MAPE на обучающей RentModel.fit здесь не нужны и завышали бы
+    время обучения.
+    """
+    version = 2
+
+    def fit(self, features):
+        self.model = RentModel._fit(features, RIDGE)
+        return self
+
+    def predict(self, features):
+        return self.model.predict(features)
+
+
+MODELS = {
+    'global_median': GlobalMedian,
+    'rooms_median': RoomsMedian,
+    'price_per_meter': PricePerMeter,
+    'knn': NearestNeighbors,
+    'ridge_log': RidgeLog,
+}
+
+
+def _train_rows(features):
+    return (features[TARGET] > 0) & (features['total_area_clean'] > 0)
+
+
+def encode_location(train, test):
+    """
+    metro_target и metro_frequency строк train и test по ценам и станциям
+    только train: обучающим - out-of-fold по Ad_ID, проверочным - по
+    таблице станций (неизвестная станция - как NO_METRO).
+    """
+    if 'metro_station' not in train.columns:
+        return train, test
+    log_price = np.log(train[TARGET].to_numpy())
+    stations = station_table(train['metro_station'], log_price).set_index('metro_station')
+    default = stations.loc[NO_METRO]
+    train = train.assign(
+        metro_target=out_of_fold_target(train['metro_station'], log_price, train['Ad_ID'].to_numpy()),
+        metro_frequency=stations['metro_frequency'].reindex(train['metro_station']).to_numpy(),
+    )
+    known = stations.reindex(test['metro_station'])
+    test = test.assign(
+        metro_target=known['metro_target'].fillna(default['metro_target']).to_numpy(),
+        metro_frequency=known['metro_frequency'].fillna(default['metro_frequency']).to_numpy(),
+    )
+    return train, test
+
+
+def evaluate_fold(root, name, fold):
+    """Задача процесса: обучает модель name без фолда fold и оценивает на нем"""
+    root = Path(root)
+    features = pd.read_parquet(root / 'features.parquet')
+    folds = np.load(root / 'folds.npy')
+    train = features[(folds != fold) & _train_rows(features).to_numpy()]
+    test = features[(folds == fold) & (features[TARGET] > 0).to_numpy()]
+    train, test = encode_location(train, test)
+
+    start = time.perf_counter()
+    model = MODELS[name]().fit(train)
+    fit_seconds = time.perf_counter() - start
+
+    timings, spent = [], 0.0
+    while len(timings) < 3 or spent < PREDICT_SECONDS:
+        start = time.perf_counter()
+        predicted = model.predict(test)
+        timings.append(time.perf_counter() - start)
+        spent += timings[-1]
+
+    tracemalloc.start()
+    MODELS[name]().fit(train).predict(test)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    return {
+        'model': name,
+        'fold': int(fold),
+        'train_rows': len(train),
+        'test_rows': len(test),
+        'mape': mape(test[TARGET], predicted),
+        'fit_seconds': fit_seconds,
+        'predict_rows_per_s': len(test) / max(min(timings), 1e-9),
+        'peak_memory_mb': peak / 2 ** 20,
+    }
+
+
+class CrossValidation:
+    """Кэш признаков, фолдов и результатов кросс-валидации одного файла данных"""
+
+    def __init__(self, root):
+        self.root = Path(root)
+
+    @classmethod
+    def for_file(cls, path, folds=FOLDS, cache_dir=None):
+        """Кэш для файла path (CSV или Parquet); признаки и фолды считаются при первом обращении"""
+        checksum = file_checksum(path)[:16]
+        cv = cls(resolve_cache_dir(cache_dir) / CV_DIR.format(checksum=checksum, folds=folds, format=CV_FORMAT))
+        if not (cv.root / 'features.parquet').exists() or not (cv.root / 'folds.npy').exists():
+            cv.prepare(_read(path), folds)
+        return cv
+
+    def prepare(self, frame, folds):
+        """Записывает признаки и фолды frame в каталог кэша"""
+        self.root.mkdir(parents=True, exist_ok=True)
+        (self.root / 'results').mkdir(exist_ok=True)
+        features = feature_frame(frame)
+        ids = listing_ids(frame)
+        if ids is not None:
+            # Цены здесь не нужны: кодировки станций считает каждый фолд (encode_location)
+            text = text_features(frame)
+            features['metro_minutes'] = text['metro_minutes'].to_numpy()
+            features['metro_walk'] = text['metro_walk'].to_numpy()
+            features['metro_station'] = text['metro_station'].to_numpy()
+            features['Ad_ID'] = ids
+        features = features.reset_index(drop=True)
+        if ids is not None and not np.isnan(ids).any():
+            assignment = ids.astype(np.int64) % folds
+        else:
+            assignment = np.random.default_rng(SEED).permutation(len(features)) % folds
+        _atomic(self.root / 'features.parquet', features.to_parquet)
+        _atomic(self.root / 'folds.npy', lambda tmp: tmp.write_bytes(_npy_bytes(assignment)))
+
+    @property
+    def folds(self):
+        return int(np.load(self.root / 'folds.npy').max()) + 1
+
+    def _result_path(self, name, fold):
+        return self.root / 'results' / f'{name}-v{MODELS[name].version}-fold{fold}.json'
+
+    def run(self, names=None, workers=None, force=False):
+        """
+        Результаты всех пар (модель, фолд) для моделей names (по умолчанию
+        все MODELS). Посчитанные раньше читаются из results/, остальные
+        считаются на workers процессах (1 - в текущем процессе).
+        """
+        names = list(names or MODELS)
+        tasks = [(name, fold) for name in names for fold in range(self.folds)]
+        todo = [task for task in tasks if force or not self._result_path(*task).exists()]
+        workers = min(workers or default_workers(), max(len(todo), 1))
+        if workers == 1:
+            computed = [evaluate_fold(self.root, name, fold) for name, fold in todo]
+        else:
+            pool = process_pool(workers)
+            computed = list(pool.map(evaluate_fold, [self.root] * len(todo), *zip(*todo))) if todo else []
+        for result in computed:
+            path = self._result_path(result['model'], result['fold'])
+            _atomic(path, lambda tmp: tmp.write_text(json.dumps(result, indent=2), encoding='utf-8'))
+        return [json.loads(self._result_path(*task).read_text(encoding='utf-8')) for task in tasks]
+
+
+def summarize(results):
+    """Средние по фолдам для каждой модели: {модель: {метрика: значение}}"""
+    frame = pd.DataFrame(results)
+    summary = {}
+    for name, rows in frame.groupby('model', sort=False):
+        summary[name] = {
+            'mape': float(rows['mape'].mean()),
+            'mape_std': float(rows['mape'].std(ddof=0)),
+            'mape_folds': rows.sort_values('fold')['mape'].round(4).tolist(),
+            'fit_seconds': float(rows['fit_seconds'].mean()),
+            'predict_rows_per_s': float(rows['predict_rows_per_s'].median()),
+            'peak_memory_mb': float(rows['peak_memory_mb'].max()),
+            'version': MODELS[name].version,
+        }
+    return summary
+
+
+def _npy_bytes(array):
+    buffer = io.BytesIO()
+    np.save(buffer, array, allow_pickle=False)
+    return buffer.getvalue()
+
+
+def _atomic(path, write):
+    tmp = path.with_name(path.name + '.tmp')
+    write(tmp)
+    os.replace(tmp, path)
@@ -0,0 +1,276 @@
+"""
+Хранилище признаков местоположения по версии датасета.
+
+Метро и адрес в выгрузке - свободный текст. Здесь они один раз разбираются
+и кодируются, а обучение, пакетная оценка и дашборд берут готовые значения
+по Ad_ID:
+
+- metro_station - станция (parse_metro_station), без станции - NO_METRO;
+- metro_minutes, metro_walk - минуты до метро и пешком ли (1/0);
+- metro_frequency - доля объявлений у станции (frequency encoding);
+- metro_target - средний логарифм цены у станции со сглаживанием к общему
+  среднему (target encoding). Для строк хранилища значение считается без
+  их собственного фолда (out-of-fold), чтобы модель не видела цену строки
+  в ее же признаке;
+- address, street - адрес в нижнем регистре без пунктуации и он же без
+  города и номера дома.
+
+На диске: каталог features-<версия>-v<формат> рядом с кэшем датасета,
+listings.parquet (строки по возрастанию Ad_ID) и stations.parquet
+(кодировки станций по всем строкам - для новых объявлений, которых нет в
+хранилище). При открытии колонки читаются в numpy, поиск по Ad_ID -
+двоичный (searchsorted), одно объявление находится за микросекунды.
+"""
+import os
+import shutil
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+from realestate.dedup import normalize_text
+from realestate.parsing import (
+    ARROW_STRING, METRO_COLUMN, NO_METRO, parse_listing_fields, parse_metro_distance, parse_metro_station,
+)
+
+STORE_FORMAT = 1
+STORE_DIR = 'features-{version}-v{format}'
+LISTINGS_FILE = 'listings.parquet'
+STATIONS_FILE = 'stations.parquet'
+
+# Колонки выгрузки и очищенного датасета (pipeline.py)
+ID_COLUMNS = ('Ad_ID', 'ID  объявления')
+METRO_COLUMNS = (METRO_COLUMN, 'Metro')
+ADDRESS_COLUMNS = ('Адрес', 'Address')
+
+# Признаки для модели: числа, которые есть и у строк хранилища, и у новых объявлений
+LOCATION_FEATURES = ['metro_target', 'metro_frequency', 'metro_minutes', 'metro_walk']
+TEXT_FEATURES = ['metro_station', 'address', 'street']
+FOLDS = 5
+# Вес общего среднего в target encoding (в "объявлениях")
+SMOOTHING = 20
+
+
+def _first_column(frame, names):
+    for name in names:
+        if name in frame.columns:
+            return frame[name]
+    return pd.Series(pd.NA, index=frame.index, dtype=ARROW_STRING)
+
+
+def listing_ids(frame):
+    """Ad_ID строк frame (int64) или None, если колонки нет"""
+    for name in ID_COLUMNS:
+        if name in frame.columns:
+            return pd.to_numeric(frame[name], errors='coerce').to_numpy(dtype='float64')
+    return None
+
+
+def normalize_street(address):
+    """Нормализованный адрес без "москва" в начале и без номера дома, корпуса, строения"""
+    array = pa.array(address.array)
+    array = pc.replace_substring_regex(array, r'^москва\s*', '')
+    array = pc.replace_substring_regex(array, r'(\s+(\d\S*|к|корп|стр|с|д))+$', '')
+    return pd.Series(pd.arrays.ArrowStringArray(array), index=address.index)
+
+
+def text_features(frame):
+    """Станция, минуты до метро, пешком ли, адрес и улица для каждой строки frame"""
+    metro = _first_column(frame, METRO_COLUMNS)
+    distance = parse_metro_distance(metro)
+    address = normalize_text(_first_column(frame, ADDRESS_COLUMNS))
+    return pd.DataFrame({
+        'metro_station': parse_metro_station(metro).fillna(NO_METRO),
+        'metro_minutes': distance['minutes'],
+        'metro_walk': distance['walk'],
+        'address': address,
+        'street': normalize_street(address),
+    }, index=frame.index)
+
+
+def _log_price(frame):
+    if 'price_clean' in frame.columns:
+        price = frame['price_clean'].to_numpy(dtype='float64')
+    else:
+        price = parse_listing_fields(frame)['price_clean'].to_numpy()
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(price > 0, np.log(price), np.nan)
+
+
+def station_table(stations, log_price, smoothing=SMOOTHING):
+    """
+    Кодировки станций по всем строкам: metro_station, count,
+    metro_frequency, metro_target. Строка NO_METRO есть всегда.
+    """
+    codes, names = pd.factorize(pd.concat([stations, pd.Series([NO_METRO], dtype=stations.dtype)]))
+    codes, known = codes[:-1], ~np.isnan(log_price)
+    counts = np.bincount(codes, minlength=len(names))
+    priced = np.bincount(codes[known], minlength=len(names))
+    sums = np.bincount(codes[known], weights=log_price[known], minlength=len(names))
+    mean = log_price[known].mean() if known.any() else 0.0
+    return pd.DataFrame({
+        'metro_station': pd.array(names, dtype=ARROW_STRING),
+        'count': counts,
+        'metro_frequency': (counts / max(len(stations), 1)).astype('float32'),
+        'metro_target': ((sums + smoothing * mean) / (priced + smoothing)).astype('float32'),
+    })
+
+
+def out_of_fold_target(stations, log_price, ids, folds=FOLDS, smoothing=SMOOTHING):
+    """
+    metro_target каждой строки по строкам других фолдов; фолд задается
+    Ad_ID, поэтому значение строки не меняется от пересборки хранилища.
+    """
+    codes, names = pd.factorize(stations)
+    fold = np.nan_to_num(ids, nan=0).astype(np.int64) % folds
+    known = ~np.isnan(log_price)
+    size = len(names) * folds
+    cell = codes * folds + fold
+    cell_sums = np.bincount(cell[known], weights=log_price[known], minlength=size).reshape(-1, folds)
+    cell_counts = np.bincount(cell[known], minlength=size).reshape(-1, folds)
+    total_sums, total_counts = cell_sums.sum(axis=1), cell_counts.sum(axis=1)
+
+    fold_sums = np.bincount(fold[known], weights=log_price[known], minlength=folds)
+    fold_counts = np.bincount(fold[known], minlength=folds)
+    # Общее среднее тоже без своего фолда
+    prior = (fold_sums.sum() - fold_sums) / np.maximum(fold_counts.sum() - fold_counts, 1)
+
+    sums = total_sums[codes] - cell_sums[codes, fold]
+    counts = total_counts[codes] - cell_counts[codes, fold]
+    return ((sums + smoothing * prior[fold]) / (counts + smoothing)).astype('float32')
+
+
+def build_features(frame):
+    """
+    Признаки всех строк frame: (listings по возрастанию Ad_ID, stations).
+    У повторяющихся Ad_ID остается первая строка.
+    """
+    ids = listing_ids(frame)
+    if ids is None:
+        raise ValueError(f'Для хранилища признаков нужна колонка {" или ".join(ID_COLUMNS)}')
+    text = text_features(frame)
+    log_price = _log_price(frame)
+    stations = station_table(text['metro_station'], log_price)
+
+    listings = text.assign(Ad_ID=ids)
+    listings['metro_target'] = out_of_fold_target(text['metro_station'], log_price, ids)
+    frequency = stations.set_index('metro_station')['metro_frequency']
+    listings['metro_frequency'] = frequency.reindex(text['metro_station']).to_numpy()
+    listings = listings[~np.isnan(ids)].drop_duplicates('Ad_ID')
+    listings['Ad_ID'] = listings['Ad_ID'].astype('int64')
+    listings = listings.sort_values('Ad_ID', kind='stable').reset_index(drop=True)
+    return listings[['Ad_ID'] + LOCATION_FEATURES + TEXT_FEATURES], stations
+
+
+def _write_table(frame, path):
+    table = pa.Table.from_pandas(frame, preserve_index=False)
+    # Повторяющиеся строки (станции, улицы) хранятся словарем
+    pq.write_table(table, path, use_dictionary=True, compression='zstd')
+
+
+class FeatureStore:
+    """Признаки местоположения одной версии датасета, поиск по Ad_ID"""
+
+    def __init__(self, root):
+        self.root = Path(root)
+        listings = pq.read_table(self.root / LISTINGS_FILE)
+        self.ids = listings.column('Ad_ID').to_numpy()
+        self.columns = {name: listings.column(name).to_numpy(zero_copy_only=False)
+                        for name in LOCATION_FEATURES + TEXT_FEATURES}
+        self.stations = pd.read_parquet(self.root / STATIONS_FILE).set_index('metro_station')
+
+    @classmethod
+    def build(cls, frame, root):
+        """Считает признаки frame, атомарно записывает каталог root и открывает его"""
+        root = Path(root)
+        listings, stations = build_features(frame)
+        tmp = root.with_name(root.name + '.tmp')
+        shutil.rmtree(tmp, ignore_errors=True)
+        tmp.mkdir(parents=True)
+        _write_table(listings, tmp / LISTINGS_FILE)
+        _write_table(stations, tmp / STATIONS_FILE)
+        shutil.rmtree(root, ignore_errors=True)
+        os.replace(tmp, root)
+        return cls(root)
+
+    @classmethod
+    def for_dataset(cls, dataset):
+        """Хранилище версии датасета рядом с его кэшем; строится при первом обращении"""
+        root = dataset.path.parent / STORE_DIR.format(version=dataset.version, format=STORE_FORMAT)
+        if (root / LISTINGS_FILE).exists() and (root / STATIONS_FILE).exists():
+            return cls(root)
+        return cls.build(dataset.frame, root)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def positions(self, ids):
+        """Номера строк хранилища для ids; -1 для отсутствующих"""
+        ids = np.asarray(ids, dtype='float64')
+        valid = ~np.isnan(ids)
+        keys = np.where(valid, ids, 0).astype(np.int64)
+        found = np.minimum(np.searchsorted(self.ids, keys), max(len(self.ids) - 1, 0))
+        hit = valid & (len(self.ids) > 0)
+        hit[hit] = self.ids[found[hit]] == keys[hit]
+        return np.where(hit, found, -1)
+
+    def lookup(self, ad_id):
+        """Признаки одного объявления (dict) или None, если его нет в хранилище"""
+        i = np.searchsorted(self.ids, ad_id)
+        if i == len(self.ids) or self.ids[i] != ad_id:
+            return None
+        return {name: values[i].item() if hasattr(values[i], 'item') else values[i]
+                for name, values in self.columns.items()}
+
+    def lookup_many(self, ids, index=None):
+        """
+        Признаки LOCATION_FEATURES для ids одним проходом; для отсутствующих
+        в хранилище - NaN. Индекс результата - index (по умолчанию 0..n-1).
+        """
+        rows = self.positions(ids)
+        missing = rows < 0
+        result = {}
+        for name in LOCATION_FEATURES:
+            values = self.columns[name][np.maximum(rows, 0)].astype('float64')
+            values[missing] = np.nan
+            result[name] = values
+        return pd.DataFrame(result, index=index)
+
+    def station_features(self, station, minutes=None, walk=None):
+        """LOCATION_FEATURES объявления по станции и времени до нее (для новых объявлений)"""
+        row = self.stations.loc[station] if station in self.stations.index else self.stations.loc[NO_METRO]
+        return {
+            'metro_target': float(row['metro_target']),
+            'metro_frequency': float(row['metro_frequency']),
+            'metro_minutes': np.nan if minutes is None else float(minutes),
+            'metro_walk': np.nan if walk is None else float(walk),
+        }
+
+    def encode(self, frame):
+        """LOCATION_FEATURES по тексту метро frame и таблице станций, без поиска по Ad_ID"""
+        text = text_features(frame)
+        stations = self.stations.reindex(text['metro_station'].to_numpy())
+        default = self.stations.loc[NO_METRO]
+        return pd.DataFrame({
+            'metro_target': stations['metro_target'].fillna(default['metro_target']).to_numpy('float64'),
+            'metro_frequency': stations['metro_frequency'].fillna(default['metro_frequency']).to_numpy('float64'),
+            'metro_minutes': text['metro_minutes'].to_numpy(),
+            'metro_walk': text['metro_walk'].to_numpy(),
+        }, index=frame.index)
+
+    def features_for(self, frame):
+        """
+        LOCATION_FEATURES строк frame: по Ad_ID из хранилища, а строки, которых
+        в нем нет (или frame без Ad_ID), кодируются по тексту метро (encode).
+        """
+        ids = listing_ids(frame)
+        if ids is None:
+            return self.encode(frame)
+        found = self.lookup_many(ids, index=frame.index)
+        missing = found['metro_target'].isna().to_numpy()
+        if missing.any():
+            found.loc[missing] = self.encode(frame[missing]).to_numpy()
+        return found
@@ -0,0 +1,331 @@
+"""
+Индекс для интерактивных фильтров дашборда.
+
+Фильтры (цена, площадь, высота потолков - диапазоны; комнаты и станции
+метро - наборы значений) не проверяются булевой маской по всему фрейму.
+Индекс строится один раз на версию датасета по аналитическому фрейму
+(frame.build_analysis_frame):
+
+- для категорий (комнаты, станция) - номера строк каждого значения подряд
+  в одном массиве, по возрастанию значения (CSR: positions и offsets);
+- для чисел - номера строк по возрастанию значения: диапазон - это
+  непрерывный кусок массива, его границы находятся двоичным поиском.
+
+Запрос сначала оценивает размер каждого фильтра по индексу (без
+просмотра строк). Если самый узкий фильтр оставляет меньше 1/DENSE_SHARE
+строк, берутся его строки, а остальные фильтры пересекаются с ними
+проверкой только этих строк. Иначе выборка широкая, и каждый фильтр
+дает битовую маску по всем строкам (последовательный проход по колонке
+дешевле, чем выборка сотен тысяч строк вразброс), маски объединяются
+через "и". В обоих случаях номера строк идут по возрастанию, чтобы
+сводка читала колонки последовательно.
+
+Сводка по выбранным строкам (медианы, разбивка по комнатам, станции,
+гистограмма цены) считается по заранее подготовленным колонкам numpy.
+Медианы не сортируют выборку: у каждой строки заранее известен номер ее
+значения среди уникальных значений колонки (RankedColumn), число строк
+на каждое значение считает bincount, а медиана находится по накопленной
+сумме. Так же за один bincount считаются медианы по числу комнат. Номер
+корзины гистограммы у каждой строки тоже посчитан заранее.
+"""
+import numpy as np
+import pandas as pd
+
+from realestate.parsing import NO_METRO, parse_metro_station
+
+RANGE_COLUMNS = {
+    'price_clean': 'Цена, руб',
+    'total_area_clean': 'Площадь, м²',
+    'Ceiling_height': 'Высота потолков, м',
+}
+# Комнат больше MAX_ROOMS - одно значение "MAX_ROOMS+"
+MAX_ROOMS = 6
+NO_DATA = 'нет данных'
+PRICE_BINS = 40
+TOP_STATIONS = 10
+# Выборка шире 1/DENSE_SHARE строк считается битовыми масками
+DENSE_SHARE = 16
+
+
+def _csr(codes, size):
+    """Номера строк, сгруппированные по коду (внутри кода - по возрастанию), и границы групп"""
+    positions = np.argsort(codes, kind='stable').astype(np.int32)
+    offsets = np.zeros(size + 1, dtype=np.int64)
+    np.cumsum(np.bincount(codes, minlength=size), out=offsets[1:])
+    return positions, offsets
+
+
+def _median(values):
+    values = values[~np.isnan(values)]
+    return float(np.median(values.astype('float64'))) if len(values) else float('nan')
+
+
+class RankedColumn:
+    """
+    Колонка для медиан по выборкам строк: levels - уникальные значения по
+    возрастанию, ranks - номер значения каждой строки (пропуск - len(levels)).
+    """
+
+    def __init__(self, values):
+        self.values = values
+        valid = ~np.isnan(values)
+        self.levels, inverse = np.unique(values[valid], return_inverse=True)
+        self.ranks = np.full(len(values), len(self.levels), dtype=np.int32)
+        self.ranks[valid] = inverse
+
+    def _from_counts(self, counts):
+        total = int(counts.sum())
+        if not total:
+            return float('nan')
+        cumulative = np.cumsum(counts)
+        low = np.searchsorted(cumulative, (total - 1) // 2, side='right')
+        high = np.searchsorted(cumulative, total // 2, side='right')
+        return (float(self.levels[low]) + float(self.levels[high])) / 2
+
+    def medians(self, rows, groups=None, size=1):
+        """
+        Медиана значений строк rows и медианы по группам groups[rows]
+        (коды 0..size-1): (общая, [по группам]).
+        """
+        if len(rows) * 4 < len(self.levels) * size:
+            # Выборка меньше числа значений - быстрее посчитать напрямую
+            values = self.values[rows]
+            if groups is None:
+                return _median(values), [_median(values)]
+            codes = groups[rows]
+            return _median(values), [_median(values[codes == code]) for code in range(size)]
+        levels = len(self.levels) + 1
+        codes = self.ranks[rows]
+        if groups is not None:
+            codes = groups[rows].astype(np.int64) * levels + codes
+        counts = np.bincount(codes, minlength=size * levels).reshape(size, levels)[:, :-1]
+        return self._from_counts(counts.sum(axis=0)), [self._from_counts(row) for row in counts]
+
+
+class CategoryIndex:
+    """Строки каждого значения категории: labels[code] -> positions[offsets[code]:offsets[code + 1]]"""
+
+    def __init__(self, codes, labels):
+        self.codes = codes
+        self.labels = list(labels)
+        self._codes_by_label = {label: code for code, label in enumerate(self.labels)}
+        self.positions, self.offsets = _csr(codes, len(self.labels))
+
+    def counts(self):
+        return np.diff(self.offsets)
+
+    def _selected(self, labels):
+        return sorted(self._codes_by_label[label] for label in labels if label in self._codes_by_label)
+
+    def size(self, labels):
+        codes = self._selected(labels)
+        return int(sum(self.offsets[c + 1] - self.offsets[c] for c in codes))
+
+    def rows(self, labels):
+        codes = self._selected(labels)
+        if not codes:
+            return np.empty(0, dtype=np.int32)
+        return np.concatenate([self.positions[self.offsets[c]:self.offsets[c + 1]] for c in codes])
+
+    def _allowed(self, labels):
+        allowed = np.zeros(len(self.labels), dtype=bool)
+        allowed[self._selected(labels)] = True
+        return allowed
+
+    def keep(self, rows, labels):
+        """Строки rows, у которых значение из labels"""
+        return rows[self._allowed(labels)[self.codes[rows]]]
+
+    def mask(self, labels):
+        """Битовая маска строк со значением из labels"""
+        return self._allowed(labels)[self.codes]
+
+
+class RangeIndex:
+    """Строки по возрастанию значения; пропуски - в конце и в диапазоны не попадают"""
+
+    def __init__(self, values):
+        self.values = values
+        self.positions = np.argsort(values, kind='stable').astype(np.int32)
+        self.sorted = values[self.positions]
+        self.valid = int(np.count_nonzero(~np.isnan(values)))
+
+    def bounds(self):
+        if not self.valid:
+            return float('nan'), float('nan')
+        return float(self.sorted[0]), float(self.sorted[self.valid - 1])
+
+    def _slice(self, low, high):
+        valid = self.sorted[:self.valid]
+        dtype = valid.dtype.type
+        return (int(np.searchsorted(valid, dtype(low), side='left')),
+                int(np.searchsorted(valid, dtype(high), side='right')))
+
+    def size(self, low, high):
+        start, stop = self._slice(low, high)
+        return max(stop - start, 0)
+
+    def rows(self, low, high):
+        start, stop = self._slice(low, high)
+        return self.positions[start:max(stop, start)]
+
+    def keep(self, rows, low, high):
+        """Строки rows со значением в [low, high]"""
+        dtype = self.values.dtype.type
+        values = self.values[rows]
+        return rows[(values >= dtype(low)) & (values <= dtype(high))]
+
+    def mask(self, low, high):
+        """Битовая маска строк со значением в [low, high]"""
+        dtype = self.values.dtype.type
+        mask = self.values >= dtype(low)
+        mask &= self.values <= dtype(high)
+        return mask
+
+
+def room_codes(rooms):
+    """Код комнат: 0 - нет данных, 1..MAX_ROOMS (больше - MAX_ROOMS)"""
+    codes = np.nan_to_num(rooms, nan=0.0)
+    return np.clip(codes, 0, MAX_ROOMS).astype(np.uint8)
+
+
+def station_codes(metro):
+    """Коды станций по категориальной колонке Metro и их названия (без метро - NO_METRO)"""
+    stations = parse_metro_station(pd.Series(metro.cat.categories.astype(str))).fillna(NO_METRO)
+    station_of_category, names = pd.factorize(stations)
+    names = list(names)
+    if NO_METRO not in names:
+        names.append(NO_METRO)
+    no_metro = names.index(NO_METRO)
+    category = metro.cat.codes.to_numpy()
+    codes = np.where(category >= 0, np.append(station_of_category, no_metro)[category], no_metro)
+    return codes.astype(np.int32), names
+
+
+class FilterIndex:
+    """
+    Индексы фильтров аналитического фрейма. Фильтры - словарь:
+    {'price_clean': (от, до), 'rooms': ['1', '2'], 'metro': ['Арбатская'], ...};
+    диапазоны - по RANGE_COLUMNS, наборы - по categories. Фильтры, не
+    сужающие выборку (диапазон от минимума до максимума), не применяются.
+    """
+
+    def __init__(self, analysis):
+        self.rows = len(analysis)
+        self.ranges = {column: RangeIndex(analysis[column].to_numpy(dtype='float32'))
+                       for column in RANGE_COLUMNS if column in analysis.columns}
+        room_labels = [NO_DATA] + [str(r) for r in range(1, MAX_ROOMS)] + [f'{MAX_ROOMS}+']
+        self.categories = {'rooms': CategoryIndex(room_codes(analysis['rooms_clean'].to_numpy()), room_labels)}
+        if 'Metro' in analysis.columns:
+            self.categories['metro'] = CategoryIndex(*station_codes(analysis['Metro']))
+
+        self.price = analysis['price_clean'].to_numpy(dtype='float32')
+        area = analysis['total_area_clean'].to_numpy(dtype='float32')
+        with np.errstate(divide='ignore', invalid='ignore'):
+            price_per_meter = np.where((self.price > 0) & (area > 0), self.price / area, np.nan)
+        self.medians = {
+            'price': RankedColumn(self.price),
+            'area': RankedColumn(area),
+            'price_per_meter': RankedColumn(price_per_meter.astype('float32')),
+        }
+        self.price_edges, self.price_bins = self._price_bins()
+        self._full_summary = None
+
+    def _price_bins(self):
+        """Границы гистограммы цены (логарифмическая шкала) и корзина каждой строки; PRICE_BINS - нет цены"""
+        low, high = self.ranges['price_clean'].bounds()
+        if not low > 0 or not high > low:
+            return np.array([0.0, 1.0]), np.where(np.isnan(self.price), 1, 0).astype(np.uint8)
+        edges = np.geomspace(low, high, PRICE_BINS + 1)
+        bins = np.searchsorted(edges, self.price, side='right') - 1
+        bins = np.clip(bins, 0, PRICE_BINS - 1)
+        bins[~(self.price > 0)] = PRICE_BINS
+        return edges, bins.astype(np.uint8)
+
+    def bounds(self, column):
+        """Минимум и максимум колонки (для ползунков)"""
+        return self.ranges[column].bounds()
+
+    def options(self, name):
+        """Значения категории, по убыванию числа объявлений"""
+        index = self.categories[name]
+        counts = index.counts()
+        order = np.argsort(-counts, kind='stable')
+        return [index.labels[i] for i in order if counts[i] > 0]
+
+    def _active(self, filters):
+        active = []
+        for name, value in filters.items():
+            if name in self.ranges:
+                low, high = self.ranges[name].bounds()
+                if value is None or (value[0] <= low and value[1] >= high):
+                    continue
+                index = self.ranges[name]
+                active.append((index.size(*value), index, tuple(value)))
+            elif name in self.categories:
+                if value is None:
+                    continue
+                index = self.categories[name]
+                active.append((index.size(value), index, (list(value),)))
+            else:
+                raise KeyError(f'Неизвестный фильтр {name!r}')
+        return sorted(active, key=lambda item: item[0])
+
+    def select(self, filters):
+        """
+        Номера строк, прошедших все фильтры (по возрастанию), или None,
+        если ни один фильтр не сужает выборку.
+        """
+        active = self._active(filters)
+        if not active:
+            return None
+        size, index, args = active[0]
+        if size * DENSE_SHARE > self.rows:
+            mask = index.mask(*args)
+            for _, index, args in active[1:]:
+                mask &= index.mask(*args)
+            return np.flatnonzero(mask).astype(np.int32)
+        rows = np.sort(index.rows(*args))
+        for _, index, args in active[1:]:
+            if not len(rows):
+                break
+            rows = index.keep(rows, *args)
+        return rows
+
+    def summary(self, filters):
+        """Сводка по строкам, прошедшим фильтры; без фильтров - по всему фрейму (считается один раз)"""
+        rows = self.select(filters)
+        if rows is None:
+            if self._full_summary is None:
+                self._full_summary = self._summarize(np.arange(self.rows, dtype=np.int32))
+            return self._full_summary
+        return self._summarize(rows)
+
+    def _summarize(self, rows):
+        rooms = self.categories['rooms']
+        price, by_rooms = self.medians['price'].medians(rows, rooms.codes, len(rooms.labels))
+        result = {
+            'count': len(rows),
+            'price_median': price,
+            'area_median': self.medians['area'].medians(rows)[0],
+            'price_per_meter_median': self.medians['price_per_meter'].medians(rows)[0],
+        }
+        result['rooms'] = pd.DataFrame({
+            'Объявлений': np.bincount(rooms.codes[rows], minlength=len(rooms.labels)),
+            'Медианная цена': by_rooms,
+        }, index=pd.Index(rooms.labels, name='Комнат'))
+        result['rooms'] = result['rooms'][result['rooms']['Объявлений'] > 0]
+
+        if 'metro' in self.categories:
+            metro = self.categories['metro']
+            counts = np.bincount(metro.codes[rows], minlength=len(metro.labels))
+            top = np.argsort(-counts, kind='stable')[:TOP_STATIONS]
+            top = top[counts[top] > 0]
+            result['stations'] = pd.Series(counts[top], index=pd.Index([metro.labels[i] for i in top],
+                                                                     name='Станция'), name='Объявлений')
+
+        counts = np.bincount(self.price_bins[rows], minlength=PRICE_BINS + 1)[:len(self.price_edges) - 1]
+        result['price_histogram'] = pd.Series(
+            counts, index=pd.Index(np.round(self.price_edges[:-1], -2).astype(np.int64), name='Цена от, руб'),
+            name='Объявлений')
+        return result
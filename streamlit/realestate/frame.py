@@ -0,0 +1,70 @@
+"""
+Типизированный "аналитический" фрейм для дашборда.
+
+Строится один раз на версию датасета: из выгрузки берутся только нужные
+анализам колонки, числовые поля разбираются и хранятся во float32,
+текстовые категории - в category. Длинные тексты ("Описание", "Телефоны")
+в него не попадают.
+
+Фрейм общий для всех сессий (st.cache_resource), поэтому анализы его не
+изменяют: выбирают колонки/строки и работают с полученными срезами.
+Он сохраняется в Parquet рядом с кэшем датасета (analysis-<версия>.parquet):
+новые процессы не разбирают выгрузку заново, а сводки DuckDB
+(queries.py) читают из этого файла только нужные колонки.
+"""
+import os
+
+import pandas as pd
+
+from realestate.parsing import parse_listing_fields
+
+ANALYSIS_FILE = 'analysis-{version}.parquet'
+
+NUMERIC_COLUMNS = ['price_clean', 'total_area_clean', 'rooms_clean', 'Ceiling_height']
+
+# Исходное название -> название в аналитическом фрейме (как в preprocessing.ipynb)
+CATEGORY_COLUMNS = {
+    'Метро': 'Metro',
+    'Ремонт': 'Renovation',
+    'Можно с детьми/животными': 'Children_pets',
+}
+
+
+def build_analysis_frame(df):
+    """
+    Возвращает компактный фрейм с колонками price_clean, total_area_clean,
+    rooms_clean, Ceiling_height (float32) и Metro, Renovation, Children_pets
+    (category). Категории, которых нет в df, в результат не попадают.
+    """
+    parsed = parse_listing_fields(df)
+    frame = pd.DataFrame(index=df.index)
+    for column in NUMERIC_COLUMNS:
+        frame[column] = parsed[column].astype('float32')
+    for raw, name in CATEGORY_COLUMNS.items():
+        if raw in df.columns:
+            frame[name] = df[raw].astype('category')
+    return frame
+
+
+def analysis_path(dataset):
+    """Parquet аналитического фрейма версии датасета"""
+    return dataset.path.parent / ANALYSIS_FILE.format(version=dataset.version)
+
+
+def load_analysis_frame(dataset):
+    """
+    Аналитический фрейм версии датасета: из analysis-<версия>.parquet или
+    построенный по dataset.frame и сохраненный туда. Фрейм всегда читается
+    из файла, чтобы типы не зависели от того, был ли файл.
+    """
+    path = analysis_path(dataset)
+    if not path.exists():
+        tmp = path.with_suffix('.parquet.tmp')
+        build_analysis_frame(dataset.frame).to_parquet(tmp)
+        os.replace(tmp, path)
+    return pd.read_parquet(path)
+
+
+def frame_memory_mb(df):
+    """Объем фрейма в памяти с учетом строк, МБ"""
+    return df.memory_usage(deep=True).sum() / 2**20
@@ -0,0 +1,178 @@
+"""
+Потоковая загрузка сырой выгрузки, которая не помещается в память.
+
+CSV читается блоками (record batches pyarrow), к каждому блоку применяются
+шаги очистки из pipeline.py, и результат сразу дописывается в Parquet,
+разбитый по станциям метро (hive: metro_station=<станция>/...). В памяти
+одновременно находятся только текущий блок и буферы открытых файлов.
+
+Статистики заполнения пропусков (моды, медианы) нужны до обработки первого
+блока. Их можно передать готовыми (fill_stats.json из IncrementalCleaner)
+или посчитать отдельным легким проходом только по нужным колонкам.
+
+Запуск из каталога streamlit/:
+    python -m realestate.ingest raw.csv out_dir [--stats fill_stats.json] [--block-mb 4]
+"""
+import argparse
+import csv
+import itertools
+import json
+import os
+import shutil
+import sys
+import time
+from pathlib import Path
+
+import pyarrow as pa
+import pyarrow.csv as pacsv
+import pyarrow.dataset as ds
+
+from realestate.instrument import peak_rss_mb
+from realestate.parsing import ARROW_STRING, METRO_COLUMN, NO_METRO, ROOMS_COLUMN, parse_metro_station
+from realestate.pipeline import (
+    CEILING_RAW_COLUMN, DERIVED_COLUMNS, FILLS, RENAME_COLUMNS, apply_fills,
+    fill_counts, merge_counts, prepare, stats_from_counts,
+)
+
+ID_COLUMN = 'ID  объявления'
+# Объявления без станции идут в раздел NO_METRO (пустые значения раздела pandas не читает)
+PARTITION_COLUMN = 'metro_station'
+BLOCK_MB = 4
+ROWS_PER_GROUP = 1024
+# Файлы с префиксом "_" читатели Parquet-датасета пропускают
+STATS_FILE = '_fill_stats.json'
+
+# Исходные колонки, от которых зависят статистики заполнения
+_SOURCE_OF = {name: raw for raw, name in RENAME_COLUMNS.items()}
+_SOURCE_OF.update({'rooms_clean': ROOMS_COLUMN, 'Ceiling_height': CEILING_RAW_COLUMN})
+
+
+def _header(path):
+    with open(path, newline='', encoding='utf-8') as f:
+        return next(csv.reader(f))
+
+
+def read_batches(path, block_mb=BLOCK_MB, columns=None):
+    """
+    Итератор по pandas-фреймам из блоков CSV примерно по block_mb мегабайт.
+
+    Все колонки читаются как строки (кроме ID объявления), поэтому тип
+    колонки не меняется от блока к блоку; пустые строки - пропуски.
+    """
+    header = _header(path)
+    types = {name: pa.string() for name in header}
+    types[ID_COLUMN] = pa.int64()
+    reader = pacsv.open_csv(
+        path,
+        read_options=pacsv.ReadOptions(block_size=block_mb << 20, use_threads=False),
+        convert_options=pacsv.ConvertOptions(column_types=types, strings_can_be_null=True,
+                                             include_columns=columns),
+    )
+    for batch in reader:
+        yield batch.to_pandas(types_mapper={pa.string(): ARROW_STRING}.get)
+
+
+def scan_fill_stats(path, block_mb=BLOCK_MB, fills=FILLS):
+    """Статистики заполнения по всему файлу: проход только по нужным колонкам"""
+    header = set(_header(path))
+    columns = [_SOURCE_OF[fill.column] for fill in fills
+               if fill.strategy != 'value' and _SOURCE_OF.get(fill.column) in header]
+    counts = {}
+    for frame in read_batches(path, block_mb, columns):
+        merge_counts(counts, fill_counts(prepare(frame), fills))
+    return stats_from_counts(counts, fills)
+
+
+def _clean_batch(frame, stats):
+    """Очистка одного блока и колонка раздела"""
+    cleaned = apply_fills(prepare(frame), stats)
+    if METRO_COLUMN in frame.columns:
+        cleaned[PARTITION_COLUMN] = parse_metro_station(frame[METRO_COLUMN]).fillna(NO_METRO)
+    else:
+        cleaned[PARTITION_COLUMN] = NO_METRO
+    return pa.Table.from_pandas(cleaned, preserve_index=False)
+
+
+def _schema(table):
+    """Единая схема для всех блоков: числа - float64, ID - int64, остальное строки"""
+    fields = []
+    for field in table.schema:
+        if field.name in DERIVED_COLUMNS:
+            fields.append(pa.field(field.name, pa.float64()))
+        elif field.name == 'Ad_ID':
+            fields.append(pa.field(field.name, pa.int64()))
+        else:
+            fields.append(pa.field(field.name, pa.string()))
+    return pa.schema(fields)
+
+
+def ingest(path, out_dir, stats=None, block_mb=BLOCK_MB, rows_per_group=ROWS_PER_GROUP):
+    """
+    Очищает CSV path блоками и пишет Parquet, разбитый по станциям метро, в out_dir.
+
+    stats - статистики заполнения (dict); если не переданы, считаются
+    scan_fill_stats; они сохраняются в out_dir/_fill_stats.json. Каталог
+    out_dir заменяется после записи целиком.
+    Память ограничена блоком CSV и буферами rows_per_group строк на раздел.
+    Возвращает отчет: rows, seconds, rows_per_s, peak_rss_mb.
+    """
+    start = time.perf_counter()
+    if stats is None:
+        stats = scan_fill_stats(path, block_mb)
+    out_dir = Path(out_dir)
+    tmp_dir = out_dir.with_name(out_dir.name + '.tmp')
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    rows = 0
+    tables = (_clean_batch(frame, stats) for frame in read_batches(path, block_mb))
+    first = next(tables, None)
+    if first is not None:
+        # Схема берется по первому блоку, следующие приводятся к ней
+        schema = _schema(first)
+
+        def record_batches():
+            nonlocal rows
+            for table in itertools.chain([first], tables):
+                table = table.select(schema.names).cast(schema)
+                rows += table.num_rows
+                yield from table.to_batches()
+
+        ds.write_dataset(
+            record_batches(), tmp_dir, schema=schema, format='parquet',
+            partitioning=ds.partitioning(pa.schema([schema.field(PARTITION_COLUMN)]), flavor='hive'),
+            min_rows_per_group=rows_per_group, max_rows_per_group=max(rows_per_group, 64 * 1024),
+            basename_template='part-{i}.parquet',
+        )
+    else:
+        tmp_dir.mkdir(parents=True)
+
+    shutil.rmtree(out_dir, ignore_errors=True)
+    os.replace(tmp_dir, out_dir)
+    (out_dir / STATS_FILE).write_text(json.dumps(stats, ensure_ascii=False, indent=2),
+                                             encoding='utf-8')
+    seconds = time.perf_counter() - start
+    return {
+        'rows': rows,
+        'seconds': seconds,
+        'rows_per_s': rows / seconds if seconds else 0.0,
+        'peak_rss_mb': peak_rss_mb(),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Потоковая очистка выгрузки в Parquet по станциям метро')
+    parser.add_argument('raw', help='исходный CSV выгрузки')
+    parser.add_argument('output', help='каталог для Parquet')
+    parser.add_argument('--stats', help='готовые статистики заполнения (fill_stats.json)')
+    parser.add_argument('--block-mb', type=int, default=BLOCK_MB, help='размер блока CSV, МБ')
+    args = parser.parse_args(argv)
+
+    stats = json.loads(Path(args.stats).read_text(encoding='utf-8')) if args.stats else None
+    report = ingest(args.raw, args.output, stats=stats, block_mb=args.block_mb)
+    print(f'Строк: {report["rows"]:,} за {report["seconds"]:.2f} с '
+          f'({report["rows_per_s"]:,.0f} строк/с), пик RSS {report["peak_rss_mb"]:.0f} МБ')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,332 @@
+"""
+Замеры перезапуска страницы дашборда по этапам.
+
+Страница открывает Rerun.begin() в начале скрипта, оборачивает этапы -
+загрузку данных, сводки, каждый раздел create_* - в rerun.stage(name, rows)
+или декоратор timed() и вызывает rerun.finish() в finally: прогон может
+прерваться исключением, st.stop() или перезапуском по виджету. Для этапа
+записываются время, память (tracemalloc: пик и прирост выделенного за
+этап, включая буферы numpy/pandas) и число строк данных на входе - его
+передает вызывающий (rows у stage() и timed()), иначе оно пустое. Этапы
+бывают вложенными: ChartCache.get записывает отрисовку и кодирование PNG
+как этап раздела, в котором вызван (функция stage() пишет в текущий
+перезапуск).
+
+Замеры включаются:
+- REA_DEBUG=1 или ?debug=1 в адресе страницы - таблица этапов в боковой
+  панели и выгрузка ее в CSV/JSON;
+- REA_TIMING_LOG=путь - строки этапов каждого перезапуска дописываются в
+  журнал: CSV, если путь оканчивается на .csv, иначе JSON Lines.
+Без них stage() ничего не измеряет.
+
+Профилирование: кнопка в отладочной панели (или ?profile=1 в адресе)
+выполняет следующий перезапуск под cProfile. Дамп pstats сохраняется в
+REA_PSTATS_DIR (по умолчанию pstats/ в каталоге кэша), самые долгие
+функции показываются в панели; дамп можно открыть python -m pstats.
+
+tracemalloc общий для процесса: при одновременных сессиях в пик попадает
+и их память. cProfile видит только поток своей сессии. Перезапуски
+одного фрагмента (st.fragment) не записываются.
+"""
+import contextvars
+import cProfile
+import csv
+import functools
+import io
+import json
+import os
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+import uuid
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+
+from realestate.data import resolve_cache_dir
+
+DEBUG_ENV = 'REA_DEBUG'
+LOG_ENV = 'REA_TIMING_LOG'
+PSTATS_DIR_ENV = 'REA_PSTATS_DIR'
+LOG_FIELDS = ['run', 'page', 'started', 'stage', 'depth', 'seconds', 'peak_mb', 'allocated_mb', 'rows']
+TOTAL_STAGE = 'Перезапуск целиком'
+TOP_FUNCTIONS = 25
+# Ключ session_state: профилировать следующий перезапуск
+PROFILE_NEXT = 'rea_profile_next_rerun'
+
+_current = contextvars.ContextVar('rea_rerun', default=None)
+_lock = threading.Lock()
+_tracers = 0
+# Трассировку запустил этот модуль; чужую (python -X tracemalloc, замер
+# памяти в evaluation.py) он не останавливает
+_owns_tracing = False
+
+
+def _start_tracing():
+    global _tracers, _owns_tracing
+    with _lock:
+        if not _tracers:
+            _owns_tracing = not tracemalloc.is_tracing()
+            if _owns_tracing:
+                tracemalloc.start()
+        _tracers += 1
+
+
+def _stop_tracing():
+    global _tracers
+    with _lock:
+        _tracers -= 1
+        if not _tracers and _owns_tracing:
+            tracemalloc.stop()
+
+
+def peak_rss_mb():
+    """
+    Пиковый RSS процесса, МБ. В Linux - VmHWM с последнего exec (ru_maxrss
+    дочерний процесс наследует от родителя), в других системах - ru_maxrss,
+    в Windows (нет модуля resource) - пиковый рабочий набор из psutil.
+    """
+    try:
+        with open('/proc/self/status') as status:
+            for line in status:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    try:
+        import resource
+    except ImportError:
+        import psutil
+
+        info = psutil.Process().memory_info()
+        return getattr(info, 'peak_wset', info.rss) / 2**20
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS отдает ru_maxrss в байтах, Linux и BSD - в килобайтах
+    return maxrss / 2**20 if sys.platform == 'darwin' else maxrss / 1024
+
+
+def _mb(size):
+    return round(size / 2**20, 3)
+
+
+def write_log(path, records):
+    """Дописывает строки этапов в журнал: CSV или JSON Lines по расширению"""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with _lock:
+        if path.suffix == '.csv':
+            header = not path.exists() or not path.stat().st_size
+            with open(path, 'a', newline='', encoding='utf-8') as f:
+                writer = csv.DictWriter(f, fieldnames=LOG_FIELDS)
+                if header:
+                    writer.writeheader()
+                writer.writerows(records)
+        else:
+            with open(path, 'a', encoding='utf-8') as f:
+                for record in records:
+                    f.write(json.dumps(record, ensure_ascii=False) + '\n')
+
+
+class Rerun:
+    """
+    Замеры одного перезапуска страницы page. records - строки этапов в
+    порядке начала (поля LOG_FIELDS), последняя - весь перезапуск.
+    """
+
+    def __init__(self, page, debug=False, log=None, profile=False, pstats_dir=None):
+        self.page = page
+        self.debug = debug
+        self.log = Path(log) if log else None
+        self.profile = profile
+        self.pstats_dir = Path(pstats_dir) if pstats_dir else None
+        self.enabled = debug or profile or self.log is not None
+        self.run = uuid.uuid4().hex[:12]
+        self.started = datetime.now().isoformat(timespec='seconds')
+        self.records = []
+        self.pstats_path = None
+        self.finished = False
+        self._open = []
+        self._profiler = None
+        self._start = None
+
+    @classmethod
+    def begin(cls, page):
+        """Перезапуск с настройками из окружения, адреса страницы и состояния сессии"""
+        import streamlit as st
+
+        debug = os.environ.get(DEBUG_ENV) == '1' or st.query_params.get('debug') == '1'
+        profile = st.query_params.get('profile') == '1' or bool(st.session_state.pop(PROFILE_NEXT, False))
+        rerun = cls(page, debug, os.environ.get(LOG_ENV), profile, os.environ.get(PSTATS_DIR_ENV))
+        rerun.start()
+        return rerun
+
+    def start(self):
+        _current.set(self)
+        if not self.enabled:
+            return
+        _start_tracing()
+        # Корневая рамка памяти - весь перезапуск; этапы поднимают в нее свой пик
+        current, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        self._open.append({'base': current, 'peak': current})
+        if self.profile:
+            self._profiler = cProfile.Profile()
+            self._profiler.enable()
+        self._start = time.perf_counter()
+
+    @contextmanager
+    def stage(self, name, rows=None):
+        """
+        Замер этапа name. Возвращает строку этапа: rows можно заполнить
+        внутри блока, когда число строк станет известно.
+        """
+        record = {'stage': name, 'rows': rows}
+        if not self.enabled or self.finished:
+            yield record
+            return
+        current, peak = tracemalloc.get_traced_memory()
+        self._open[-1]['peak'] = max(self._open[-1]['peak'], peak)
+        tracemalloc.reset_peak()
+        frame = {'base': current, 'peak': current}
+        self._open.append(frame)
+        # Место строки занимается при входе, чтобы этапы шли в порядке начала
+        position = len(self.records)
+        self.records.append(None)
+        start = time.perf_counter()
+        try:
+            yield record
+        finally:
+            seconds = time.perf_counter() - start
+            current, peak = tracemalloc.get_traced_memory()
+            peak = max(frame['peak'], peak)
+            self._open.pop()
+            self._open[-1]['peak'] = max(self._open[-1]['peak'], peak)
+            self.records[position] = self._record(record['stage'], len(self._open) - 1, seconds,
+                                                  peak - frame['base'], current - frame['base'],
+                                                  record['rows'])
+
+    def _record(self, name, depth, seconds, peak, allocated, rows):
+        return {
+            'run': self.run,
+            'page': self.page,
+            'started': self.started,
+            'stage': name,
+            'depth': depth,
+            'seconds': round(seconds, 6),
+            'peak_mb': _mb(peak),
+            'allocated_mb': _mb(allocated),
+            'rows': None if rows is None else int(rows),
+        }
+
+    def finish(self):
+        """Завершает замеры: итоговая строка, дамп cProfile, журнал и отладочная панель"""
+        if not self.enabled or self.finished:
+            return
+        self.finished = True
+        seconds = time.perf_counter() - self._start
+        # Профилировщик и tracemalloc выключаются, даже если дамп не записался
+        try:
+            if self._profiler is not None:
+                self._profiler.disable()
+                self.pstats_path = self._dump_pstats()
+        finally:
+            current, peak = tracemalloc.get_traced_memory()
+            _stop_tracing()
+        root = self._open.pop()
+        self.records.append(self._record(TOTAL_STAGE, 0, seconds, max(root['peak'], peak) - root['base'],
+                                         current - root['base'], None))
+        if self.log is not None:
+            write_log(self.log, self.records)
+        if self.debug or self.profile:
+            self.sidebar()
+
+    def _dump_pstats(self):
+        root = self.pstats_dir or resolve_cache_dir() / 'pstats'
+        root.mkdir(parents=True, exist_ok=True)
+        path = root / f'{self.page}-{datetime.now():%Y%m%d-%H%M%S}-{self.run}.pstats'
+        self._profiler.dump_stats(path)
+        return path
+
+    def top_functions(self, limit=TOP_FUNCTIONS):
+        """Текст pstats: самые долгие функции по суммарному времени"""
+        out = io.StringIO()
+        stats = pstats.Stats(str(self.pstats_path), stream=out)
+        stats.strip_dirs().sort_stats('cumulative').print_stats(limit)
+        return out.getvalue()
+
+    def table(self):
+        """Этапы для показа с отступом по вложенности"""
+        import pandas as pd
+
+        table = pd.DataFrame(self.records, columns=LOG_FIELDS)
+        table['rows'] = table['rows'].astype('Int64')
+        table['stage'] = ['    ' * depth + stage for stage, depth in zip(table['stage'], table['depth'])]
+        return table[['stage', 'seconds', 'peak_mb', 'allocated_mb', 'rows']].rename(columns={
+            'stage': 'Этап', 'seconds': 'Время, с', 'peak_mb': 'Пик, МБ',
+            'allocated_mb': 'Прирост, МБ', 'rows': 'Строк',
+        })
+
+    def sidebar(self):
+        import streamlit as st
+
+        with st.sidebar:
+            st.subheader("⏱️ Замеры перезапуска")
+            st.dataframe(self.table(), hide_index=True, width='stretch')
+            col1, col2 = st.columns(2)
+            with col1:
+                st.download_button("CSV", self._csv(), file_name=f'{self.page}-{self.run}.csv',
+                                   mime='text/csv', key='rea_timing_csv')
+            with col2:
+                st.download_button("JSON", json.dumps(self.records, ensure_ascii=False, indent=2),
+                                   file_name=f'{self.page}-{self.run}.json',
+                                   mime='application/json', key='rea_timing_json')
+            st.button("Профилировать следующий перезапуск", key='rea_profile_button',
+                      on_click=_profile_next_rerun)
+            if self.pstats_path is not None:
+                st.caption(f"cProfile: {self.pstats_path}")
+                with st.expander("Самые долгие функции"):
+                    st.code(self.top_functions(), language=None)
+                st.download_button("Дамп pstats", self.pstats_path.read_bytes(),
+                                   file_name=self.pstats_path.name, key='rea_pstats')
+
+    def _csv(self):
+        out = io.StringIO()
+        writer = csv.DictWriter(out, fieldnames=LOG_FIELDS)
+        writer.writeheader()
+        writer.writerows(self.records)
+        return out.getvalue()
+
+
+def _profile_next_rerun():
+    import streamlit as st
+
+    st.session_state[PROFILE_NEXT] = True
+
+
+@contextmanager
+def stage(name, rows=None):
+    """Этап текущего перезапуска; без открытого Rerun ничего не измеряет"""
+    rerun = _current.get()
+    if rerun is None:
+        yield {'stage': name, 'rows': rows}
+        return
+    with rerun.stage(name, rows) as record:
+        yield record
+
+
+def timed(name, rows=None):
+    """
+    Декоратор: вызов функции - этап name. rows - функция от аргументов
+    вызова, возвращающая число строк данных на входе; без нее строк нет.
+    """
+
+    def decorate(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            with stage(name, None if rows is None else rows(*args, **kwargs)):
+                return function(*args, **kwargs)
+        return wrapper
+
+    return decorate
@@ -0,0 +1,117 @@
+"""
+Параллельный разбор полей выгрузки на нескольких процессах.
+
+Выгрузка делится на части по строкам: разбор текстовых полей (parsing.py)
+построчный, поэтому части нагружают процессы равномерно, в отличие от
+деления по группам колонок, где почти все время уходит на одну-две колонки.
+
+Вход не копируется в каждый процесс через pickle: разбираемые колонки
+(цена, площадь, комнаты, потолки) один раз записываются в файл Arrow IPC в
+разделяемой памяти (/dev/shm), и каждый процесс открывает его через memory
+map и берет свою часть строк без копирования. Обратно процессы возвращают
+только числовые признаки.
+
+Остальное - удаление и переименование колонок, статистики и заполнение
+пропусков - делает родитель в pipeline.clean_listings(): это простые
+операции над колонками, и передать текстовые колонки результата из
+процессов обратно стоило бы дороже, чем выполнить их. Поэтому
+clean_listings(raw, workers=N) совпадает с последовательной очисткой
+вплоть до типов колонок и вида пропусков. Если строковые колонки фрейма уже
+в Arrow (string[pyarrow]), запись в общий файл обходится без их перевода.
+"""
+import multiprocessing
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+from realestate.parsing import (
+    AREA_COLUMN, CEILING_COLUMN, PRICE_COLUMN, ROOMS_COLUMN, parse_listing_fields,
+)
+from realestate.pipeline import DERIVED_COLUMNS
+
+# Меньшие части не окупают передачу задачи процессу
+MIN_CHUNK_ROWS = 20_000
+SHARED_MEMORY_DIR = '/dev/shm'
+PARSED_SOURCES = [PRICE_COLUMN, AREA_COLUMN, ROOMS_COLUMN, CEILING_COLUMN]
+
+
+def default_workers():
+    """Число доступных процессу ядер"""
+    return len(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else os.cpu_count() or 1
+
+
+def chunk_bounds(rows, chunks):
+    """Границы chunks почти равных частей из rows строк"""
+    step, extra = divmod(rows, chunks)
+    bounds, start = [], 0
+    for i in range(chunks):
+        stop = start + step + (i < extra)
+        bounds.append((start, stop))
+        start = stop
+    return bounds
+
+
+def _share(frame, path):
+    """Записывает колонки frame в файл Arrow IPC path"""
+    table = pa.Table.from_pandas(frame, preserve_index=False)
+    with pa.OSFile(path, 'wb') as sink, pa.ipc.new_file(sink, table.schema) as writer:
+        writer.write_table(table)
+
+
+def _parse_chunk(path, start, stop):
+    """Задача процесса: признаки DERIVED_COLUMNS строк [start, stop) общего файла"""
+    with pa.memory_map(path) as source:
+        table = pa.ipc.open_file(source).read_all()
+    parsed = parse_listing_fields(table.slice(start, stop - start).to_pandas())
+    return {name: parsed[name].to_numpy() for name in DERIVED_COLUMNS}
+
+
+_pools = {}
+
+
+def process_pool(workers):
+    """
+    Пул из workers процессов, общий для всех вызовов: импорт pandas и pyarrow
+    в процессах оплачивается один раз. forkserver порождает процессы из
+    чистого процесса, без потоков pyarrow родителя.
+    """
+    if workers not in _pools:
+        _pools[workers] = ProcessPoolExecutor(max_workers=workers,
+                                              mp_context=multiprocessing.get_context('forkserver'))
+    return _pools[workers]
+
+
+def parallel_parse(raw, workers=None, min_chunk_rows=MIN_CHUNK_ROWS):
+    """
+    parse_listing_fields(raw)[DERIVED_COLUMNS], посчитанный по частям на
+    workers процессах (по умолчанию - по числу ядер).
+
+    Если строк меньше, чем на две части по min_chunk_rows, или workers=1,
+    разбор идет в текущем процессе.
+    """
+    workers = workers or default_workers()
+    chunks = max(1, min(workers, len(raw) // max(min_chunk_rows, 1)))
+    columns = [c for c in PARSED_SOURCES if c in raw.columns]
+    if chunks == 1 or not columns:
+        return parse_listing_fields(raw)[DERIVED_COLUMNS]
+
+    shared = SHARED_MEMORY_DIR if os.path.isdir(SHARED_MEMORY_DIR) else None
+    with tempfile.TemporaryDirectory(prefix='rea-clean-', dir=shared) as tmp:
+        path = str(Path(tmp) / 'raw.arrow')
+        _share(raw[columns], path)
+        bounds = chunk_bounds(len(raw), chunks)
+        pool = process_pool(workers)
+        try:
+            parts = list(pool.map(_parse_chunk, *zip(*[(path, start, stop) for start, stop in bounds])))
+        except BrokenProcessPool:
+            # Процесс пула упал - следующий вызов создаст новый пул
+            _pools.pop(workers, None)
+            raise
+    return pd.DataFrame({name: np.concatenate([part[name] for part in parts])
+                         for name in DERIVED_COLUMNS}, index=raw.index)
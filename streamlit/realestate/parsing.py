@@ -0,0 +1,204 @@
+"""
+Векторный разбор текстовых полей выгрузки: цена, площадь, количество комнат.
+
+Все функции принимают колонку целиком и выполняют регулярные выражения
+ядрами pyarrow.compute поверх Arrow-строк, без построчного apply. Колонки,
+которые уже числовые (как в teamA_data.csv), просто приводятся к float.
+"""
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+from pandas.api.types import is_numeric_dtype
+
+PRICE_COLUMN = 'Цена'
+METRO_COLUMN = 'Метро'
+AREA_COLUMN = 'Площадь, м2'
+ROOMS_COLUMN = 'Количество комнат'
+CEILING_COLUMN = 'Высота потолков, м'
+# Станция объявлений без метро (parse_metro_station дает пропуск)
+NO_METRO = 'Без метро'
+
+ARROW_STRING = pd.StringDtype('pyarrow')
+
+_FLOAT = r'^(?:\d+\.?\d*|\.\d+)$'
+_NUMBER = r'\d+\.?\d*'
+
+
+def clean_price(price_str):
+    """
+    Преобразует строку цены в числовое значение
+    Пример: "500000.0 руб./ За месяц" -> 500000.0
+
+    Построчный эталон для parse_price, используется в бенчмарке.
+    """
+    if isinstance(price_str, str):
+        # Удаляем всё после "руб." и нечисловые символы
+        price_clean = price_str.split('руб.')[0].strip()
+        # Удаляем все пробелы и оставляем только цифры и точку
+        price_clean = ''.join(ch for ch in price_clean if ch.isdigit() or ch == '.')
+        try:
+            return float(price_clean) if price_clean else None
+        except ValueError:
+            return None
+    return price_str
+
+
+def as_arrow_strings(series):
+    """Приводит колонку к строкам pyarrow (без копии, если она уже такая)"""
+    if series.dtype == ARROW_STRING:
+        return series
+    return series.astype(ARROW_STRING)
+
+
+def _arrow(series):
+    """Непрерывный Arrow-массив колонки (Parquet с несколькими row group дает чанки)"""
+    array = pa.array(as_arrow_strings(series).array)
+    if isinstance(array, pa.ChunkedArray):
+        array = array.combine_chunks()
+    return array
+
+
+def _group(array, pattern, name):
+    """Первое совпадение именованной группы; null, если совпадения нет"""
+    return pc.struct_field(pc.extract_regex(array, pattern), name)
+
+
+def _to_float(array, index):
+    """
+    Arrow-строки из цифр и точек -> float64 Series.
+
+    Обычно все значения корректны и приводятся одним cast; если встречаются
+    строки вроде "" или "1.2.3", они предварительно заменяются на null (NaN).
+    """
+    try:
+        numbers = pc.cast(array, pa.float64())
+    except pa.ArrowInvalid:
+        valid = pc.fill_null(pc.match_substring_regex(array, _FLOAT), False)
+        numbers = pc.cast(pc.if_else(valid, array, None), pa.float64())
+    return pd.Series(numbers.to_numpy(zero_copy_only=False), index=index)
+
+
+def _first_number(array, pattern):
+    """
+    Первое совпадение pattern как float64 (numpy).
+
+    Строки, которые целиком совпадают с pattern, приводятся напрямую;
+    поиск с извлечением группы (заметно дороже) выполняется только для остальных.
+    """
+    plain = pc.fill_null(pc.match_substring_regex(array, f'^(?:{pattern})$'), False)
+    other = pc.and_(pc.invert(plain), pc.is_valid(array))
+    if pc.any(other).as_py():
+        found = _group(pc.filter(array, other), f'(?P<n>{pattern})', 'n')
+        array = pc.replace_with_mask(array, other, found)
+    return pc.cast(array, pa.float64()).to_numpy(zero_copy_only=False)
+
+
+def _price_head(array):
+    """
+    Текст перед первым " руб." для строк вида "<цифры и точки> руб. ...",
+    без регулярного выражения (split_pattern и ascii_ltrim заметно дешевле
+    extract_regex); для строк другого вида - null.
+    """
+    head = pc.list_element(pc.split_pattern(array, ' руб.', max_splits=1), 0)
+    digits_only = pc.equal(pc.binary_length(pc.ascii_ltrim(head, '0123456789.')), 0)
+    plain = pc.and_(digits_only, pc.greater(pc.binary_length(head), 0))
+    return pc.if_else(plain, head, None)
+
+
+def parse_price(series):
+    """
+    "500000.0 руб./ За месяц, Залог - ..." -> 500000.0
+
+    Результат совпадает с clean_price: берется текст до "руб.", из него
+    оставляются цифры и точки; нераспознанные значения становятся NaN.
+    """
+    if is_numeric_dtype(series):
+        return series.astype('float64')
+    array = _arrow(series)
+    # Быстрый путь для типичного формата "<число> руб./ ..."
+    head = _price_head(array)
+    # Остальные строки разбираем общим выражением: всё до первого "руб.",
+    # из него только цифры и точки
+    odd = pc.and_(pc.is_null(head), pc.is_valid(array))
+    if pc.any(odd).as_py():
+        rest = pc.replace_substring_regex(pc.filter(array, odd), r'(?s)руб\..*', '')
+        rest = pc.replace_substring_regex(rest, r'[^0-9.]', '')
+        rest = pc.if_else(pc.match_substring_regex(rest, _FLOAT), rest, None)
+        head = pc.replace_with_mask(head, odd, rest)
+    return _to_float(head, series.index)
+
+
+def parse_area(series):
+    """
+    "общая/жилая/кухня" -> DataFrame с колонками total_area, living_area, kitchen_area
+
+    Части сопоставляются по позиции: "52.5/10.0" дает общую и жилую площадь,
+    недостающие части равны NaN. Из каждой части берется первое число,
+    как в str.split('/').str[0].str.extract('(\\d+\\.?\\d*)') из preprocessing.ipynb.
+    """
+    index = series.index
+    if is_numeric_dtype(series):
+        nan = pd.Series(float('nan'), index=index)
+        return pd.DataFrame({'total_area': series.astype('float64'),
+                             'living_area': nan, 'kitchen_area': nan.copy()})
+    # Все части разбираются одним вызовом по плоскому массиву,
+    # затем раскладываются по позициям
+    parts = pc.split_pattern(_arrow(series), '/', max_splits=2)
+    rows = pc.list_parent_indices(parts).to_numpy()
+    offsets = parts.offsets.to_numpy()
+    positions = np.arange(len(rows)) - (offsets[rows] - offsets[0])
+    area = np.full((3, len(series)), np.nan)
+    area[positions, rows] = _first_number(pc.list_flatten(parts), _NUMBER)
+    return pd.DataFrame({'total_area': area[0], 'living_area': area[1],
+                         'kitchen_area': area[2]}, index=index)
+
+
+def parse_rooms(series):
+    """"2, Оба варианта" -> 2.0; пропуски остаются NaN"""
+    if is_numeric_dtype(series):
+        return series.astype('float64')
+    return pd.Series(_first_number(_arrow(series), r'\d+'), index=series.index)
+
+
+def parse_metro_station(series):
+    """"м. Смоленская (9 мин пешком)" -> "Смоленская"; без станции - пропуск"""
+    station = _group(_arrow(series), r'^\s*(?:м\.\s*)?(?P<station>[^(,]*[^(,\s])', 'station')
+    return pd.Series(pd.arrays.ArrowStringArray(station), index=series.index)
+
+
+def parse_metro_distance(series):
+    """
+    "м. Смоленская (9 мин пешком)" -> minutes 9.0, walk 1.0;
+    "(16 мин на машине)" -> 16.0, 0.0. Без времени до метро оба NaN.
+    """
+    array = _arrow(series)
+    minutes = _group(array, r'\((?P<minutes>\d+)\s*мин', 'minutes')
+    walk = pc.cast(pc.match_substring(pc.if_else(pc.is_valid(minutes), array, None), 'пешком'), pa.float64())
+    return pd.DataFrame({
+        'minutes': pc.cast(minutes, pa.float64()).to_numpy(zero_copy_only=False),
+        'walk': walk.to_numpy(zero_copy_only=False),
+    }, index=series.index)
+
+
+def parse_listing_fields(df):
+    """
+    Разбирает все текстовые числовые поля за один проход.
+
+    Возвращает DataFrame с тем же индексом и колонками price_clean,
+    total_area_clean, living_area_clean, kitchen_area_clean, rooms_clean,
+    Ceiling_height. Отсутствующие в df исходные колонки дают NaN.
+    """
+    nan = pd.Series(float('nan'), index=df.index)
+    parsed = pd.DataFrame(index=df.index)
+    parsed['price_clean'] = parse_price(df[PRICE_COLUMN]) if PRICE_COLUMN in df.columns else nan
+    if AREA_COLUMN in df.columns:
+        area = parse_area(df[AREA_COLUMN])
+        parsed['total_area_clean'] = area['total_area']
+        parsed['living_area_clean'] = area['living_area']
+        parsed['kitchen_area_clean'] = area['kitchen_area']
+    else:
+        parsed['total_area_clean'] = parsed['living_area_clean'] = parsed['kitchen_area_clean'] = nan
+    parsed['rooms_clean'] = parse_rooms(df[ROOMS_COLUMN]) if ROOMS_COLUMN in df.columns else nan
+    parsed['Ceiling_height'] = pd.to_numeric(df[CEILING_COLUMN], errors='coerce') if CEILING_COLUMN in df.columns else nan
+    return parsed
@@ -0,0 +1,411 @@
+"""
+Очистка выгрузки объявлений: шаги из release 3/preprocessing.ipynb.
+
+Пайплайн описан декларативно: какие колонки удалить, как переименовать,
+какие числовые признаки извлечь из текста и чем заполнить пропуски
+(мода, медиана или константа). Статистики заполнения (моды и медианы)
+считаются по всему датасету и сохраняются, поэтому их можно применить к
+новым объявлениям без пересчета.
+
+В инкрементальном режиме (IncrementalCleaner) заново обрабатываются только
+новые и изменившиеся объявления: каждая строка выгрузки хэшируется, а
+строки с уже известным хэшем берутся из сохраненного результата.
+
+Повторные объявления (точные и почти-дубликаты, см. dedup.py) убираются
+отдельным этапом --dedup; найденные кластеры можно сохранить в отчет.
+
+Большую выгрузку можно очищать на нескольких процессах (--workers, см.
+parallel.py); результат тот же, что и при последовательной очистке.
+
+Запуск из каталога streamlit/:
+    python -m realestate.pipeline raw.csv teamA_data.csv [--state DIR] [--full]
+                                  [--dedup] [--dedup-report clusters.csv] [--workers N]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from dataclasses import dataclass
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+from pandas.api.types import is_numeric_dtype
+
+from realestate.dedup import DEDUP_COLUMNS, cluster_report, find_duplicates
+from realestate.parsing import parse_listing_fields
+
+# Технические колонки и колонки, где данных меньше 20%
+DROP_COLUMNS = ['Unnamed: 0', 'Название ЖК', 'Серия дома']
+
+RENAME_COLUMNS = {
+    'ID  объявления': 'Ad_ID',
+    'Тип': 'Type',
+    'Метро': 'Metro',
+    'Адрес': 'Address',
+    'Площадь, м2': 'Total_area',
+    'Дом': 'Floor',
+    'Парковка': 'Parking',
+    'Цена': 'Price_per_month',
+    'Телефоны': 'Phone_number',
+    'Описание': 'Description',
+    'Ремонт': 'Renovation',
+    'Балкон': 'Balcony',
+    'Окна': 'Windows',
+    'Санузел': 'Bathroom',
+    'Можно с детьми/животными': 'Children_pets',
+    'Дополнительно': 'Furniture',
+    'Лифт': 'Elevator',
+    'Мусоропровод': 'Garbage_chute',
+    'Ссылка на объявление': 'Link_to_ad',
+    'Количество комнат': 'Number_of_rooms',
+    'Площадь комнат, м2': 'Room_area',
+}
+
+# Числовые признаки, извлекаемые из текстовых полей (см. parsing.py).
+# Ceiling_height заменяет исходную колонку высоты потолков.
+DERIVED_COLUMNS = ['rooms_clean', 'total_area_clean', 'price_clean', 'Ceiling_height']
+CEILING_RAW_COLUMN = 'Высота потолков, м'
+
+# Колонки файла релиза 3 (teamA_data.csv)
+RELEASE_COLUMNS = ['Ad_ID', 'rooms_clean', 'total_area_clean', 'price_clean', 'Ceiling_height']
+
+ROW_HASH = 'row_hash'
+ROWS_FILE = 'rows.parquet'
+STATS_FILE = 'fill_stats.json'
+
+
+@dataclass(frozen=True)
+class Fill:
+    """
+    Заполнение пропусков колонки column.
+
+    strategy: 'mode', 'median' или 'value' (константа value). Если у колонки
+    нет ни одного значения, мода заменяется на fallback.
+    """
+    column: str
+    strategy: str
+    value: object = None
+    fallback: object = 'Не указано'
+
+    def statistic(self, frame):
+        """Значение для заполнения, посчитанное по frame"""
+        if self.strategy == 'value':
+            return self.value
+        return self.from_counts(frame[self.column].value_counts())
+
+    def from_counts(self, counts):
+        """
+        То же значение по частотам (value -> количество строк).
+
+        Частоты частей файла складываются, поэтому статистики для потоковой
+        обработки совпадают с посчитанными по всему фрейму.
+        """
+        if self.strategy == 'value':
+            return self.value
+        counts = counts[counts > 0].sort_index()
+        if counts.empty:
+            return self.fallback if self.strategy == 'mode' else None
+        if self.strategy == 'median':
+            # Как Series.median(): среднее двух центральных значений
+            total = int(counts.sum())
+            cumulative = counts.cumsum().to_numpy()
+            lower = counts.index[np.searchsorted(cumulative, (total - 1) // 2, side='right')]
+            upper = counts.index[np.searchsorted(cumulative, total // 2, side='right')]
+            return (float(lower) + float(upper)) / 2
+        # Как Series.mode(): при равенстве частот - наименьшее значение
+        value = counts.index[counts.to_numpy().argmax()]
+        return value.item() if hasattr(value, 'item') else value
+
+
+FILLS = (
+    Fill('rooms_clean', 'mode'),
+    Fill('Ceiling_height', 'median'),
+    Fill('Renovation', 'mode', fallback='Not specified'),
+    Fill('Room_area', 'value', value='Not specified'),
+    Fill('Balcony', 'value', value='No'),
+    Fill('Windows', 'mode', fallback='Not specified'),
+    Fill('Children_pets', 'mode'),
+    Fill('Bathroom', 'mode'),
+    Fill('Garbage_chute', 'mode'),
+    Fill('Elevator', 'mode'),
+)
+
+
+def prepare(raw, parsed=None):
+    """
+    Построчные шаги: удаление колонок, извлечение числовых признаков и
+    переименование. Результат строки зависит только от самой строки.
+    parsed - уже извлеченные признаки DERIVED_COLUMNS с индексом raw
+    (например, посчитанные по частям в parallel.py).
+    """
+    if parsed is None:
+        parsed = parse_listing_fields(raw)
+    frame = raw.drop(columns=[c for c in DROP_COLUMNS + [CEILING_RAW_COLUMN] if c in raw.columns])
+    frame = frame.rename(columns=RENAME_COLUMNS)
+    for column in DERIVED_COLUMNS:
+        frame[column] = parsed[column]
+    return frame
+
+
+def fit_fill_stats(frame, fills=FILLS):
+    """Значения для заполнения пропусков по всем колонкам fills, которые есть во frame"""
+    return {fill.column: fill.statistic(frame) for fill in fills if fill.column in frame.columns}
+
+
+def fill_counts(frame, fills=FILLS):
+    """Частоты значений колонок с модой и медианой, для сложения по частям"""
+    return {fill.column: frame[fill.column].value_counts() for fill in fills
+            if fill.strategy != 'value' and fill.column in frame.columns}
+
+
+def merge_counts(total, counts):
+    """Добавляет частоты counts к total (на месте) и возвращает total"""
+    for column, values in counts.items():
+        total[column] = values if column not in total else total[column].add(values, fill_value=0)
+    return total
+
+
+def stats_from_counts(counts, fills=FILLS):
+    """Статистики заполнения по сложенным частотам fill_counts()"""
+    empty = pd.Series(dtype='int64')
+    return {fill.column: fill.from_counts(counts.get(fill.column, empty)) for fill in fills
+            if fill.strategy == 'value' or fill.column in counts}
+
+
+def apply_fills(frame, stats, fills=FILLS):
+    """Заполняет пропуски сохраненными значениями stats"""
+    values = {fill.column: stats[fill.column] for fill in fills
+              if fill.column in frame.columns and stats.get(fill.column) is not None}
+    # Текст в числовой колонке (Room_area -> 'Not specified'): колонка становится строковой
+    as_text = {column: frame[column].astype('string') for column, value in values.items()
+               if isinstance(value, str) and is_numeric_dtype(frame[column])}
+    return frame.assign(**as_text).fillna(values)
+
+
+def clean_listings(raw, stats=None, workers=1):
+    """
+    Полная очистка выгрузки. Возвращает (очищенный фрейм, статистики заполнения);
+    если stats не переданы, они считаются по raw. При workers > 1 текстовые
+    поля разбираются на нескольких процессах (parallel.parallel_parse), результат
+    тот же.
+    """
+    parsed = None
+    if workers > 1:
+        # parallel.py сам импортирует этот модуль
+        from realestate.parallel import parallel_parse
+        parsed = parallel_parse(raw, workers)
+    frame = prepare(raw, parsed)
+    if stats is None:
+        stats = fit_fill_stats(frame)
+    return apply_fills(frame, stats), stats
+
+
+def release_frame(cleaned):
+    """Числовой датасет релиза 3: RELEASE_COLUMNS без полных дубликатов"""
+    columns = [c for c in RELEASE_COLUMNS if c in cleaned.columns]
+    return cleaned[columns].drop_duplicates().reset_index(drop=True)
+
+
+def row_hashes(raw):
+    """64-битный хэш каждой строки выгрузки (по всем колонкам, без индекса)"""
+    return pd.util.hash_pandas_object(raw, index=False).to_numpy()
+
+
+class IncrementalCleaner:
+    """
+    Очистка с сохранением состояния в каталоге state_dir.
+
+    Первый запуск (или full=True) обрабатывает всю выгрузку и сохраняет
+    статистики заполнения. Следующие запуски обрабатывают только строки с
+    новым хэшем - новые или изменившиеся Ad_ID - с сохраненными статистиками;
+    объявления, которых нет в новой выгрузке, из результата выпадают.
+
+    Очищенные строки лежат в сегментах segment-NNNNN.parquet: каждый запуск
+    дописывает один сегмент только с обработанными строками. rows.parquet
+    хранит для каждой строки текущей выгрузки хэш и место в сегменте, так что
+    запись на диск тоже пропорциональна изменениям. Когда в сегментах
+    накапливается больше половины неактуальных строк, они сливаются в один.
+    workers - число процессов для очистки, как в clean_listings().
+    """
+
+    def __init__(self, state_dir, workers=1):
+        self.state_dir = Path(state_dir)
+        self.workers = workers
+        self.rows_path = self.state_dir / ROWS_FILE
+        self.stats_path = self.state_dir / STATS_FILE
+
+    def _segment_path(self, segment):
+        return self.state_dir / f'segment-{segment:05d}.parquet'
+
+    def _segments(self):
+        """Номера сегментов на диске"""
+        return sorted(int(path.stem.split('-')[1]) for path in self.state_dir.glob('segment-*.parquet'))
+
+    def _load_state(self):
+        if not (self.rows_path.exists() and self.stats_path.exists()):
+            return None, None
+        stats = json.loads(self.stats_path.read_text(encoding='utf-8'))
+        return pd.read_parquet(self.rows_path), stats
+
+    def _write_segment(self, cleaned):
+        """Записывает очищенные строки новым сегментом и возвращает его номер"""
+        segment = max(self._segments(), default=0) + 1
+        path = self._segment_path(segment)
+        tmp = path.with_suffix('.parquet.tmp')
+        cleaned.reset_index(drop=True).to_parquet(tmp, index=False)
+        os.replace(tmp, path)
+        return segment
+
+    def _save_state(self, rows, stats):
+        """Атомарно заменяет rows.parquet и удаляет сегменты, на которые нет ссылок"""
+        tmp = self.rows_path.with_suffix('.parquet.tmp')
+        rows.to_parquet(tmp, index=False)
+        os.replace(tmp, self.rows_path)
+        self.stats_path.write_text(json.dumps(stats, ensure_ascii=False, indent=2), encoding='utf-8')
+        live = set(rows['segment'].unique().tolist())
+        for segment in self._segments():
+            if segment not in live:
+                self._segment_path(segment).unlink()
+
+    def _stored_rows(self, rows):
+        """Сколько строк лежит в сегментах, на которые ссылается rows"""
+        return sum(pq.ParquetFile(self._segment_path(segment)).metadata.num_rows
+                   for segment in rows['segment'].unique().tolist())
+
+    def run(self, raw, full=False):
+        """
+        Обрабатывает выгрузку raw и сохраняет состояние.
+
+        Возвращает отчет: rows, processed, reused, removed (версии строк из
+        прошлого состояния, которых больше нет: удаленные и измененные
+        объявления), seconds. Очищенный результат - frame().
+        """
+        start = time.perf_counter()
+        self.state_dir.mkdir(parents=True, exist_ok=True)
+        hashes = row_hashes(raw)
+        previous, stats = (None, None) if full else self._load_state()
+
+        if previous is None:
+            cleaned, stats = clean_listings(raw, workers=self.workers)
+            known = np.zeros(len(raw), dtype=bool)
+            segments = np.zeros(len(raw), dtype=np.int32)
+            positions = np.zeros(len(raw), dtype=np.int64)
+            removed = 0
+        else:
+            lookup = previous.drop_duplicates(ROW_HASH).set_index(ROW_HASH)
+            found = lookup.index.get_indexer(hashes)
+            known = found >= 0
+            segments = np.where(known, lookup['segment'].to_numpy()[found], 0).astype(np.int32)
+            positions = np.where(known, lookup['position'].to_numpy()[found], 0)
+            cleaned, _ = clean_listings(raw[~known], stats, self.workers)
+            removed = int((~previous[ROW_HASH].isin(hashes)).sum())
+
+        if len(cleaned):
+            segments[~known] = self._write_segment(cleaned)
+            positions[~known] = np.arange(len(cleaned))
+        rows = pd.DataFrame({ROW_HASH: hashes, 'segment': segments, 'position': positions})
+        self._save_state(rows, stats)
+
+        if len(rows) and self._stored_rows(rows) > 2 * len(rows):
+            self._compact(rows, stats)
+
+        reused = int(known.sum())
+        return {
+            'rows': len(raw),
+            'processed': len(raw) - reused,
+            'reused': reused,
+            'removed': removed,
+            'seconds': time.perf_counter() - start,
+        }
+
+    def _compact(self, rows, stats):
+        """Переписывает все актуальные строки в один сегмент"""
+        segment = self._write_segment(self.frame())
+        rows = rows.assign(segment=np.int32(segment), position=np.arange(len(rows)))
+        self._save_state(rows, stats)
+
+    def frame(self, columns=None):
+        """Очищенный фрейм в порядке строк последней выгрузки (columns - только эти колонки)"""
+        rows, _ = self._load_state()
+        if rows is None:
+            raise FileNotFoundError(f'В {self.state_dir} нет сохраненного состояния, сначала вызовите run()')
+        parts = []
+        for segment, group in rows.groupby('segment', sort=True):
+            table = pd.read_parquet(self._segment_path(segment), columns=columns)
+            part = table.iloc[group['position'].to_numpy()]
+            part.index = group.index
+            parts.append(part)
+        if not parts:
+            return pd.DataFrame(columns=columns)
+        return pd.concat(parts).sort_index().reset_index(drop=True)
+
+
+def _write(frame, path):
+    """CSV или Parquet по расширению файла"""
+    path = Path(path)
+    if path.suffix == '.parquet':
+        frame.to_parquet(path, index=False)
+    else:
+        frame.to_csv(path, index=False)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Очистка выгрузки объявлений (release 3)')
+    parser.add_argument('raw', help='исходный CSV выгрузки')
+    parser.add_argument('output', help='результат: .csv или .parquet')
+    parser.add_argument('--state', help='каталог состояния для инкрементального режима')
+    parser.add_argument('--full', action='store_true',
+                        help='обработать всё заново и пересчитать статистики заполнения')
+    parser.add_argument('--all-columns', action='store_true',
+                        help='сохранить все очищенные колонки, а не только числовые признаки')
+    parser.add_argument('--dedup', action='store_true',
+                        help='убрать повторные объявления (точные и почти-дубликаты)')
+    parser.add_argument('--dedup-report', help='CSV с найденными кластерами повторов (включает --dedup)')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='число процессов для очистки (0 - по числу доступных процессу ядер)')
+    args = parser.parse_args(argv)
+    dedup = args.dedup or bool(args.dedup_report)
+    # parallel.py сам импортирует этот модуль
+    from realestate.parallel import default_workers
+    workers = args.workers or default_workers()
+
+    start = time.perf_counter()
+    raw = pd.read_csv(args.raw, engine='pyarrow')
+    read_seconds = time.perf_counter() - start
+
+    columns = None if args.all_columns else RELEASE_COLUMNS
+    if columns and dedup:
+        columns = columns + [c for c in DEDUP_COLUMNS if c not in columns]
+    if args.state:
+        cleaner = IncrementalCleaner(args.state, workers)
+        report = cleaner.run(raw, full=args.full)
+        cleaned = cleaner.frame(columns)
+    else:
+        cleaned, _ = clean_listings(raw, workers=workers)
+        report = {'rows': len(raw), 'processed': len(raw), 'reused': 0, 'removed': 0,
+                  'seconds': time.perf_counter() - start - read_seconds}
+
+    print(f'Прочитано строк: {report["rows"]:,} за {read_seconds:.2f} с')
+    print(f'Обработано: {report["processed"]:,}, из кэша: {report["reused"]:,}, '
+          f'удалено: {report["removed"]:,} за {report["seconds"]:.2f} с')
+
+    if dedup:
+        start = time.perf_counter()
+        clusters = find_duplicates(cleaned)
+        if args.dedup_report:
+            cluster_report(cleaned, clusters).to_csv(args.dedup_report, index=False)
+        cleaned = cleaned[~clusters['duplicate'].to_numpy()]
+        print(f'Повторов: {int(clusters["duplicate"].sum()):,} '
+              f'за {time.perf_counter() - start:.2f} с')
+
+    result = cleaned if args.all_columns else release_frame(cleaned)
+    _write(result, args.output)
+    print(f'Записано: {len(result):,} строк в {args.output}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,567 @@
+"""
+Потоковый профиль выгрузки: пропуски и статистики цены, которые
+обновляются новыми блоками объявлений и складываются по частям.
+
+Профиль (ListingProfile) состоит из аккумуляторов:
+
+- число непустых значений каждой колонки выгрузки - из него профиль
+  пропусков;
+- Moments - количество, среднее, сумма квадратов отклонений, min и max;
+  блок сводится к своим моментам и добавляется формулой Чана (Welford
+  для блоков);
+- Comoments - моменты пары колонок и совместный момент, по ним корреляция;
+- TDigest - сжатое распределение для медианы и квантилей.
+
+Моменты и t-digest ведутся для цены (VALUE) целиком и по значениям
+GROUPS, совместные моменты - для пар PAIRS. Обновление блоком стоит
+O(размер блока) и не читает уже учтенные строки.
+
+Точность сложения частей (и обновления блоками): пропуски, count, min и
+max - точно; средние, дисперсии и корреляция - до округления float64;
+квантиль q - с ранговой ошибкой не больше rank_error(q), двух ширин
+кластера t-digest: 4π·sqrt(q(1-q)) / COMPRESSION, для медианы при
+COMPRESSION=1000 - 0,63% значений (оценка лежит между центрами соседних
+кластеров; после сложений кластер бывает немного шире единицы шкалы).
+Пока значений в группе меньше ~COMPRESSION/π, кластеры состоят из одного
+значения и медиана точная.
+
+Профиль версии датасета хранится в profile-<версия>-v<формат>.json рядом
+с кэшем: ListingProfile.for_dataset строит его одним проходом по
+Parquet-файлам выгрузки и аналитического фрейма блоками по BATCH_ROWS
+строк. Новые объявления добавляются к сохраненному профилю без пересчета:
+    python -m realestate.profile profile.json new.csv [...] [--block-mb 4]
+Удаленные объявления из профиля не вычитаются - после удаления профиль
+строится заново.
+"""
+import argparse
+import json
+import math
+import os
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+
+from realestate.frame import analysis_path, build_analysis_frame
+from realestate.queries import PandasQueries, missing_table
+
+PROFILE_FORMAT = 1
+PROFILE_FILE = 'profile-{version}-v{format}.json'
+COMPRESSION = 1000
+BATCH_ROWS = 100_000
+
+VALUE = 'price_clean'
+GROUPS = ('Children_pets', 'Renovation', 'Ceiling_height')
+PAIRS = (('Ceiling_height', 'price_clean'),)
+METRICS = ('median', 'mean', 'count', 'min', 'max', 'sum', 'std')
+# Метрики из t-digest (приближенные); остальные в профиле точные
+SKETCH_METRICS = ('median',)
+
+
+def rank_error(q, compression=COMPRESSION):
+    """Граница ранговой ошибки квантиля q, доля значений"""
+    return 4 * math.pi * math.sqrt(q * (1 - q)) / compression
+
+
+class Moments:
+    """Количество, среднее, сумма квадратов отклонений m2, min и max"""
+
+    def __init__(self, count=0, mean=0.0, m2=0.0, low=math.inf, high=-math.inf):
+        self.count = count
+        self.mean = mean
+        self.m2 = m2
+        self.low = low
+        self.high = high
+
+    @classmethod
+    def of(cls, values):
+        """Моменты блока: два прохода по значениям"""
+        values = np.asarray(values, dtype='float64')
+        if not len(values):
+            return cls()
+        mean = values.mean()
+        return cls(len(values), float(mean), float(((values - mean) ** 2).sum()),
+                   float(values.min()), float(values.max()))
+
+    def update(self, values):
+        return self.merge(Moments.of(values))
+
+    def merge(self, other):
+        """Добавляет моменты other (формула Чана) и возвращает self"""
+        if not other.count:
+            return self
+        count = self.count + other.count
+        delta = other.mean - self.mean
+        self.mean += delta * other.count / count
+        self.m2 += other.m2 + delta * delta * self.count * other.count / count
+        self.count = count
+        self.low = min(self.low, other.low)
+        self.high = max(self.high, other.high)
+        return self
+
+    @property
+    def variance(self):
+        """Несмещенная дисперсия, как Series.var()"""
+        return self.m2 / (self.count - 1) if self.count > 1 else math.nan
+
+    def to_dict(self):
+        return {'count': self.count, 'mean': self.mean, 'm2': self.m2, 'min': self.low, 'max': self.high}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data['count'], data['mean'], data['m2'], data['min'], data['max'])
+
+
+class Comoments:
+    """Моменты пары (x, y): count, средние, m2 каждой и совместный момент cxy"""
+
+    def __init__(self, count=0, mean_x=0.0, mean_y=0.0, m2_x=0.0, m2_y=0.0, cxy=0.0):
+        self.count = count
+        self.mean_x = mean_x
+        self.mean_y = mean_y
+        self.m2_x = m2_x
+        self.m2_y = m2_y
+        self.cxy = cxy
+
+    @classmethod
+    def of(cls, x, y):
+        x = np.asarray(x, dtype='float64')
+        y = np.asarray(y, dtype='float64')
+        if not len(x):
+            return cls()
+        dx, dy = x - x.mean(), y - y.mean()
+        return cls(len(x), float(x.mean()), float(y.mean()),
+                   float((dx * dx).sum()), float((dy * dy).sum()), float((dx * dy).sum()))
+
+    def update(self, x, y):
+        return self.merge(Comoments.of(x, y))
+
+    def merge(self, other):
+        if not other.count:
+            return self
+        count = self.count + other.count
+        share = self.count * other.count / count
+        dx = other.mean_x - self.mean_x
+        dy = other.mean_y - self.mean_y
+        self.mean_x += dx * other.count / count
+        self.mean_y += dy * other.count / count
+        self.m2_x += other.m2_x + dx * dx * share
+        self.m2_y += other.m2_y + dy * dy * share
+        self.cxy += other.cxy + dx * dy * share
+        self.count = count
+        return self
+
+    @property
+    def corr(self):
+        """Корреляция Пирсона, как Series.corr()"""
+        if self.count < 2 or not self.m2_x or not self.m2_y:
+            return math.nan
+        return self.cxy / math.sqrt(self.m2_x * self.m2_y)
+
+    def to_dict(self):
+        return {'count': self.count, 'mean_x': self.mean_x, 'mean_y': self.mean_y,
+                'm2_x': self.m2_x, 'm2_y': self.m2_y, 'cxy': self.cxy}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(**data)
+
+
+class TDigest:
+    """
+    t-digest (Dunning): центроиды (mean, weight) по возрастанию mean и
+    точные min/max. Каждый кластер занимает не больше единицы по шкале
+    k(q) = compression / (2π) · asin(2q - 1), поэтому у краев распределения
+    кластеры мельче, а всего их не больше ~compression / 2.
+    """
+
+    def __init__(self, compression=COMPRESSION, means=(), weights=(), low=math.inf, high=-math.inf):
+        self.compression = compression
+        self.means = np.asarray(means, dtype='float64')
+        self.weights = np.asarray(weights, dtype='float64')
+        self.low = low
+        self.high = high
+
+    def _scale(self, q):
+        return self.compression / (2 * math.pi) * np.arcsin(2 * np.clip(q, 0, 1) - 1)
+
+    @classmethod
+    def of(cls, values, compression=COMPRESSION):
+        """Дайджест блока: отсортированные значения группируются по клеткам шкалы k"""
+        values = np.sort(np.asarray(values, dtype='float64'))
+        digest = cls(compression)
+        n = len(values)
+        if not n:
+            return digest
+        cells = np.floor(digest._scale(np.arange(n) / n))
+        starts = np.flatnonzero(np.r_[True, cells[1:] != cells[:-1]])
+        digest.weights = np.diff(np.r_[starts, n]).astype('float64')
+        digest.means = np.add.reduceat(values, starts) / digest.weights
+        digest.low, digest.high = float(values[0]), float(values[-1])
+        return digest
+
+    def update(self, values):
+        return self.merge(TDigest.of(values, self.compression))
+
+    def merge(self, other):
+        """Добавляет центроиды other и сжимает жадным проходом по возрастанию"""
+        if not len(other.weights):
+            return self
+        means = np.concatenate([self.means, other.means])
+        weights = np.concatenate([self.weights, other.weights])
+        order = np.argsort(means, kind='stable')
+        means, weights = means[order], weights[order]
+        cumulative = np.cumsum(weights)
+        total = cumulative[-1]
+        k_left = self._scale((cumulative - weights) / total).tolist()
+        k_right = self._scale(cumulative / total).tolist()
+
+        starts = [0]
+        limit = k_left[0] + 1
+        for i in range(1, len(k_left)):
+            if k_right[i] > limit:
+                starts.append(i)
+                limit = k_left[i] + 1
+        self.weights = np.add.reduceat(weights, starts)
+        self.means = np.add.reduceat(means * weights, starts) / self.weights
+        self.low = min(self.low, other.low)
+        self.high = max(self.high, other.high)
+        return self
+
+    @property
+    def count(self):
+        return int(self.weights.sum())
+
+    def quantile(self, q):
+        """
+        Квантиль q: линейная интерполяция между центрами кластеров. Для
+        кластеров из одного значения совпадает с Series.quantile(q).
+        """
+        if not len(self.weights):
+            return math.nan
+        cumulative = np.cumsum(self.weights)
+        total = cumulative[-1]
+        ranks = np.r_[0.0, cumulative - self.weights / 2, total]
+        values = np.r_[self.low, self.means, self.high]
+        # Ранг q·n считается от нуля, центр i-го значения - i + 0.5
+        return float(np.interp(q * (total - 1) + 0.5, ranks, values))
+
+    def to_dict(self):
+        return {'means': self.means.tolist(), 'weights': self.weights.tolist(),
+                'min': self.low, 'max': self.high}
+
+    @classmethod
+    def from_dict(cls, data, compression=COMPRESSION):
+        return cls(compression, data['means'], data['weights'], data['min'], data['max'])
+
+
+class Summary:
+    """Моменты и t-digest одной колонки или одной группы"""
+
+    def __init__(self, compression=COMPRESSION, moments=None, digest=None):
+        self.moments = moments or Moments()
+        self.digest = digest or TDigest(compression)
+
+    def update(self, values):
+        self.moments.update(values)
+        self.digest.update(values)
+        return self
+
+    def merge(self, other):
+        self.moments.merge(other.moments)
+        self.digest.merge(other.digest)
+        return self
+
+    def metric(self, name):
+        """Значение метрики с названием как в .agg()"""
+        moments = self.moments
+        if name == 'median':
+            return self.digest.quantile(0.5)
+        if name == 'mean':
+            return moments.mean if moments.count else math.nan
+        if name == 'count':
+            return moments.count
+        if name == 'min':
+            return moments.low if moments.count else math.nan
+        if name == 'max':
+            return moments.high if moments.count else math.nan
+        if name == 'sum':
+            return moments.mean * moments.count
+        if name == 'std':
+            return math.sqrt(moments.variance)
+        raise ValueError(f'Метрики {name!r} нет в профиле, ожидается одна из {METRICS}')
+
+    def to_dict(self):
+        return {'moments': self.moments.to_dict(), 'digest': self.digest.to_dict()}
+
+    @classmethod
+    def from_dict(cls, data, compression=COMPRESSION):
+        return cls(compression, Moments.from_dict(data['moments']),
+                   TDigest.from_dict(data['digest'], compression))
+
+
+def _key(value):
+    """Значение группы для JSON: строка или float"""
+    return value if isinstance(value, str) else float(value)
+
+
+class ListingProfile:
+    """
+    Профиль выгрузки: rows, непустые значения по колонкам (present),
+    Summary цены целиком (total) и по значениям групп (groups), Comoments
+    пар (pairs). update() добавляет блок объявлений, merge() - профиль
+    другой части выгрузки.
+    """
+
+    def __init__(self, value=VALUE, groups=GROUPS, pairs=PAIRS, compression=COMPRESSION):
+        self.value = value
+        self.compression = compression
+        self.rows = 0
+        self.present = {}
+        self.dtypes = {}
+        self.total = Summary(compression)
+        self.groups = {group: {} for group in groups}
+        self.categories = {group: set() for group in groups}
+        self.pairs = {tuple(pair): Comoments() for pair in pairs}
+
+    def update(self, raw, analysis=None):
+        """
+        Добавляет блок сырой выгрузки raw. analysis - его аналитический фрейм
+        (frame.build_analysis_frame), если уже построен.
+        """
+        if analysis is None:
+            analysis = build_analysis_frame(raw)
+        self.count_present(raw.columns, raw.notna().sum().to_numpy(), len(raw))
+        self.add_values(analysis)
+        return self
+
+    def count_present(self, columns, present, rows):
+        """Учитывает блок из rows строк с present непустыми значениями колонок columns"""
+        self.rows += int(rows)
+        for column, count in zip(columns, present):
+            self.present[column] = self.present.get(column, 0) + int(count)
+
+    def add_values(self, analysis):
+        """Обновляет статистики по блоку аналитического фрейма"""
+        for column in analysis.columns:
+            self.dtypes.setdefault(column, str(analysis[column].dtype))
+        if self.value not in analysis.columns:
+            return
+        values = analysis[self.value]
+        self.total.update(values.dropna().to_numpy())
+        for group, summaries in self.groups.items():
+            if group not in analysis.columns:
+                continue
+            keys = analysis[group]
+            if self.dtypes[group] == 'category':
+                self.categories[group].update(keys.dropna().unique().tolist())
+            data = analysis[[group, self.value]].dropna()
+            for key, part in data.groupby(group, observed=True, sort=False)[self.value]:
+                key = _key(key)
+                if key not in summaries:
+                    summaries[key] = Summary(self.compression)
+                summaries[key].update(part.to_numpy())
+        for (x, y), comoments in self.pairs.items():
+            if x in analysis.columns and y in analysis.columns:
+                data = analysis[[x, y]].dropna()
+                comoments.update(data[x].to_numpy(), data[y].to_numpy())
+
+    def merge(self, other):
+        """Добавляет профиль other (другой части выгрузки) и возвращает self"""
+        self.count_present(other.present, other.present.values(), other.rows)
+        for column, dtype in other.dtypes.items():
+            self.dtypes.setdefault(column, dtype)
+        self.total.merge(other.total)
+        for group, summaries in other.groups.items():
+            mine = self.groups.setdefault(group, {})
+            for key, summary in summaries.items():
+                mine.setdefault(key, Summary(self.compression)).merge(summary)
+            self.categories.setdefault(group, set()).update(other.categories.get(group, ()))
+        for pair, comoments in other.pairs.items():
+            self.pairs.setdefault(pair, Comoments()).merge(comoments)
+        return self
+
+    def missing_profile(self):
+        """Колонка / Пропущено / Процент, как PandasQueries.missing_profile"""
+        columns = list(self.present)
+        return missing_table(columns, [self.rows - self.present[column] for column in columns], self.rows)
+
+    def group_stats(self, group, metrics=METRICS):
+        """Метрики цены по значениям group, как PandasQueries.group_stats"""
+        summaries = self.groups[group]
+        keys = sorted(summaries)
+        dtype = self.dtypes.get(self.value, 'float64')
+        table = pd.DataFrame({
+            metric: np.array([summaries[key].metric(metric) for key in keys],
+                             dtype='int64' if metric == 'count' else dtype)
+            for metric in metrics
+        })
+        if self.dtypes.get(group) == 'category':
+            table.index = pd.CategoricalIndex(keys, categories=sorted(self.categories[group]), name=group)
+        else:
+            table.index = pd.Index(np.array(keys, dtype=self.dtypes.get(group, 'float64')), name=group)
+        return table
+
+    def pair_summary(self, x, y):
+        """count, corr, mean_x, mean_y, как PandasQueries.pair_summary"""
+        comoments = self.pairs[(x, y)]
+        empty = not comoments.count
+        return pd.DataFrame({
+            'count': [comoments.count],
+            'corr': [comoments.corr],
+            'mean_x': pd.array([math.nan if empty else comoments.mean_x], dtype=self.dtypes.get(x, 'float64')),
+            'mean_y': pd.array([math.nan if empty else comoments.mean_y], dtype=self.dtypes.get(y, 'float64')),
+        })
+
+    def to_dict(self):
+        return {
+            'format': PROFILE_FORMAT,
+            'value': self.value,
+            'compression': self.compression,
+            'rows': self.rows,
+            'present': self.present,
+            'dtypes': self.dtypes,
+            'total': self.total.to_dict(),
+            'groups': {group: [[key, summary.to_dict()] for key, summary in summaries.items()]
+                       for group, summaries in self.groups.items()},
+            'categories': {group: sorted(keys) for group, keys in self.categories.items()},
+            'pairs': [[x, y, comoments.to_dict()] for (x, y), comoments in self.pairs.items()],
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        if data.get('format') != PROFILE_FORMAT:
+            raise ValueError(f'Формат профиля {data.get("format")}, ожидается {PROFILE_FORMAT}')
+        compression = data['compression']
+        profile = cls(data['value'], tuple(data['groups']),
+                      [(x, y) for x, y, _ in data['pairs']], compression)
+        profile.rows = data['rows']
+        profile.present = data['present']
+        profile.dtypes = data['dtypes']
+        profile.total = Summary.from_dict(data['total'], compression)
+        profile.groups = {group: {key: Summary.from_dict(summary, compression) for key, summary in summaries}
+                          for group, summaries in data['groups'].items()}
+        profile.categories = {group: set(keys) for group, keys in data['categories'].items()}
+        profile.pairs = {(x, y): Comoments.from_dict(comoments) for x, y, comoments in data['pairs']}
+        return profile
+
+    def save(self, path):
+        """Атомарно записывает профиль в JSON"""
+        path = Path(path)
+        tmp = path.with_suffix('.json.tmp')
+        tmp.write_text(json.dumps(self.to_dict(), ensure_ascii=False), encoding='utf-8')
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path):
+        return cls.from_dict(json.loads(Path(path).read_text(encoding='utf-8')))
+
+    @classmethod
+    def from_parquet(cls, listings, analysis, batch_rows=BATCH_ROWS):
+        """
+        Профиль одним проходом по Parquet-файлам блоками по batch_rows строк:
+        непустые значения - по метаданным колонок блоков выгрузки listings,
+        статистики - по аналитическому фрейму analysis.
+        """
+        profile = cls()
+        for batch in pq.ParquetFile(listings).iter_batches(batch_size=batch_rows):
+            profile.count_present(batch.schema.names,
+                                  [batch.num_rows - column.null_count for column in batch.columns],
+                                  batch.num_rows)
+        source = pq.ParquetFile(analysis)
+        needed = {profile.value, *profile.groups, *(column for pair in profile.pairs for column in pair)}
+        columns = [name for name in source.schema_arrow.names if name in needed]
+        for batch in source.iter_batches(batch_size=batch_rows, columns=columns):
+            profile.add_values(batch.to_pandas())
+        return profile
+
+    @classmethod
+    def for_dataset(cls, dataset):
+        """
+        Профиль версии датасета: из profile-<версия>.json или построенный по
+        Parquet-файлам кэша и сохраненный туда. Файл аналитического фрейма
+        должен уже быть (frame.load_analysis_frame).
+        """
+        path = profile_path(dataset)
+        if path.exists():
+            return cls.load(path)
+        profile = cls.from_parquet(dataset.path, analysis_path(dataset))
+        profile.save(path)
+        return profile
+
+
+def profile_path(dataset):
+    return dataset.path.parent / PROFILE_FILE.format(version=dataset.version, format=PROFILE_FORMAT)
+
+
+class ProfileQueries:
+    """
+    Исполнитель сводок для AggregateStore (см. queries.py): пропуски, count,
+    среднее, min/max и парные сводки берутся из профиля версии датасета, без
+    просмотра фреймов. Медианы (SKETCH_METRICS) в профиле приближенные,
+    поэтому их считает PandasQueries - как и сводки по колонкам, которых
+    нет в профиле. Профиль загружается при первом запросе.
+    """
+    name = 'profile'
+    exact = True
+
+    def __init__(self, dataset):
+        self.dataset = dataset
+        self.fallback = PandasQueries()
+        self._profile = None
+
+    @property
+    def profile(self):
+        if self._profile is None:
+            self._profile = ListingProfile.for_dataset(self.dataset)
+        return self._profile
+
+    def missing_profile(self, df):
+        return self.profile.missing_profile()
+
+    def group_stats(self, frame, group, value, metrics):
+        if value != self.profile.value or group not in self.profile.groups:
+            return self.fallback.group_stats(frame, group, value, metrics)
+        metrics = list(metrics)
+        sketched = [metric for metric in metrics if metric in SKETCH_METRICS]
+        table = self.profile.group_stats(group, [metric for metric in metrics if metric not in sketched])
+        if sketched:
+            exact = self.fallback.group_stats(frame, group, value, sketched).reindex(table.index)
+            for metric in sketched:
+                table[metric] = exact[metric].to_numpy()
+        return table[metrics]
+
+    def pair_summary(self, frame, x, y):
+        if (x, y) not in self.profile.pairs:
+            return self.fallback.pair_summary(frame, x, y)
+        return self.profile.pair_summary(x, y)
+
+
+def main(argv=None):
+    # Чтение CSV блоками нужно только командной строке, дашборду - нет
+    from realestate.ingest import BLOCK_MB, read_batches
+
+    parser = argparse.ArgumentParser(description='Добавление новых объявлений к сохраненному профилю')
+    parser.add_argument('profile', help='JSON профиля; если файла нет, он будет создан')
+    parser.add_argument('sources', nargs='+', help='CSV с новыми объявлениями')
+    parser.add_argument('--block-mb', type=int, default=BLOCK_MB, help='размер блока чтения CSV, МБ')
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    path = Path(args.profile)
+    profile = ListingProfile.load(path) if path.exists() else ListingProfile()
+    before = profile.rows
+    for source in args.sources:
+        for batch in read_batches(source, args.block_mb):
+            profile.update(batch)
+    profile.save(path)
+    print(f'Добавлено строк: {profile.rows - before:,}, всего {profile.rows:,}, '
+          f'{time.perf_counter() - start:.2f} с')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,169 @@
+"""
+Вычисление сводок дашборда: по потоковому профилю, pandas или SQL в DuckDB.
+
+AggregateStore (aggregates.py) получает сводки - профиль пропусков,
+статистики по группам, парную сводку - от одного из исполнителей:
+
+- ProfileQueries (profile.py) берет их из сохраненного профиля выгрузки,
+  не просматривая строки; только медианы (в профиле приближенные,
+  t-digest) он считает pandas;
+- PandasQueries считает по фреймам в памяти процесса;
+- DuckDBQueries выполняет те же расчеты SQL-запросами к кэшированным
+  Parquet-файлам: к выгрузке (listings-<версия>.parquet) и к
+  аналитическому фрейму (analysis-<версия>.parquet, frame.py). DuckDB
+  читает из файла только колонки запроса, а условия "не пропуск"
+  проверяет при чтении, поэтому сводка по миллионам строк не требует
+  держать их в памяти.
+
+Результаты pandas и DuckDB совпадают: DuckDB возвращает только числа, а таблицы
+собираются теми же функциями (missing_table), с теми же типами колонок и
+индексом, что и у pandas. Средние и корреляция могут отличаться в
+последних знаках из-за другого порядка суммирования.
+
+Исполнитель выбирается переменной окружения REA_QUERY_BACKEND (profile по
+умолчанию) или аргументом backend. Медианы профиль не берет из t-digest,
+а считает точно по фрейму, поэтому его сводки совпадают с pandas с
+точностью до округления. DuckDB - необязательная зависимость:
+pip install duckdb.
+"""
+import os
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+BACKEND_ENV = 'REA_QUERY_BACKEND'
+BACKENDS = ('profile', 'pandas', 'duckdb')
+
+# Название метрики pandas (.agg) -> агрегат DuckDB
+SQL_METRICS = {
+    'median': 'median',
+    'mean': 'avg',
+    'count': 'count',
+    'min': 'min',
+    'max': 'max',
+    'sum': 'sum',
+    'std': 'stddev_samp',
+}
+
+
+def resolve_backend(backend=None):
+    """Исполнитель из аргумента или окружения: одно из BACKENDS"""
+    backend = backend or os.environ.get(BACKEND_ENV, BACKENDS[0])
+    if backend not in BACKENDS:
+        raise ValueError(f'{BACKEND_ENV}={backend!r}, ожидается одно из {BACKENDS}')
+    return backend
+
+
+def missing_table(columns, missing, rows):
+    """Колонка / Пропущено / Процент, по убыванию пропусков"""
+    missing = np.asarray(missing, dtype='int64')
+    return pd.DataFrame({
+        'Колонка': list(columns),
+        'Пропущено': missing,
+        'Процент': (missing / rows) * 100 if rows else 0.0,
+    }).sort_values('Пропущено', ascending=False)
+
+
+class PandasQueries:
+    """Сводки по фреймам в памяти"""
+    name = 'pandas'
+    exact = True
+
+    def missing_profile(self, df):
+        missing_data = df.isnull().sum()
+        return missing_table(missing_data.index, missing_data.values, len(df))
+
+    def group_stats(self, frame, group, value, metrics):
+        data = frame[[group, value]].dropna()
+        return data.groupby(group, observed=True)[value].agg(list(metrics))
+
+    def pair_summary(self, frame, x, y):
+        data = frame[[x, y]].dropna()
+        return pd.DataFrame({
+            'count': [len(data)],
+            'corr': [data[x].corr(data[y])],
+            'mean_x': [data[x].mean()],
+            'mean_y': [data[y].mean()],
+        })
+
+
+def _quote(name):
+    return '"' + str(name).replace('"', '""') + '"'
+
+
+class DuckDBQueries:
+    """
+    Сводки SQL-запросами DuckDB к Parquet: missing_profile - по файлу
+    выгрузки listings, group_stats и pair_summary - по файлу аналитического
+    фрейма analysis. Аргументы-фреймы методов не используются, из них
+    берутся только названия колонок.
+    """
+    name = 'duckdb'
+    exact = True
+
+    def __init__(self, listings, analysis):
+        try:
+            import duckdb
+        except ImportError as error:
+            raise RuntimeError(f'{BACKEND_ENV}=duckdb требует пакет duckdb: pip install duckdb') from error
+        self.listings = str(listings)
+        self.analysis = str(analysis)
+        self.connection = duckdb.connect()
+
+    def _query(self, sql, path):
+        return self.connection.execute(sql.format(source='read_parquet(?)'), [path])
+
+    def _schema(self, path):
+        return pq.read_schema(path)
+
+    def missing_profile(self, df):
+        columns = self._schema(self.listings).names
+        counts = ', '.join(f'count({_quote(column)})' for column in columns)
+        row = self._query(f'SELECT count(*), {counts} FROM {{source}}', self.listings).fetchone()
+        rows = row[0]
+        return missing_table(columns, [rows - present for present in row[1:]], rows)
+
+    def group_stats(self, frame, group, value, metrics):
+        metrics = list(metrics)
+        schema = self._schema(self.analysis)
+        aggregates = ', '.join(f'{SQL_METRICS[metric]}({_quote(value)})' for metric in metrics)
+        g, v = _quote(group), _quote(value)
+        result = self._query(
+            f'SELECT {g}, {aggregates} FROM {{source}} '
+            f'WHERE {g} IS NOT NULL AND {v} IS NOT NULL GROUP BY {g} ORDER BY {g}',
+            self.analysis).fetchnumpy()
+
+        value_dtype = schema.field(value).type.to_pandas_dtype()
+        table = pd.DataFrame({
+            metric: result[key].astype('int64' if metric == 'count' else value_dtype)
+            for metric, key in zip(metrics, list(result)[1:])
+        })
+        table.columns.name = None
+        table.index = self._group_index(result[list(result)[0]], group, schema.field(group).type)
+        return table
+
+    def _group_index(self, values, group, arrow_type):
+        """Индекс как у groupby(observed=True): категории - все значения колонки по порядку"""
+        if pa.types.is_dictionary(arrow_type):
+            g = _quote(group)
+            categories = self._query(f'SELECT DISTINCT {g} FROM {{source}} WHERE {g} IS NOT NULL ORDER BY {g}',
+                                     self.analysis).fetchnumpy()[group]
+            return pd.CategoricalIndex(list(values), categories=list(categories), name=group)
+        return pd.Index(values.astype(arrow_type.to_pandas_dtype()), name=group)
+
+    def pair_summary(self, frame, x, y):
+        schema = self._schema(self.analysis)
+        qx, qy = _quote(x), _quote(y)
+        count, corr, mean_x, mean_y = self._query(
+            f'SELECT count(*), corr({qx}, {qy}), avg({qx}), avg({qy}) FROM {{source}} '
+            f'WHERE {qx} IS NOT NULL AND {qy} IS NOT NULL', self.analysis).fetchone()
+        dtype_x = schema.field(x).type.to_pandas_dtype()
+        dtype_y = schema.field(y).type.to_pandas_dtype()
+        return pd.DataFrame({
+            'count': [count],
+            'corr': [float('nan') if corr is None else corr],
+            'mean_x': pd.array([mean_x], dtype=dtype_x),
+            'mean_y': pd.array([mean_y], dtype=dtype_y),
+        })
@@ -0,0 +1,232 @@
+"""
+Отрисовка графиков дашборда с кэшем готовых изображений.
+
+Каждый график рисуется один раз на версию датасета и набор параметров,
+кодируется в PNG и хранится в памяти процесса и на диске рядом с кэшем
+датасета. Фигура matplotlib закрывается сразу после кодирования, поэтому
+долго работающий сервер не накапливает открытые фигуры.
+
+Диаграммы рассеяния по всему датасету рисуются через draw_scatter: выше
+порога точек вместо каждой точки строится плотность (двумерная гистограмма)
+или стратифицированная выборка, а линия тренда считается по бинам.
+Отрисовка и кодирование PNG записываются как этап замеров перезапуска
+(instrument.py).
+
+PNG шире страницы Streamlit уменьшает при каждом показе (st.image, около
+0.1-0.2 с на график), поэтому картинка уменьшается до MAX_IMAGE_WIDTH
+один раз - при кодировании, тем же билинейным фильтром.
+"""
+import hashlib
+import io
+import os
+from pathlib import Path
+
+import numpy as np
+
+from realestate.instrument import stage
+
+# Параметры как у st.pyplot, чтобы картинки выглядели так же
+SAVEFIG_KWARGS = {'format': 'png', 'dpi': 200, 'bbox_inches': 'tight'}
+# Ширина, шире которой st.image уменьшает картинку (image_utils.MAXIMUM_CONTENT_WIDTH)
+MAX_IMAGE_WIDTH = 2 * 730
+# Формат каталога графиков; меняется, когда меняется вид сохраненных PNG
+CHART_FORMAT = 2
+
+# Сколько точек рисуется как есть; выше - плотность или выборка
+SCATTER_MAX_POINTS_ENV = 'REA_SCATTER_MAX_POINTS'
+SCATTER_MODE_ENV = 'REA_SCATTER_MODE'
+SCATTER_MAX_POINTS = 20000
+SCATTER_MODES = ('density', 'sample')
+TREND_BINS = 50
+DENSITY_GRID = 80
+
+
+def fit_width(image, max_width=MAX_IMAGE_WIDTH):
+    """PNG не шире max_width пикселей; узкие изображения возвращаются как есть"""
+    from PIL import Image
+
+    picture = Image.open(io.BytesIO(image))
+    if picture.width <= max_width:
+        return image
+    height = int(picture.height * max_width / picture.width)
+    buffer = io.BytesIO()
+    picture.resize((max_width, height), resample=Image.BILINEAR).save(buffer, format='PNG')
+    return buffer.getvalue()
+
+
+def figure_png(fig):
+    """Кодирует фигуру в PNG не шире страницы и закрывает её"""
+    import matplotlib.pyplot as plt
+
+    buffer = io.BytesIO()
+    try:
+        fig.savefig(buffer, **SAVEFIG_KWARGS)
+    finally:
+        plt.close(fig)
+    return fit_width(buffer.getvalue())
+
+
+class ChartCache:
+    """
+    PNG-изображения графиков одной версии датасета. source - имя исполнителя
+    сводок (queries.name), по которым нарисованы графики: у каждого свой
+    каталог, и график одного исполнителя не показывается другому.
+    """
+
+    def __init__(self, root, version, source=None):
+        self.version = version
+        suffix = f'-{source}' if source else ''
+        self.root = Path(root) / f'charts-{version}-v{CHART_FORMAT}{suffix}'
+        self._images = {}
+
+    @classmethod
+    def for_dataset(cls, dataset, source=None):
+        return cls(dataset.path.parent, dataset.version, source)
+
+    @staticmethod
+    def key(name, params=None):
+        """Ключ графика: имя и хэш отсортированных параметров"""
+        items = sorted((params or {}).items())
+        digest = hashlib.sha1(repr(items).encode('utf-8')).hexdigest()[:12]
+        return f'{name}-{digest}'
+
+    def get(self, name, draw, params=None):
+        """
+        PNG графика name; draw() вызывается только если изображения еще нет.
+
+        draw должна вернуть фигуру matplotlib, закрывать её не нужно.
+        """
+        key = self.key(name, params)
+        if key in self._images:
+            return self._images[key]
+        path = self.root / f'{key}.png'
+        if path.exists():
+            image = path.read_bytes()
+        else:
+            with stage(f'График {name}'):
+                image = figure_png(draw())
+            self.root.mkdir(parents=True, exist_ok=True)
+            tmp = path.with_suffix('.png.tmp')
+            tmp.write_bytes(image)
+            os.replace(tmp, path)
+        self._images[key] = image
+        return image
+
+
+def lazy_tabs(labels, key):
+    """
+    Замена st.tabs, при которой выполняется только содержимое выбранной вкладки.
+
+    st.tabs исполняет код всех вкладок при каждом прогоне; здесь вкладки
+    выбираются горизонтальным переключателем, и функция возвращает выбранную метку.
+    """
+    import streamlit as st
+
+    return st.radio('Раздел', labels, index=0, key=key, horizontal=True,
+                    label_visibility='collapsed')
+
+
+def scatter_settings():
+    """Порог и режим диаграмм рассеяния из окружения: (max_points, mode)"""
+    max_points = int(os.environ.get(SCATTER_MAX_POINTS_ENV, SCATTER_MAX_POINTS))
+    mode = os.environ.get(SCATTER_MODE_ENV, SCATTER_MODES[0])
+    if mode not in SCATTER_MODES:
+        raise ValueError(f'{SCATTER_MODE_ENV}={mode!r}, ожидается одно из {SCATTER_MODES}')
+    return max_points, mode
+
+
+def _bin_index(x, bins, low=None, high=None):
+    """Номер равного по ширине бина по x для каждой точки"""
+    low = x.min() if low is None else low
+    high = x.max() if high is None else high
+    if high <= low:
+        return np.zeros(len(x), dtype=np.intp)
+    index = ((x - low) * (bins / (high - low))).astype(np.intp)
+    return np.minimum(index, bins - 1)
+
+
+def stratified_sample(x, y, max_points, bins=TREND_BINS, seed=0):
+    """
+    Примерно max_points точек с сохранением распределения по x.
+
+    Из каждого бина x точка берется с вероятностью max_points / n, но не
+    меньше 1 / (размер бина), чтобы редкие значения не пропадали.
+    """
+    n = len(x)
+    if n <= max_points:
+        return x, y
+    index = _bin_index(x, bins)
+    counts = np.bincount(index, minlength=bins)
+    probability = np.maximum(max_points / n, 1 / np.maximum(counts, 1))
+    keep = np.random.default_rng(seed).random(n) < probability[index]
+    return x[keep], y[keep]
+
+
+def density_grid(x, y, grid=DENSITY_GRID):
+    """
+    Двумерная гистограмма: (x_edges, y_edges, counts[y, x]).
+
+    Считается через bincount по номерам ячеек, без сортировки, поэтому
+    заметно быстрее np.histogram2d и hexbin на миллионах точек.
+    """
+    x_low, x_high = x.min(), x.max()
+    y_low, y_high = y.min(), y.max()
+    cell = _bin_index(y, grid, y_low, y_high) * grid + _bin_index(x, grid, x_low, x_high)
+    counts = np.bincount(cell, minlength=grid * grid).reshape(grid, grid)
+    x_edges = np.linspace(x_low, x_high if x_high > x_low else x_low + 1, grid + 1)
+    y_edges = np.linspace(y_low, y_high if y_high > y_low else y_low + 1, grid + 1)
+    return x_edges, y_edges, counts
+
+
+def binned_trend(x, y, bins=TREND_BINS):
+    """
+    Линейный тренд по средним в бинах x (вес бина - число точек).
+
+    Возвращает отсортированные по x средние бинов и значения прямой в них.
+    """
+    index = _bin_index(x, bins)
+    counts = np.bincount(index, minlength=bins)
+    filled = counts > 0
+    mean_x = np.bincount(index, weights=x, minlength=bins)[filled] / counts[filled]
+    mean_y = np.bincount(index, weights=y, minlength=bins)[filled] / counts[filled]
+    if len(mean_x) < 2:
+        return mean_x, mean_y
+    coef = np.polyfit(mean_x, mean_y, 1, w=np.sqrt(counts[filled]))
+    return mean_x, np.polyval(coef, mean_x)
+
+
+def draw_scatter(ax, x, y, max_points=None, mode=None):
+    """
+    Диаграмма рассеяния y от x с линией тренда.
+
+    До max_points точек рисуется обычный scatter, выше - плотность с
+    логарифмической шкалой (mode='density') или стратифицированная выборка
+    (mode='sample').
+    По умолчанию порог и режим берутся из scatter_settings().
+    """
+    default_points, default_mode = scatter_settings()
+    max_points = default_points if max_points is None else max_points
+    mode = default_mode if mode is None else mode
+    x = np.asarray(x, dtype='float64')
+    y = np.asarray(y, dtype='float64')
+    if len(x) == 0:
+        return
+
+    if len(x) <= max_points:
+        ax.scatter(x, y, alpha=0.6)
+    elif mode == 'density':
+        from matplotlib.colors import LogNorm
+
+        x_edges, y_edges, counts = density_grid(x, y)
+        cells = ax.pcolormesh(x_edges, y_edges, np.ma.masked_equal(counts, 0),
+                              cmap='Blues', norm=LogNorm())
+        ax.figure.colorbar(cells, ax=ax, label='Объявлений')
+    else:
+        sample_x, sample_y = stratified_sample(x, y, max_points)
+        ax.scatter(sample_x, sample_y, alpha=0.3, s=8)
+        ax.text(0.99, 0.99, f'показано {len(sample_x):,} из {len(x):,}',
+                transform=ax.transAxes, ha='right', va='top', fontsize=9)
+
+    # Линия тренда
+    trend_x, trend_y = binned_trend(x, y)
+    ax.plot(trend_x, trend_y, 'r--', alpha=0.8)
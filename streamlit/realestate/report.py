@@ -0,0 +1,341 @@
+"""
+Статический отчет EDA (релиз 1) для главной страницы main1.py.
+
+Графики разведочного анализа из "release 1/EDA (2).ipynb" не рисуются при
+открытии страницы: их собирает офлайн-шаг
+
+    python -m realestate.report [источник] [--output каталог] [--force]
+
+в каталог отчета (REA_REPORT_DIR, по умолчанию streamlit/report/) вместе с
+manifest.json, где записаны версия датасета и формат отчета. Если версия и
+формат не изменились, сборка ничего не делает; --force пересобирает.
+
+main1.py только читает манифест и отдает готовые PNG. Пока отчет не
+собран, показываются изображения, сохраненные из ноутбука (лежат рядом с
+main1.py). PNG сохраняются не шире страницы, чтобы Streamlit не уменьшал
+их при каждом показе.
+
+Модуль импортируется главной страницей, поэтому на уровне модуля в нем
+только стандартная библиотека: pandas, matplotlib и код подготовки данных
+загружаются внутри функций сборки.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+REPORT_FORMAT = 1
+REPORT_DIR_ENV = 'REA_REPORT_DIR'
+APP_DIR = Path(__file__).resolve().parent.parent
+DEFAULT_REPORT_DIR = APP_DIR / 'report'
+MANIFEST_FILE = 'manifest.json'
+# HTML-отчет релиза 1
+EDA_HTML = APP_DIR.parent / 'release 1' / 'EDA.html'
+# 100 dpi, как в ноутбуке; фигуры не шире 14.6 дюйма - PNG не шире 1460 пикселей
+DPI = 100
+
+# Файл и подпись графика в порядке ноутбука; имена - как у сохраненных из него PNG
+CHARTS = [
+    ('analiz_none.png', 'Пропущенные значения по колонкам'),
+    ('prices_vs_apartamets.png', 'Сколько квартир по каким ценам'),
+    ('rental_prices.png', 'Распределение и разброс цен'),
+    ('some_graphs.png', 'Комнаты, тип жилья, ремонт и парковка'),
+    ('metro.png', 'Топ-10 станций метро по количеству объявлений'),
+    ('price_distribution.png', 'Зависимость цены от площади'),
+    ('floors.png', 'Этажи квартир и этажность домов'),
+    ('price_vs_floors.png', 'Цена по этажу и по типу окон'),
+    ('correlation.png', 'Корреляция цены, площади и числа комнат'),
+]
+CATEGORY_COLUMNS = ['Количество комнат', 'Тип', 'Ремонт', 'Парковка']
+
+
+def report_dir(path=None):
+    """Каталог отчета: аргумент, REA_REPORT_DIR или streamlit/report/"""
+    return Path(path or os.environ.get(REPORT_DIR_ENV) or DEFAULT_REPORT_DIR)
+
+
+def read_manifest(root=None):
+    """
+    Манифест собранного отчета или None, если отчета нет, он другого
+    формата или в нем не хватает файлов
+    """
+    root = report_dir(root)
+    try:
+        manifest = json.loads((root / MANIFEST_FILE).read_text(encoding='utf-8'))
+    except (OSError, ValueError):
+        return None
+    if manifest.get('format') != REPORT_FORMAT:
+        return None
+    if not all((root / chart['file']).exists() for chart in manifest.get('charts', [])):
+        return None
+    return manifest
+
+
+def eda_images(root=None):
+    """
+    Графики для показа: ([(путь, подпись), ...], манифест). Без собранного
+    отчета - PNG из ноутбука рядом с main1.py, манифест None.
+    """
+    root = report_dir(root)
+    manifest = read_manifest(root)
+    if manifest is not None:
+        return [(root / chart['file'], chart['title']) for chart in manifest['charts']], manifest
+    return [(APP_DIR / name, title) for name, title in CHARTS if (APP_DIR / name).exists()], None
+
+
+def report_frame(dataset):
+    """
+    Колонки графиков по строкам без выбросов, как в ноутбуке: цена в
+    пределах 1.5 IQR, площадь не больше Q3 + 1.5 IQR, от 1 до 10 комнат.
+    Возвращает (фрейм графиков, доля пропусков по колонкам выгрузки в %).
+    """
+    import pandas as pd
+
+    from realestate.frame import load_analysis_frame
+
+    raw = dataset.frame
+    analysis = load_analysis_frame(dataset)
+    frame = pd.DataFrame({
+        'price': analysis['price_clean'].to_numpy('float64'),
+        'area': analysis['total_area_clean'].to_numpy('float64'),
+        'rooms': analysis['rooms_clean'].to_numpy('float64'),
+    }, index=raw.index)
+
+    q1, q3 = frame['price'].quantile([0.25, 0.75])
+    area_q1, area_q3 = frame['area'].quantile([0.25, 0.75])
+    keep = (frame['price'].between(max(0, q1 - 1.5 * (q3 - q1)), q3 + 1.5 * (q3 - q1))
+            & (frame['area'] <= area_q3 + 1.5 * (area_q3 - area_q1))
+            & frame['rooms'].between(1, 10))
+
+    missing = raw.isna()[keep].mean() * 100
+    frame = frame[keep]
+    if 'Дом' in raw.columns:
+        floors = raw.loc[keep, 'Дом'].str.extract(r'(\d+)/(\d+)')
+        frame['floor'] = pd.to_numeric(floors[0], errors='coerce')
+        frame['total_floors'] = pd.to_numeric(floors[1], errors='coerce')
+    for column in CATEGORY_COLUMNS + ['Метро', 'Окна']:
+        if column in raw.columns:
+            frame[column] = raw.loc[keep, column]
+    return frame, missing
+
+
+def _draw_missing(frame, missing):
+    import matplotlib.pyplot as plt
+
+    fig, ax = plt.subplots(figsize=(12, 8))
+    missing = missing[missing > 0].sort_values()
+    ax.barh(missing.index.astype(str), missing.values)
+    ax.set_xlabel('Процент пропусков (%)')
+    ax.set_title('Распределение пропущенных значений по колонкам')
+    return fig
+
+
+def _draw_price_hist(frame, missing):
+    import matplotlib.pyplot as plt
+
+    fig, ax = plt.subplots(figsize=(8, 4))
+    ax.hist(frame['price'], bins=15, color='orange', alpha=0.7)
+    ax.set_title('Сколько квартир по каким ценам')
+    ax.set_xlabel('Цена аренды (руб)')
+    ax.set_ylabel('Количество квартир')
+    return fig
+
+
+def _draw_price_spread(frame, missing):
+    import matplotlib.pyplot as plt
+
+    fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(12, 4))
+    ax1.hist(frame['price'], bins=25, color='lightblue', alpha=0.8)
+    ax1.set_title('Распределение цен на аренду')
+    ax1.set_xlabel('Цена (руб.)')
+    ax1.set_ylabel('Количество')
+    ax2.boxplot(frame['price'])
+    ax2.set_title('Разброс цен (Boxplot)')
+    ax2.set_ylabel('Цена (руб.)')
+    return fig
+
+
+def _draw_categories(frame, missing):
+    import matplotlib.pyplot as plt
+
+    fig, axes = plt.subplots(2, 2, figsize=(14, 9))
+    for ax, column in zip(axes.ravel(), CATEGORY_COLUMNS):
+        if column not in frame.columns:
+            ax.set_visible(False)
+            continue
+        counts = frame[column].value_counts().head(10)
+        total = frame[column].notna().sum()
+        ax.bar(counts.index.astype(str), counts.values)
+        ax.set_title(f'Распределение: {column}')
+        ax.tick_params(axis='x', rotation=45)
+        for i, value in enumerate(counts.values):
+            ax.text(i, value, f'{value / total * 100:.1f}%', ha='center', va='bottom')
+    return fig
+
+
+def _draw_metro(frame, missing):
+    import matplotlib.pyplot as plt
+
+    fig, ax = plt.subplots(figsize=(12, 6))
+    if 'Метро' in frame.columns:
+        counts = frame['Метро'].value_counts().head(10)
+        ax.barh(counts.index.astype(str)[::-1], counts.values[::-1], color='lightblue')
+    ax.set_title('Топ-10 станций метро по количеству объявлений')
+    ax.set_xlabel('Количество объявлений')
+    return fig
+
+
+def _draw_price_area(frame, missing):
+    import matplotlib.pyplot as plt
+
+    from realestate.render import draw_scatter
+
+    fig, ax = plt.subplots(figsize=(12, 6))
+    data = frame[['area', 'price']].dropna()
+    draw_scatter(ax, data['area'], data['price'])
+    ax.set_xlabel('Площадь (м²)')
+    ax.set_ylabel('Цена (руб.)')
+    ax.set_title('Зависимость цены от площади')
+    ax.grid(True, alpha=0.3)
+    return fig
+
+
+def _draw_floors(frame, missing):
+    import matplotlib.pyplot as plt
+
+    fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(12, 4))
+    if 'floor' in frame.columns:
+        ax1.hist(frame['floor'].dropna(), bins=15, color='lightblue', alpha=0.7)
+        ax2.hist(frame['total_floors'].dropna(), bins=10, color='lightgreen', alpha=0.7)
+    ax1.set_title('На каких этажах квартиры')
+    ax1.set_xlabel('Этаж')
+    ax1.set_ylabel('Количество')
+    ax2.set_title('Этажность домов')
+    ax2.set_xlabel('Этажность')
+    ax2.set_ylabel('Количество')
+    return fig
+
+
+def _draw_price_floor(frame, missing):
+    import matplotlib.pyplot as plt
+
+    from realestate.render import draw_scatter
+
+    fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(12, 4))
+    if 'floor' in frame.columns:
+        data = frame[['floor', 'price']].dropna()
+        draw_scatter(ax1, data['floor'], data['price'])
+    ax1.set_title('Цена vs Этаж')
+    ax1.set_xlabel('Этаж')
+    ax1.set_ylabel('Цена (руб)')
+    if 'Окна' in frame.columns:
+        top = frame['Окна'].value_counts().head(5).index
+        prices = frame[frame['Окна'].isin(top)].groupby('Окна', observed=True)['price'].mean()
+        ax2.barh(prices.index.astype(str), prices.values, color='orange', alpha=0.7)
+    ax2.set_title('Средняя цена по типу окон')
+    ax2.set_xlabel('Средняя цена (руб)')
+    return fig
+
+
+def _draw_correlation(frame, missing):
+    import matplotlib.pyplot as plt
+
+    matrix = frame[['price', 'area', 'rooms']].corr()
+    labels = ['Цена', 'Площадь', 'Комнаты']
+    fig, ax = plt.subplots(figsize=(8, 6))
+    cells = ax.imshow(matrix.to_numpy(), cmap='coolwarm', vmin=-1, vmax=1)
+    fig.colorbar(cells, ax=ax)
+    ax.set_xticks(range(len(labels)), labels)
+    ax.set_yticks(range(len(labels)), labels)
+    for i in range(len(labels)):
+        for j in range(len(labels)):
+            ax.text(j, i, f'{matrix.iat[i, j]:.2f}', ha='center', va='center')
+    ax.set_title('Корреляция между ценой, площадью и комнатами')
+    return fig
+
+
+DRAW = {
+    'analiz_none.png': _draw_missing,
+    'prices_vs_apartamets.png': _draw_price_hist,
+    'rental_prices.png': _draw_price_spread,
+    'some_graphs.png': _draw_categories,
+    'metro.png': _draw_metro,
+    'price_distribution.png': _draw_price_area,
+    'floors.png': _draw_floors,
+    'price_vs_floors.png': _draw_price_floor,
+    'correlation.png': _draw_correlation,
+}
+
+
+def _save(fig, path):
+    """Сохраняет фигуру в PNG атомарно и закрывает её"""
+    import matplotlib.pyplot as plt
+
+    tmp = path.with_suffix('.png.tmp')
+    try:
+        fig.tight_layout()
+        fig.savefig(tmp, format='png', dpi=DPI)
+    finally:
+        plt.close(fig)
+    os.replace(tmp, path)
+
+
+def build_report(dataset, root=None, force=False):
+    """
+    Собирает отчет по датасету в каталог root. Возвращает (манифест,
+    собран ли заново): для той же версии датасета и формата отчета
+    графики не перерисовываются, если не задан force.
+    """
+    root = report_dir(root)
+    manifest = read_manifest(root)
+    if manifest is not None and manifest['version'] == dataset.version and not force:
+        return manifest, False
+
+    import matplotlib
+
+    matplotlib.use('Agg')
+    frame, missing = report_frame(dataset)
+    root.mkdir(parents=True, exist_ok=True)
+    for name, _ in CHARTS:
+        _save(DRAW[name](frame, missing), root / name)
+
+    manifest = {
+        'format': REPORT_FORMAT,
+        'version': dataset.version,
+        'rows': len(dataset.frame),
+        'created': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'charts': [{'file': name, 'title': title} for name, title in CHARTS],
+    }
+    # Манифест пишется последним: пока его нет, страница показывает прежний отчет
+    tmp = root / f'{MANIFEST_FILE}.tmp'
+    tmp.write_text(json.dumps(manifest, ensure_ascii=False, indent=2), encoding='utf-8')
+    os.replace(tmp, root / MANIFEST_FILE)
+    return manifest, True
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Сборка статического отчета EDA для main1.py')
+    parser.add_argument('source', nargs='?', help='URL или путь к CSV (по умолчанию REA_DATA_SOURCE)')
+    parser.add_argument('--output', help=f'каталог отчета (по умолчанию {REPORT_DIR_ENV} или streamlit/report/)')
+    parser.add_argument('--force', action='store_true', help='пересобрать при той же версии данных')
+    args = parser.parse_args(argv)
+
+    from realestate.data import load_dataset
+
+    start = time.perf_counter()
+    dataset = load_dataset(args.source)
+    manifest, built = build_report(dataset, args.output, args.force)
+    root = report_dir(args.output)
+    if built:
+        print(f'Отчет по версии {manifest["version"]} ({manifest["rows"]:,} строк) собран в {root} '
+              f'за {time.perf_counter() - start:.1f} с')
+    else:
+        print(f'Отчет в {root} уже собран по версии {manifest["version"]}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,462 @@
+"""
+Оценка стоимости аренды по признакам релиза 3.
+
+Модель - гребневая регрессия логарифма цены по комнатам, площади и высоте
+потолков (признаки teamA_data.csv), признакам местоположения из хранилища
+признаков (realestate.features: target и frequency encoding станции метро,
+минуты до метро) и поправочный множитель, подобранный под MAPE: экспонента
+прогноза логарифма дает медиану, а MAPE меньше у немного заниженной
+оценки. Обучение и пакетная оценка векторные (numpy), модель хранится в
+JSON - это несколько десятков чисел.
+
+Оценка одного объявления (predict_one) не использует pandas и numpy:
+признаки и скалярное произведение считаются на чистом Python за единицы
+микросекунд, поэтому загруженную один раз модель можно держать в памяти
+процесса (st.cache_resource в дашборде или HTTP-сервис serve) и отвечать
+без повторной загрузки.
+
+Запуск из каталога streamlit/:
+    python -m realestate.scoring train teamA_data.csv model.json [--store features/]
+    python -m realestate.scoring score model.json listings.csv scored.csv [--store features/]
+    python -m realestate.scoring serve model.json [--store features/] [--port 8000]
+
+--store у train строит хранилище признаков по обучающему файлу, у score и
+serve - открывает его. Без хранилища признаки местоположения считаются
+пропущенными.
+
+Сервис: GET /predict?rooms=2&total_area=54&ceiling_height=2.7 - одно
+объявление (с хранилищем еще &ad_id=... или &metro=Арбатская&metro_minutes=5
+&metro_walk=1), POST /predict со списком объявлений в JSON - пакет,
+GET /stats - число запросов и задержки p50/p99. Объявление пакета - объект
+с признаками (rooms, total_area, ceiling_height или колонки FEATURES) либо
+с полями выгрузки ("Площадь, м2", "Количество комнат", "Метро", ...),
+которые разбираются так же, как при обучении. Пакет, в котором у
+объявления нет ни одного признака, отклоняется с кодом 400.
+"""
+import argparse
+import json
+import math
+import os
+import sys
+import threading
+import time
+from collections import deque
+from dataclasses import asdict, dataclass, replace
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+import pandas as pd
+
+from realestate.features import LOCATION_FEATURES, FeatureStore
+from realestate.parsing import parse_listing_fields
+
+FEATURES = ['rooms_clean', 'total_area_clean', 'Ceiling_height']
+TARGET = 'price_clean'
+# Комнат больше MAX_ROOMS считаются как MAX_ROOMS
+MAX_ROOMS = 6
+# Высоты вне диапазона (сантиметры, опечатки) считаются пропуском
+CEILING_RANGE = (2.0, 6.0)
+RIDGE = 1.0
+HOLDOUT_SHARE = 0.2
+SEED = 0
+# Сетка поправочного множителя к exp(прогноза логарифма)
+SCALES = np.exp(np.linspace(-0.4, 0.2, 61))
+# Номер формата в имени файла: после изменения признаков модель переобучится
+MODEL_FORMAT = 2
+MODEL_FILE = 'model-{version}-v{format}.json'
+BLOCK_ROWS = 65_536
+LATENCY_WINDOW = 10_000
+# Параметры GET /predict -> колонки FEATURES (те же имена принимает POST)
+QUERY_FEATURES = {'rooms': 'rooms_clean', 'total_area': 'total_area_clean', 'ceiling_height': 'Ceiling_height'}
+
+
+def mape(actual, predicted):
+    """Средняя абсолютная ошибка в процентах"""
+    actual = np.asarray(actual, dtype='float64')
+    predicted = np.asarray(predicted, dtype='float64')
+    return float(np.mean(np.abs(predicted - actual) / actual) * 100)
+
+
+def location_frame(frame, store=None):
+    """
+    Колонки LOCATION_FEATURES строк frame: уже посчитанные, из хранилища
+    признаков (по Ad_ID или по тексту метро) или NaN, если хранилища нет.
+    """
+    if all(column in frame.columns for column in LOCATION_FEATURES):
+        return frame[LOCATION_FEATURES].astype('float64')
+    if store is not None:
+        return store.features_for(frame)
+    return pd.DataFrame(np.nan, index=frame.index, columns=LOCATION_FEATURES)
+
+
+def feature_frame(frame, store=None):
+    """
+    Колонки FEATURES, LOCATION_FEATURES (и TARGET, если есть) как float64.
+
+    Принимает и очищенный датасет (teamA_data.csv), и выгрузку с исходными
+    текстовыми полями: тогда признаки разбираются parse_listing_fields.
+    """
+    features = frame
+    if not all(column in frame.columns for column in FEATURES):
+        features = parse_listing_fields(frame)
+    columns = FEATURES + [TARGET] if TARGET in features.columns else FEATURES
+    features = features[columns].astype('float64')
+    location = location_frame(frame, store)
+    for column in LOCATION_FEATURES:
+        features[column] = location[column].to_numpy()
+    return features
+
+
+def _rooms_index(rooms):
+    return np.clip(np.nan_to_num(rooms, nan=1.0), 1, MAX_ROOMS).astype(np.int64) - 1
+
+
+@dataclass(frozen=True)
+class RentModel:
+    """
+    Обученная модель. coef - веса признаков design(): свободный член,
+    log площади и его квадрат, log площади на комнату, высота потолков,
+    признак пропуска высоты, по одному весу на число комнат 2..MAX_ROOMS
+    и признаки местоположения: отклонение target encoding станции и
+    log частоты станции от медиан, log минут до метро, признак пропуска
+    минут и "пешком". Пропуски местоположения заменяются медианами.
+    """
+    coef: tuple
+    area_median: float
+    ceiling_median: float
+    scale: float
+    metrics: dict
+    target_median: float = 0.0
+    frequency_median: float = 1.0
+    minutes_median: float = 10.0
+
+    def design(self, features):
+        """Матрица признаков (n, len(coef)) для фрейма feature_frame()"""
+        rooms = features['rooms_clean'].to_numpy()
+        area = features['total_area_clean'].to_numpy()
+        ceiling = features['Ceiling_height'].to_numpy()
+
+        area = np.where(area > 0, area, self.area_median)
+        log_area = np.log(area)
+        room_index = _rooms_index(rooms)
+        bad_ceiling = ~((ceiling >= CEILING_RANGE[0]) & (ceiling <= CEILING_RANGE[1]))
+        ceiling = np.where(bad_ceiling, self.ceiling_median, ceiling)
+
+        matrix = np.zeros((len(features), 11 + MAX_ROOMS - 1))
+        matrix[:, 0] = 1.0
+        matrix[:, 1] = log_area
+        matrix[:, 2] = log_area ** 2
+        matrix[:, 3] = log_area - np.log(room_index + 1)
+        matrix[:, 4] = ceiling
+        matrix[:, 5] = bad_ceiling
+        rows = np.flatnonzero(room_index > 0)
+        matrix[rows, 5 + room_index[rows]] = 1.0
+
+        target = features['metro_target'].to_numpy()
+        frequency = features['metro_frequency'].to_numpy()
+        minutes = features['metro_minutes'].to_numpy()
+        no_minutes = np.isnan(minutes)
+        location = 5 + MAX_ROOMS
+        matrix[:, location] = np.nan_to_num(target - self.target_median)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            matrix[:, location + 1] = np.nan_to_num(np.log(frequency / self.frequency_median),
+                                                    nan=0.0, neginf=0.0, posinf=0.0)
+        matrix[:, location + 2] = np.log1p(np.where(no_minutes, self.minutes_median, np.maximum(minutes, 0)))
+        matrix[:, location + 3] = no_minutes
+        matrix[:, location + 4] = np.nan_to_num(features['metro_walk'].to_numpy())
+        return matrix
+
+    def predict(self, frame, store=None):
+        """
+        Оценка цены для каждой строки frame (вектор float64). Признаки
+        местоположения берутся из store (FeatureStore). Строки
+        обрабатываются блоками по BLOCK_ROWS, чтобы матрица признаков
+        оставалась небольшой.
+        """
+        features = feature_frame(frame, store)
+        coef = np.asarray(self.coef)
+        predicted = np.empty(len(features))
+        for start in range(0, len(features), BLOCK_ROWS):
+            block = features.iloc[start:start + BLOCK_ROWS]
+            predicted[start:start + len(block)] = self.design(block) @ coef
+        return np.exp(predicted) * self.scale
+
+    def predict_one(self, rooms, total_area, ceiling_height=None, location=None):
+        """
+        Оценка одного объявления без pandas и numpy. location - словарь
+        LOCATION_FEATURES (FeatureStore.lookup или station_features),
+        пропущенные значения заменяются медианами.
+        """
+        area = total_area if total_area and total_area > 0 else self.area_median
+        log_area = math.log(area)
+        room = min(max(int(rooms), 1), MAX_ROOMS) if rooms and rooms == rooms else 1
+        bad_ceiling = not (ceiling_height is not None
+                           and CEILING_RANGE[0] <= ceiling_height <= CEILING_RANGE[1])
+        ceiling = self.ceiling_median if bad_ceiling else ceiling_height
+
+        coef = self.coef
+        value = (coef[0] + coef[1] * log_area + coef[2] * log_area * log_area
+                 + coef[3] * (log_area - math.log(room)) + coef[4] * ceiling + coef[5] * bad_ceiling)
+        if room > 1:
+            value += coef[4 + room]
+
+        location = location or {}
+        target = location.get('metro_target')
+        frequency = location.get('metro_frequency')
+        minutes = location.get('metro_minutes')
+        walk = location.get('metro_walk')
+        no_minutes = minutes is None or minutes != minutes
+        i = 5 + MAX_ROOMS
+        if target is not None and target == target:
+            value += coef[i] * (target - self.target_median)
+        if frequency is not None and frequency > 0:
+            value += coef[i + 1] * math.log(frequency / self.frequency_median)
+        value += coef[i + 2] * math.log1p(self.minutes_median if no_minutes else max(minutes, 0))
+        value += coef[i + 3] * no_minutes
+        if walk is not None and walk == walk:
+            value += coef[i + 4] * walk
+        return math.exp(value) * self.scale
+
+    @classmethod
+    def fit(cls, frame, ridge=RIDGE, store=None):
+        """
+        Обучает модель на строках frame с ценой и площадью больше нуля,
+        признаки местоположения - из store. В metrics - MAPE на отложенной
+        выборке (HOLDOUT_SHARE строк) и на обучающей; итоговая модель
+        обучается на всех строках.
+        """
+        features = feature_frame(frame, store)
+        features = features[(features[TARGET] > 0) & (features['total_area_clean'] > 0)]
+        holdout = np.random.default_rng(SEED).random(len(features)) < HOLDOUT_SHARE
+        trial = cls._fit(features[~holdout], ridge)
+        model = cls._fit(features, ridge)
+        metrics = {
+            'rows': len(features),
+            'holdout_mape': mape(features[TARGET][holdout], trial.predict(features[holdout])),
+            'train_mape': mape(features[TARGET], model.predict(features)),
+        }
+        return replace(model, metrics=metrics)
+
+    @classmethod
+    def _fit(cls, features, ridge):
+        ceiling = features['Ceiling_height']
+        ceiling = ceiling[(ceiling >= CEILING_RANGE[0]) & (ceiling <= CEILING_RANGE[1])]
+        base = cls((), float(features['total_area_clean'].median()),
+                   float(ceiling.median()) if len(ceiling) else 2.7, 1.0, {},
+                   _median(features['metro_target'], 0.0), _median(features['metro_frequency'], 1.0),
+                   _median(features['metro_minutes'], 10.0))
+        matrix = base.design(features)
+        target = np.log(features[TARGET].to_numpy())
+        penalty = ridge * np.eye(matrix.shape[1])
+        penalty[0, 0] = 0.0
+        coef = np.linalg.solve(matrix.T @ matrix + penalty, matrix.T @ target)
+
+        predicted = np.exp(matrix @ coef)
+        errors = [mape(features[TARGET], predicted * scale) for scale in SCALES]
+        scale = float(SCALES[int(np.argmin(errors))])
+        return replace(base, coef=tuple(float(c) for c in coef), scale=scale)
+
+    def save(self, path):
+        path = Path(path)
+        tmp = path.with_suffix(path.suffix + '.tmp')
+        tmp.write_text(json.dumps(asdict(self), ensure_ascii=False, indent=2), encoding='utf-8')
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path):
+        data = json.loads(Path(path).read_text(encoding='utf-8'))
+        data['coef'] = tuple(data['coef'])
+        return cls(**data)
+
+
+def _median(values, default):
+    values = values[values > 0]
+    return float(values.median()) if len(values) else default
+
+
+def model_for_dataset(dataset, store=None):
+    """
+    Модель версии датасета: из model-<версия>-v<формат>.json рядом с кэшем
+    датасета или обученная по dataset.frame и сохраненная туда. Признаки
+    местоположения - из store или хранилища признаков этой версии.
+    """
+    path = dataset.path.parent / MODEL_FILE.format(version=dataset.version, format=MODEL_FORMAT)
+    if path.exists():
+        return RentModel.load(path)
+    model = RentModel.fit(dataset.frame, store=store or FeatureStore.for_dataset(dataset))
+    model.save(path)
+    return model
+
+
+def percentiles(seconds):
+    """p50 и p99 задержек (в миллисекундах)"""
+    if not len(seconds):
+        return {'p50_ms': None, 'p99_ms': None}
+    p50, p99 = np.percentile(np.asarray(seconds) * 1000, [50, 99])
+    return {'p50_ms': float(p50), 'p99_ms': float(p99)}
+
+
+def _number(query, name):
+    values = query.get(name)
+    if not values:
+        return None
+    value = float(values[0])
+    if not math.isfinite(value):
+        raise ValueError(f'{name}={values[0]}: ожидается конечное число')
+    return value
+
+
+def _location(store, query):
+    """Признаки местоположения запроса: по ad_id или по станции metro"""
+    if store is None:
+        return None
+    ad_id = _number(query, 'ad_id')
+    if ad_id is not None:
+        location = store.lookup(int(ad_id))
+        if location is None:
+            raise ValueError(f'объявления {int(ad_id)} нет в хранилище признаков')
+        return location
+    if 'metro' in query:
+        return store.station_features(query['metro'][0], _number(query, 'metro_minutes'),
+                                      _number(query, 'metro_walk'))
+    return None
+
+
+def _listings_frame(listings):
+    """
+    Тело POST /predict -> DataFrame для feature_frame. Если в объявлениях
+    есть хотя бы один признак FEATURES (или параметр GET), недостающие
+    признаки - пропуски; иначе признаки разбираются из полей выгрузки.
+    """
+    if not isinstance(listings, list) or not listings or not all(isinstance(row, dict) for row in listings):
+        raise ValueError('ожидается непустой список объявлений (JSON-объектов)')
+    frame = pd.DataFrame([{QUERY_FEATURES.get(name, name): value for name, value in row.items()}
+                          for row in listings])
+    if any(column in frame.columns for column in FEATURES):
+        frame = frame.reindex(columns=list(dict.fromkeys(FEATURES + list(frame.columns))))
+        frame[FEATURES] = frame[FEATURES].astype('float64')
+    return frame
+
+
+def make_handler(model, store=None):
+    """Обработчик HTTP-запросов к загруженной модели и хранилищу признаков"""
+    latencies = deque(maxlen=LATENCY_WINDOW)
+    lock = threading.Lock()
+
+    class Handler(BaseHTTPRequestHandler):
+        def _reply(self, status, payload):
+            body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            if url.path == '/stats':
+                with lock:
+                    recent = list(latencies)
+                return self._reply(200, {'requests': len(recent), **percentiles(recent)})
+            if url.path != '/predict':
+                return self._reply(404, {'error': 'unknown path'})
+            start = time.perf_counter()
+            query = parse_qs(url.query)
+            try:
+                price = model.predict_one(_number(query, 'rooms'), _number(query, 'total_area'),
+                                          _number(query, 'ceiling_height'), _location(store, query))
+            except (ValueError, OverflowError) as error:
+                return self._reply(400, {'error': str(error)})
+            with lock:
+                latencies.append(time.perf_counter() - start)
+            self._reply(200, {'price': price})
+
+        def do_POST(self):
+            if urlparse(self.path).path != '/predict':
+                return self._reply(404, {'error': 'unknown path'})
+            start = time.perf_counter()
+            try:
+                listings = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))))
+                features = feature_frame(_listings_frame(listings), store)
+            except (ValueError, TypeError, KeyError) as error:
+                return self._reply(400, {'error': str(error)})
+            unusable = np.flatnonzero(features[FEATURES].isna().all(axis=1).to_numpy())
+            if len(unusable):
+                return self._reply(400, {'error': f'нет признаков {FEATURES} у объявлений {unusable.tolist()}'})
+            try:
+                prices = model.predict(features)
+            except Exception as error:
+                return self._reply(500, {'error': f'ошибка оценки: {error}'})
+            with lock:
+                latencies.append(time.perf_counter() - start)
+            self._reply(200, {'prices': prices.tolist()})
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+def serve(model, host='127.0.0.1', port=8000, store=None):
+    """HTTP-сервис оценки: модель загружена один раз и обслуживает все запросы"""
+    server = ThreadingHTTPServer((host, port), make_handler(model, store))
+    print(f'Сервис оценки: http://{host}:{server.server_port}/predict')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+def _read(path):
+    path = Path(path)
+    return pd.read_parquet(path) if path.suffix == '.parquet' else pd.read_csv(path, engine='pyarrow')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Оценка стоимости аренды')
+    commands = parser.add_subparsers(dest='command', required=True)
+    train = commands.add_parser('train', help='обучить модель и сохранить в JSON')
+    train.add_argument('data', help='очищенный датасет (teamA_data.csv) или выгрузка')
+    train.add_argument('model', help='файл модели .json')
+    train.add_argument('--store', help='каталог, куда построить хранилище признаков')
+    score = commands.add_parser('score', help='оценить все объявления файла')
+    score.add_argument('model')
+    score.add_argument('data', help='CSV или Parquet с объявлениями')
+    score.add_argument('output', help='CSV с колонкой predicted_price')
+    score.add_argument('--store', help='каталог хранилища признаков')
+    server = commands.add_parser('serve', help='HTTP-сервис оценки')
+    server.add_argument('model')
+    server.add_argument('--host', default='127.0.0.1')
+    server.add_argument('--port', type=int, default=8000)
+    server.add_argument('--store', help='каталог хранилища признаков')
+    args = parser.parse_args(argv)
+
+    if args.command == 'train':
+        frame = _read(args.data)
+        store = FeatureStore.build(frame, args.store) if args.store else None
+        model = RentModel.fit(frame, store=store)
+        model.save(args.model)
+        print(f'Строк: {model.metrics["rows"]:,}, MAPE на отложенной выборке: '
+              f'{model.metrics["holdout_mape"]:.1f}%, на обучающей: {model.metrics["train_mape"]:.1f}%')
+    elif args.command == 'score':
+        model = RentModel.load(args.model)
+        store = FeatureStore(args.store) if args.store else None
+        frame = _read(args.data)
+        start = time.perf_counter()
+        predicted = model.predict(frame, store)
+        seconds = time.perf_counter() - start
+        frame.assign(predicted_price=predicted).to_csv(args.output, index=False)
+        print(f'Оценено: {len(frame):,} объявлений за {seconds:.3f} с '
+              f'({len(frame) / max(seconds, 1e-9):,.0f} строк/с)')
+    else:
+        store = FeatureStore(args.store) if args.store else None
+        serve(RentModel.load(args.model), args.host, args.port, store)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,154 @@
+"""
+Генератор синтетических объявлений в формате исходной выгрузки.
+
+Колонки и форматы строк повторяют реальный CSV ("500000.0 руб./ За месяц, ...",
+площадь "общая/жилая/кухня", "м. Смоленская (9 мин пешком)" и т.д.), доли
+пропусков близки к тем, что видны в EDA релиза 1. Используется в бенчмарках и
+для запуска приложения без доступа к сети.
+
+Пример:
+    python -m realestate.synthetic 100000 listings.csv
+"""
+import sys
+
+import numpy as np
+import pandas as pd
+
+STATIONS = [
+    'Смоленская', 'Арбатская', 'Солнцево', 'Говорово', 'Строгино', 'Римская',
+    'Кропоткинская', 'Парк культуры', 'Фрунзенская', 'Спортивная', 'Киевская',
+    'Баррикадная', 'Маяковская', 'Белорусская', 'Динамо', 'Аэропорт', 'Сокол',
+    'Тверская', 'Пушкинская', 'Чистые пруды', 'Бауманская', 'Курская',
+    'Таганская', 'Павелецкая', 'Новокузнецкая', 'Полянка', 'Октябрьская',
+    'Университет', 'Профсоюзная', 'Тропарёво', 'Митино', 'Марьино',
+]
+STREETS = [
+    'улица Новый Арбат', 'улица Арбат', 'Новинский бульвар', 'Никитский бульвар',
+    'Солнцевский проспект', 'улица Богданова', 'Боровское шоссе',
+    'Производственная улица', 'Ленинский проспект', 'Кутузовский проспект',
+    'Тверская улица', 'Профсоюзная улица', 'Мичуринский проспект',
+    'улица Вавилова', 'Пятницкая улица', 'Большая Якиманка',
+]
+ROOM_SUFFIXES = ['', ', Оба варианта', ', Изолированная', ', Смежная']
+MATERIALS = ['', ', Монолитный', ', Панельный', ', Кирпичный', ', Монолитно-кирпичный']
+# Размер блока при записи CSV: 2М строк не нужно держать в памяти целиком
+BLOCK_ROWS = 250_000
+DESCRIPTION_PHRASES = [
+    'Сдается светлая квартира', 'в шаговой доступности от метро',
+    'с качественным ремонтом', 'вся необходимая мебель и техника',
+    'рядом парк и школа', 'тихий двор', 'консьерж и охраняемая территория',
+    'без комиссии', 'собственник', 'долгосрочная аренда',
+    'возможна парковка', 'окна во двор', 'развитая инфраструктура района',
+    'вид на город', 'новый дом', 'закрытая территория', 'чистый подъезд',
+]
+
+
+def _with_missing(rng, values, share):
+    """Заменяет долю share значений на NaN"""
+    series = pd.Series(values, dtype=object)
+    series[rng.random(len(series)) < share] = np.nan
+    return series
+
+
+def _choice(rng, options, n):
+    return np.asarray(options, dtype=object)[rng.integers(0, len(options), n)]
+
+
+def _descriptions(rng, n, pool_size=2000):
+    """Описания собираются из пула, чтобы генерация 2М строк занимала секунды"""
+    pool = []
+    for _ in range(pool_size):
+        k = rng.integers(3, 8)
+        words = rng.choice(DESCRIPTION_PHRASES, size=k, replace=False)
+        pool.append('. '.join(words).capitalize() + '.')
+    return _choice(rng, pool, n)
+
+
+def generate_raw_listings(n, seed=0, start=0):
+    """
+    Возвращает DataFrame из n объявлений с колонками исходной выгрузки.
+    start - номер первой строки: блоки с разными start можно склеить, номера
+    строк и ID объявлений в них не пересекаются.
+    """
+    rng = np.random.default_rng(seed)
+
+    ad_ids = 200_000_000 + start * 4 + rng.permutation(max(n * 4, 1))[:n]
+    rooms = rng.choice([1, 2, 3, 4, 5], size=n, p=[0.35, 0.28, 0.2, 0.1, 0.07])
+    total = np.round(18 + rooms * 17 + rng.gamma(2.0, 6.0, n), 1)
+    living = np.round(total * rng.uniform(0.45, 0.7, n), 1)
+    kitchen = np.round(rng.uniform(5, 20, n), 1)
+    floors = rng.integers(5, 40, n)
+    floor = rng.integers(1, floors + 1)
+    minutes = rng.integers(1, 25, n)
+    price = np.round(total * rng.lognormal(np.log(900), 0.45, n), -3).clip(5000, 3_000_000)
+    deposit = np.round(price * rng.choice([0.5, 1.0, 1.0, 1.5], n), -3)
+
+    ids = pd.Series(ad_ids).astype(str)
+    area_parts = rng.integers(1, 4, n)
+    area = pd.Series(total).astype(str)
+    area = area.where(area_parts < 2, area + '/' + pd.Series(living).astype(str))
+    area = area.where(area_parts < 3, area + '/' + pd.Series(kitchen).astype(str))
+
+    df = pd.DataFrame({
+        'Unnamed: 0': np.arange(start, start + n),
+        'ID  объявления': ad_ids,
+        'Количество комнат': _with_missing(
+            rng, pd.Series(rooms).astype(str) + _choice(rng, ROOM_SUFFIXES, n), 0.045),
+        'Тип': 'Квартира',
+        'Метро': _with_missing(
+            rng,
+            'м. ' + pd.Series(_choice(rng, STATIONS, n)) + ' ('
+            + pd.Series(minutes).astype(str) + ' мин '
+            + pd.Series(_choice(rng, ['пешком', 'пешком', 'на машине'], n)) + ')',
+            0.04),
+        'Адрес': 'Москва, ' + pd.Series(_choice(rng, STREETS, n)) + ', '
+                 + pd.Series(rng.integers(1, 60, n)).astype(str),
+        'Площадь, м2': area,
+        'Дом': pd.Series(floor).astype(str) + '/' + pd.Series(floors).astype(str)
+               + _choice(rng, MATERIALS, n),
+        'Парковка': _with_missing(rng, _choice(rng, ['подземная', 'наземная', 'многоуровневая'], n), 0.57),
+        'Цена': pd.Series(price).astype(str) + ' руб./ За месяц, Залог - '
+                + pd.Series(deposit.astype(np.int64)).astype(str)
+                + ' руб., Срок аренды - Длительный',
+        'Телефоны': '+7 9' + pd.Series(rng.integers(10, 100, n)).astype(str) + ' '
+                    + pd.Series(rng.integers(100, 1000, n)).astype(str) + '-'
+                    + pd.Series(rng.integers(10, 100, n)).astype(str) + '-'
+                    + pd.Series(rng.integers(10, 100, n)).astype(str),
+        'Описание': _descriptions(rng, n),
+        'Ремонт': _with_missing(rng, _choice(rng, ['Дизайнерский', 'Евроремонт', 'Косметический', 'Без ремонта'], n), 0.09),
+        'Площадь комнат, м2': _with_missing(rng, pd.Series(living).astype(str), 0.32),
+        'Балкон': _with_missing(rng, _choice(rng, ['Балкон (1)', 'Лоджия (1)', 'Балкон (1), Лоджия (1)'], n), 0.27),
+        'Окна': _with_missing(rng, _choice(rng, ['Во двор', 'На улицу', 'На улицу и двор'], n), 0.26),
+        'Санузел': _with_missing(rng, _choice(rng, ['Совмещенный (1)', 'Раздельный (1)', 'Совмещенный (2), Раздельный (1)'], n), 0.10),
+        'Можно с детьми/животными': _with_missing(
+            rng, _choice(rng, ['Можно с детьми, Можно с животными', 'Можно с детьми', 'Можно с животными'], n), 0.25),
+        'Дополнительно': _with_missing(
+            rng, _choice(rng, ['Мебель в комнатах, Мебель на кухне, Ванна, Душевая кабина',
+                               'Мебель в комнатах, Стиральная машина, Холодильник',
+                               'Интернет, Телевизор, Кондиционер'], n), 0.01),
+        'Название ЖК': _with_missing(rng, _choice(rng, ['Новый Арбат', 'Солнцево Парк', 'Город на реке'], n), 0.80),
+        'Серия дома': _with_missing(rng, _choice(rng, ['П-44Т', 'КОПЭ', 'И-155'], n), 0.91),
+        'Высота потолков, м': _with_missing(
+            rng, _choice(rng, [2.5, 2.6, 2.64, 2.7, 2.75, 2.8, 3.0, 3.2, 3.5], n), 0.45).astype(float),
+        'Лифт': _with_missing(rng, _choice(rng, ['Пасс (1)', 'Пасс (1), Груз (1)', 'Пасс (2), Груз (1)'], n), 0.23),
+        'Мусоропровод': _with_missing(rng, _choice(rng, ['Да', 'Нет'], n), 0.30),
+        'Ссылка на объявление': 'https://www.cian.ru/rent/flat/' + ids,
+    })
+    df.index += start
+    return df
+
+
+def write_raw_csv(path, n, seed=0, block_rows=BLOCK_ROWS):
+    """Записывает n объявлений в CSV блоками по block_rows строк (блок i - seed + i)"""
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        for i, start in enumerate(range(0, max(n, 1), block_rows)):
+            block = generate_raw_listings(min(block_rows, n - start), seed + i, start)
+            block.to_csv(f, index=False, header=not i)
+    return path
+
+
+if __name__ == '__main__':
+    if len(sys.argv) != 3:
+        print('Использование: python -m realestate.synthetic <строк> <файл.csv>')
+        sys.exit(2)
+    write_raw_csv(sys.argv[2], int(sys.argv[1]))